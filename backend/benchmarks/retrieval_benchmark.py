@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import django
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# -------------------------------
+# Arguments
+# -------------------------------
+
+parser = argparse.ArgumentParser(
+    description="Times retrieval, search and ingestion over synthetic memory corpora."
+)
+parser.add_argument(
+    "--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+    help="Corpus sizes to benchmark, grown cumulatively (default: 1k 10k 100k)"
+)
+parser.add_argument(
+    "--queries", type=int, default=200,
+    help="Timed calls per operation and size"
+)
+parser.add_argument(
+    "--embeddings",
+    help="Optional .npy file of precomputed (N, dim) corpus embeddings; "
+         "random unit vectors are used otherwise"
+)
+parser.add_argument(
+    "--encoder", choices=["hash", "model"], default="hash",
+    help="Query encoder: a deterministic offline hashing encoder, or the "
+         "configured SentenceTransformer"
+)
+parser.add_argument(
+    "--backend", default=None,
+    help="Vector index backend to benchmark (defaults to MEMORY_INDEX_BACKEND)"
+)
+parser.add_argument(
+    "--output", default=None,
+    help="Where to write the JSON results (default: benchmarks/results/<timestamp>.json)"
+)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+# -------------------------------
+# Django Setup (throwaway database)
+# -------------------------------
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+from django.conf import settings  # noqa: E402
+
+work_dir = Path(tempfile.mkdtemp(prefix="hebbrix-bench-"))
+settings.DATABASES["default"]["NAME"] = work_dir / "bench.sqlite3"
+settings.EMBEDDING_CACHE_PATH = None
+settings.ALLOWED_HOSTS = ["testserver"]
+# Ingestion jobs are run inline below, not on a background thread
+settings.INGESTION_WORKER = "command"
+if args.backend:
+    settings.MEMORY_INDEX_BACKEND = args.backend
+# The mmap backend lives on disk; the others are benchmarked in memory
+settings.MEMORY_INDEX_PATH = work_dir / "index" if settings.MEMORY_INDEX_BACKEND == "mmap" else None
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from memory_app.models import Memory  # noqa: E402
+from memory_app.services import embedding  # noqa: E402
+from memory_app.services.chat import retrieve_relevant_memories  # noqa: E402
+from memory_app.services.index import get_index, normalize, reset_index  # noqa: E402
+from memory_app.services.jobs import run_pending_jobs  # noqa: E402
+from memory_app.services.retrieval import hybrid_rank_memories  # noqa: E402
+from memory_app.services.tiering import get_access_tracker  # noqa: E402
+
+DIM = 384
+WORDS = (
+    "user likes loves hates prefers works lives studies owns plays visits "
+    "coffee tea pizza sushi peanuts dogs cats guitar piano football tennis "
+    "python java design music hiking travel mumbai london berlin tokyo "
+    "morning evening weekend family friends doctor engineer teacher artist"
+).split()
+
+
+# -------------------------------
+# Offline Stubs
+# -------------------------------
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for SentenceTransformer: each token maps to a
+    seeded random vector, and a text is the normalized sum of its tokens.
+    """
+
+    def __init__(self, dim=DIM):
+        self.dim = dim
+        self._tokens = {}
+
+    def _token_vector(self, token):
+        vector = self._tokens.get(token)
+        if vector is None:
+            seed = int.from_bytes(token.encode("utf-8")[:8].ljust(8, b"\0"), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            self._tokens[token] = vector
+        return vector
+
+    def encode(self, texts):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                vectors[row] += self._token_vector(token)
+
+        vectors = normalize(vectors)
+        return vectors[0] if single else vectors
+
+
+def stub_extract_memories(text):
+    # Local replacement for the OpenAI extraction call
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+# -------------------------------
+# Corpus Generation
+# -------------------------------
+
+def random_sentence(rng, length=6):
+    return " ".join(rng.choice(WORDS, size=length))
+
+
+def corpus_embeddings(rng, start, count, precomputed):
+    if precomputed is not None:
+        rows = np.take(precomputed, np.arange(start, start + count), axis=0, mode="wrap")
+        return rows.astype(np.float32)
+    return normalize(rng.standard_normal((count, DIM)).astype(np.float32))
+
+
+def grow_corpus(rng, target, precomputed, chunk_size=5000):
+    """
+    Appends synthetic memories until the table holds `target` rows.
+    Returns the insert time in seconds.
+    """
+
+    started = time.perf_counter()
+    current = Memory.objects.count()
+
+    while current < target:
+        count = min(chunk_size, target - current)
+        vectors = corpus_embeddings(rng, current, count, precomputed)
+        Memory.objects.bulk_create(
+            [
+                Memory(
+                    content=random_sentence(rng),
+                    embedding=vector,
+                    importance_score=float(rng.random())
+                )
+                for vector in vectors
+            ],
+            batch_size=chunk_size
+        )
+        current += count
+
+    return time.perf_counter() - started
+
+
+# -------------------------------
+# Measurement
+# -------------------------------
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def measure(name, size, calls, operation):
+    """
+    Times `operation(i)` for i in range(calls) and summarizes latency.
+    """
+
+    operation(0)  # warm-up, not recorded
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(calls):
+        call_started = time.perf_counter()
+        operation(i)
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    result = {
+        "operation": name,
+        "corpus_size": size,
+        "calls": calls,
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "throughput_per_s": round(calls / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    print(
+        f"{name:<28} n={size:<9} p50={result['p50_ms']:>9.3f}ms "
+        f"p95={result['p95_ms']:>9.3f}ms p99={result['p99_ms']:>9.3f}ms "
+        f"{result['throughput_per_s']:>9.1f}/s rss={result['peak_rss_mb']:.0f}MB"
+    )
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -------------------------------
+# Benchmark
+# -------------------------------
+
+def run():
+    rng = np.random.default_rng(args.seed)
+    precomputed = np.load(args.embeddings, mmap_mode="r") if args.embeddings else None
+
+    call_command("migrate", verbosity=0)
+
+    if args.encoder == "hash":
+        embedding._model = HashingEncoder()
+
+    queries = [random_sentence(rng, 4) for _ in range(args.queries)]
+
+    # Embed queries up front so timings measure retrieval, not encoding
+    embedding.get_embeddings(queries)
+
+    client = Client()
+    results = []
+
+    print("\n========== RETRIEVAL BENCHMARK ==========\n")
+
+    with mock.patch("memory_app.services.jobs.extract_memories", stub_extract_memories):
+        for size in sorted(args.sizes):
+            insert_seconds = grow_corpus(rng, size, precomputed)
+
+            reset_index()
+            started = time.perf_counter()
+            get_index()
+            build_seconds = time.perf_counter() - started
+
+            results.append({
+                "operation": "setup",
+                "corpus_size": size,
+                "insert_seconds": round(insert_seconds, 3),
+                "index_build_seconds": round(build_seconds, 3),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            })
+
+            results.append(measure(
+                "retrieve_relevant_memories", size, args.queries,
+                lambda i: retrieve_relevant_memories(queries[i])
+            ))
+            results.append(measure(
+                "hybrid_rank_memories", size, args.queries,
+                lambda i: hybrid_rank_memories(queries[i], Memory.objects.all(), top_k=5)
+            ))
+            results.append(measure(
+                "GET memories/search", size, args.queries,
+                lambda i: client.get("/api/memories/search", {"q": queries[i]})
+            ))
+
+            def ingest(i):
+                # Enqueue plus the job itself; rolled back so every call
+                # dedups against the same corpus
+                with transaction.atomic():
+                    client.post(
+                        "/api/memories",
+                        {"text": "\n".join(random_sentence(rng) for _ in range(20))},
+                        content_type="application/json"
+                    )
+                    run_pending_jobs()
+                    transaction.set_rollback(True)
+
+            results.append(measure(
+                "POST memories (dedup)", size, min(args.queries, 50), ingest
+            ))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "index_backend": settings.MEMORY_INDEX_BACKEND,
+            "encoder": args.encoder,
+            "embedding_backend": settings.EMBEDDING_BACKEND if args.encoder == "model" else None,
+            "embeddings": "precomputed" if precomputed is not None else "random",
+            "queries": args.queries,
+            "queries_pre_embedded": True,
+        },
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else (
+        Path(__file__).resolve().parent / "results" / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print(f"\nBenchmark results saved to: {output}")
+
+
+# -------------------------------
+# Run
+# -------------------------------
+
+if __name__ == "__main__":
+    try:
+        run()
+    finally:
+        # Write buffered access counts while the database still exists
+        get_access_tracker().flush()
+        shutil.rmtree(work_dir, ignore_errors=True)
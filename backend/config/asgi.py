@@ -8,9 +8,23 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+started = time.perf_counter()
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+from memory_app.services.startup import record_timing, start_workers, warmup  # noqa: E402
+
+record_timing("django.setup", time.perf_counter() - started)
+
+# Opt-in: load models and indexes before this worker takes traffic
+if settings.WARMUP_ON_STARTUP:
+    warmup()
+
+# Only server processes run the ingestion worker, not manage.py commands
+start_workers()
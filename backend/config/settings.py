@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover every other middleware
+    'memory_app.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -127,6 +129,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Browsers may send X-Namespace to scope memory and chat requests
+from corsheaders.defaults import default_headers
+
+CORS_ALLOW_HEADERS = (*default_headers, "x-namespace")
+
+# Pagination headers of GET memories/all
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", "Link"]
+
 # OpenAI API Key
 
 import os
@@ -139,4 +149,178 @@ load_dotenv(BASE_DIR / ".env")
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# OpenAI-compatible endpoint to call instead of api.openai.com, e.g.
+# `manage.py mock_llm_server` at http://127.0.0.1:8765/v1
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# LLM gateway
+# Every LLM call shares one pooled client. At most LLM_MAX_CONCURRENCY
+# calls, streams included, run at once in each process;
+# callers wait LLM_QUEUE_TIMEOUT seconds for a slot before failing.
+# Transient errors are retried up to LLM_MAX_RETRIES times with
+# exponential backoff from LLM_RETRY_BACKOFF seconds, all within
+# LLM_TIMEOUT seconds of the first attempt. LLM_BREAKER_THRESHOLD
+# consecutive failures open the circuit: calls fail fast for
+# LLM_BREAKER_COOLDOWN seconds, then one probe call tests the upstream.
+LLM_MAX_CONNECTIONS = 20
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = 2.0
+LLM_TIMEOUT = 30.0
+LLM_MAX_RETRIES = 2
+LLM_RETRY_BACKOFF = 0.5
+LLM_BREAKER_THRESHOLD = 5
+LLM_BREAKER_COOLDOWN = 30.0
+
+# Startup
+
+# Preload the embedding model, LLM client and vector index when a
+# WSGI/ASGI worker starts (see `manage.py warmup`).
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "0") == "1"
+
+# Embeddings
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+
+# Inference backend: "torch" (the reference), "onnx" (same weights on
+# ONNX Runtime) or "onnx-int8" (dynamically quantized ONNX export,
+# EMBEDDING_ONNX_INT8_FILE inside the model repo). The ONNX backends
+# need `pip install "sentence-transformers[onnx]"`; compare them with
+# `manage.py check_embedding_parity` before switching.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+
+# CPU threads used by one encode call (intra-op) and across parallel
+# operators (inter-op); None keeps the runtime default (all cores).
+# With several workers per node, set intra-op to cores / workers.
+EMBEDDING_INTRA_OP_THREADS = int(os.getenv("EMBEDDING_INTRA_OP_THREADS", "0")) or None
+EMBEDDING_INTER_OP_THREADS = int(os.getenv("EMBEDDING_INTER_OP_THREADS", "0")) or None
+
+# Embedding cache: an in-memory LRU of EMBEDDING_CACHE_SIZE vectors in
+# front of a persistent SQLite tier at EMBEDDING_CACHE_PATH (None
+# disables the disk tier). Entries are keyed on model and
+# EMBEDDING_BACKEND; `manage.py clear_embedding_cache --stale` drops
+# the ones a switch left behind.
+EMBEDDING_CACHE_SIZE = 10000
+EMBEDDING_CACHE_PATH = BASE_DIR / "var" / "embedding_cache.sqlite3"
+
+# Micro-batching: concurrent encode calls are coalesced into one model
+# call of up to EMBEDDING_BATCH_MAX_SIZE texts, waiting at most
+# EMBEDDING_BATCH_MAX_WAIT_MS for a batch to fill.
+EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "1") == "1"
+EMBEDDING_BATCH_MAX_SIZE = 64
+EMBEDDING_BATCH_MAX_WAIT_MS = 5
+
+# Element type of stored embedding BLOBs: "float32" or "float16".
+# Existing rows keep the type they were written with.
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+
+# Vector index
+
+# "exact" scans every embedding; "ivf" probes MEMORY_INDEX_NPROBE of
+# MEMORY_INDEX_NLIST k-means cells (NLIST defaults to sqrt(rows)) once
+# the store holds MEMORY_INDEX_MIN_TRAIN rows.
+# "int8" and "binary" keep only quantized codes in memory, shortlist
+# MEMORY_INDEX_RERANK_FACTOR * k rows from them and re-rank that
+# shortlist by exact cosine over the stored embeddings.
+# "mmap" scans exactly like "exact", but over a snapshot file under
+# MEMORY_INDEX_PATH that every worker process maps read-only and shares
+# through the page cache (POSIX only).
+MEMORY_INDEX_BACKEND = os.getenv("MEMORY_INDEX_BACKEND", "exact")
+MEMORY_INDEX_NLIST = None
+MEMORY_INDEX_NPROBE = int(os.getenv("MEMORY_INDEX_NPROBE", "8"))
+MEMORY_INDEX_MIN_TRAIN = 1000
+MEMORY_INDEX_RERANK_FACTOR = 10
+
+# Where the index is persisted between restarts (None disables), and
+# how many inserts/deletes to buffer before re-saving it.
+MEMORY_INDEX_PATH = BASE_DIR / "var" / "index"
+MEMORY_INDEX_SAVE_EVERY = 500
+
+# A loaded index compares itself with the table at most every
+# MEMORY_INDEX_CHECK_INTERVAL seconds and catches up on rows other
+# processes (import_memories, process_ingestion_jobs, other workers)
+# wrote or deleted; None disables the check.
+MEMORY_INDEX_CHECK_INTERVAL = 5.0
+
+# With the "mmap" backend, inserts and deletes go to per-process delta
+# logs next to the snapshot; workers replay each other's logs every
+# MEMORY_SNAPSHOT_SYNC_INTERVAL seconds, and once
+# MEMORY_SNAPSHOT_COMPACT_EVERY records have piled up they are folded
+# into a new snapshot generation.
+MEMORY_SNAPSHOT_COMPACT_EVERY = 20000
+MEMORY_SNAPSHOT_SYNC_INTERVAL = 1.0
+
+# Each namespace has its own index, loaded on first use; at most this
+# many stay in memory, least recently used evicted first.
+MEMORY_INDEX_MAX_NAMESPACES = int(os.getenv("MEMORY_INDEX_MAX_NAMESPACES", "64"))
+
+# Hot/cold tiering
+# Retrieval hits are counted per memory and flushed every
+# MEMORY_ACCESS_FLUSH_SIZE distinct memories or
+# MEMORY_ACCESS_FLUSH_INTERVAL seconds. With MEMORY_TIERING_ENABLED,
+# searches score a hot tier first (the MEMORY_HOT_TIER_SIZE most
+# recently retrieved memories, then as many newest never-retrieved ones,
+# and everything stored since) and only scan the whole namespace when
+# the k-th hot score is below MEMORY_HOT_TIER_CONFIDENCE. Older memories
+# outside the hot tier can then be missed, so tiering is opt-in. The
+# hot tier is rebuilt in the background every MEMORY_HOT_TIER_REFRESH
+# seconds.
+MEMORY_TIERING_ENABLED = os.getenv("MEMORY_TIERING_ENABLED", "0") == "1"
+MEMORY_HOT_TIER_SIZE = 2000
+MEMORY_HOT_TIER_CONFIDENCE = 0.5
+MEMORY_HOT_TIER_REFRESH = 60
+MEMORY_ACCESS_FLUSH_SIZE = 500
+MEMORY_ACCESS_FLUSH_INTERVAL = 10
+
+# Chat response cache
+# Reuses an answer when a query's embedding is at least
+# CHAT_CACHE_THRESHOLD cosine-similar to a cached one asked with the
+# same memories and history. Entries live CHAT_CACHE_TTL seconds, at
+# most CHAT_CACHE_SIZE of them, and are dropped when a memory they used
+# is changed or deleted.
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "1") == "1"
+CHAT_CACHE_SIZE = 1000
+CHAT_CACHE_TTL = 3600
+CHAT_CACHE_THRESHOLD = 0.95
+
+# Chat sessions
+# Recent turns of a session are sent verbatim up to
+# CHAT_HISTORY_TOKEN_BUDGET (estimated) tokens; older turns are folded
+# into a rolling summary of at most CHAT_SUMMARY_MAX_TOKENS tokens by a
+# job on the ingestion queue. Sessions idle for CHAT_SESSION_TTL
+# seconds expire (None keeps them) and are deleted by
+# `manage.py prune_chat_sessions`.
+CHAT_HISTORY_TOKEN_BUDGET = 2000
+CHAT_SUMMARY_MAX_TOKENS = 400
+CHAT_SESSION_TTL = 7 * 24 * 3600
+
+# Ingestion jobs
+# POST memories queues an IngestionJob, as does a chat session that
+# needs compacting. "thread" processes jobs on a
+# background thread in each web process; "command" leaves them to
+# `manage.py process_ingestion_jobs`. Failed jobs are retried up to
+# INGESTION_MAX_ATTEMPTS times, INGESTION_RETRY_DELAY seconds after the
+# first failure and doubling after each one; running jobs older than
+# INGESTION_STALE_AFTER seconds are assumed abandoned and re-claimed.
+# With "command", web processes only see the stored memories once their
+# index catches up (MEMORY_INDEX_CHECK_INTERVAL, or the mmap backend's
+# shared snapshot), so the command refuses to run with neither.
+INGESTION_WORKER = os.getenv("INGESTION_WORKER", "thread")
+INGESTION_POLL_INTERVAL = 1.0
+INGESTION_MAX_ATTEMPTS = 3
+INGESTION_RETRY_DELAY = 5.0
+INGESTION_STALE_AFTER = 600
+
+# Memory listing
+# Page size of GET memories/all when no `limit` is given, and the
+# largest `limit` accepted; streaming modes are not paginated.
+MEMORY_LIST_PAGE_SIZE = 100
+MEMORY_LIST_MAX_PAGE_SIZE = 1000
+
+# Memory search
+# POST memories/search/batch accepts at most SEARCH_BATCH_MAX_QUERIES
+# queries, each returning at most SEARCH_MAX_TOP_K results.
+SEARCH_BATCH_MAX_QUERIES = 1000
+SEARCH_MAX_TOP_K = 100
+
 # print("OPENAI KEY LOADED:", OPENAI_API_KEY)
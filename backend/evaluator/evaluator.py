@@ -1,5 +1,10 @@
 import os
 import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import django
 
 # -------------------------------
@@ -8,17 +13,25 @@ import django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 django.setup()
 
-from memory_app.models import Memory
-from memory_app.services.embedding import cosine_similarity, get_embedding
+from memory_app.models import Memory  # noqa: E402
+from memory_app.services.embedding import get_embeddings  # noqa: E402
+from memory_app.services.index import (  # noqa: E402
+    QuantizedIndex, VectorIndex, get_index, measure_recall, reset_index
+)
+from memory_app.services.retrieval import (  # noqa: E402
+    combine_scores, hybrid_rank_memories, hybrid_score_matrix
+)
+
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "dataset.json")
 
 
 # -------------------------------
 # Utility Functions
 # -------------------------------
 
-def load_dataset():
-    dataset_path = os.path.join(os.path.dirname(__file__), "dataset.json")
-    with open(dataset_path, "r") as f:
+def load_dataset(path=DEFAULT_DATASET):
+    with open(path, "r") as f:
         return json.load(f)
 
 
@@ -27,20 +40,28 @@ def clear_database():
 
 
 def insert_memories(dataset):
-    for item in dataset:
-        embedding = get_embedding(item["memory"])
-        Memory.objects.create(
-            content=item["memory"],
-            embedding=embedding
-        )
+    # One batched (and cached) encode for the whole dataset
+    contents = list(dict.fromkeys(item["memory"] for item in dataset))
+    embeddings = get_embeddings(contents)
+
+    Memory.objects.bulk_create(
+        [
+            Memory(content=content, embedding=embedding)
+            for content, embedding in zip(contents, embeddings)
+        ],
+        batch_size=1000
+    )
+
+    # bulk_create skips the index signals; rebuild from the table
+    reset_index()
 
 
 # -------------------------------
 # Evaluation Logic
 # -------------------------------
 
-def evaluate():
-    dataset = load_dataset()
+def evaluate(dataset_path=DEFAULT_DATASET):
+    dataset = load_dataset(dataset_path)
     clear_database()
     insert_memories(dataset)
 
@@ -49,21 +70,19 @@ def evaluate():
     reciprocal_rank_sum = 0
     total = len(dataset)
 
+    # Every query against every memory in one matrix product
+    ids, contents = zip(*Memory.objects.order_by("id").values_list("id", "content"))
+    query_vectors = get_embeddings([item["query"] for item in dataset])
+    similarities = get_index().score_ids_many(query_vectors, ids)
+
     print("\n========== MEMORY SYSTEM EVALUATION ==========\n")
 
     for index, item in enumerate(dataset, start=1):
         query = item["query"]
         expected = item["expected_memory"]
 
-        query_embedding = get_embedding(query)
-        memories = Memory.objects.all()
-
-        scored = []
-        for memory in memories:
-            score = cosine_similarity(query_embedding, memory.embedding)
-            scored.append((score, memory.content))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
+        order = np.argsort(-similarities[index - 1], kind="stable")
+        scored = [(float(similarities[index - 1, i]), contents[i]) for i in order]
 
         # Extract ranked contents
         ranked_memories = [m for _, m in scored]
@@ -136,9 +155,265 @@ def evaluate():
     print(f"\nEvaluation report saved to: {report_path}")
 
 
+# -------------------------------
+# Hybrid Weight Sweep
+# -------------------------------
+
+# Score components shared with sweep worker processes
+_sweep_state = {}
+
+
+def weight_grid(step):
+    """
+    Every (alpha, beta, gamma) on a grid of `step` that sums to 1.
+    """
+
+    points = int(round(1 / step))
+    return [
+        (a / points, b / points, (points - a - b) / points)
+        for a in range(points + 1)
+        for b in range(points + 1 - a)
+    ]
+
+
+def _init_sweep_worker(semantic, keyword, importance, expected, ks):
+    _sweep_state.update(
+        semantic=semantic, keyword=keyword, importance=importance,
+        expected=expected, ks=ks
+    )
+
+
+def score_weights(weights):
+    """
+    Recall@k and MRR of one weighting over all queries at once.
+    The expected memory's rank counts every memory scoring at least
+    as high, so ties are not rewarded.
+    """
+
+    alpha, beta, gamma = weights
+    state = _sweep_state
+
+    started = time.perf_counter()
+    final = combine_scores(
+        state["semantic"], state["keyword"], state["importance"], alpha, beta, gamma
+    )
+    expected = state["expected"]
+    rows = np.arange(len(expected))
+    expected_scores = final[rows, expected][:, None]
+    ranks = (final >= expected_scores).sum(axis=1)
+    ranks = np.where(expected >= 0, ranks, np.inf)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "alpha": alpha,
+        "beta": beta,
+        "gamma": gamma,
+        "recall": {k: float((ranks <= k).mean()) for k in state["ks"]},
+        "mrr": float((1 / ranks).mean()),
+        "score_ms_per_query": elapsed * 1000 / len(expected),
+    }
+
+
+def time_hybrid_rank(queries, query_vectors, weights, top_k):
+    """
+    p50 latency of the production hybrid_rank_memories path at `top_k`,
+    with embeddings precomputed.
+    """
+
+    memories = Memory.objects.all()
+    latencies = []
+    for query, vector in zip(queries, query_vectors):
+        started = time.perf_counter()
+        hybrid_rank_memories(query, memories, *weights, top_k=top_k, query_embedding=vector)
+        latencies.append(time.perf_counter() - started)
+    return float(np.percentile(latencies, 50) * 1000)
+
+
+def production_recall(dataset, query_vectors, weights, top_k):
+    """
+    Recall@top_k through hybrid_rank_memories itself, candidate
+    pooling included, as a check on the matrix sweep.
+    """
+
+    memories = Memory.objects.all()
+    hits = 0
+    for item, vector in zip(dataset, query_vectors):
+        results = hybrid_rank_memories(
+            item["query"], memories, *weights, top_k=top_k, query_embedding=vector
+        )
+        hits += item["expected_memory"] in [result["content"] for result in results]
+    return hits / len(dataset)
+
+
+def evaluate_sweep(dataset_path=DEFAULT_DATASET, step=0.1, ks=(1, 3, 5), workers=None):
+    """
+    Sweeps hybrid ranking weights and top-k over the dataset.
+
+    The dataset is inserted and embedded once, the hybrid score
+    components of every query against every memory are computed once
+    through the retrieval service, and each weighting is then scored
+    as a single matrix expression across a process pool. Production
+    latency and recall are measured per top-k for the best weighting.
+    """
+
+    dataset = load_dataset(dataset_path)
+    clear_database()
+    insert_memories(dataset)
+
+    queries = [item["query"] for item in dataset]
+    query_vectors = get_embeddings(queries)
+
+    started = time.perf_counter()
+    components = hybrid_score_matrix(queries, Memory.objects.all(), query_vectors)
+    component_seconds = time.perf_counter() - started
+
+    column = {content: i for i, content in reversed(list(enumerate(components["contents"])))}
+    expected = np.array([column.get(item["expected_memory"], -1) for item in dataset])
+
+    grid = weight_grid(step)
+    ks = tuple(sorted(ks))
+
+    print("\n========== HYBRID WEIGHT SWEEP ==========\n")
+    print(
+        f"{len(queries)} queries x {len(components['ids'])} memories, "
+        f"{len(grid)} weightings, components in {component_seconds:.2f}s\n"
+    )
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_sweep_worker,
+        initargs=(
+            components["semantic"], components["keyword"], components["importance"],
+            expected, ks
+        )
+    ) as pool:
+        results = list(pool.map(score_weights, grid, chunksize=max(1, len(grid) // 64)))
+
+    results.sort(key=lambda result: (result["mrr"], result["recall"][ks[-1]]), reverse=True)
+    best = results[0]
+    best_weights = (best["alpha"], best["beta"], best["gamma"])
+
+    latency = {k: time_hybrid_rank(queries, query_vectors, best_weights, k) for k in ks}
+    pooled = {k: production_recall(dataset, query_vectors, best_weights, k) for k in ks}
+
+    header = (
+        f"{'alpha':>5} {'beta':>5} {'gamma':>5}  "
+        + "  ".join(f"R@{k:<4}" for k in ks)
+        + f"  {'MRR':>6}  {'score ms/q':>10}"
+    )
+    lines = [header]
+    for result in results:
+        lines.append(
+            f"{result['alpha']:>5.2f} {result['beta']:>5.2f} {result['gamma']:>5.2f}  "
+            + "  ".join(f"{result['recall'][k]:.4f}" for k in ks)
+            + f"  {result['mrr']:>6.4f}  {result['score_ms_per_query']:>10.4f}"
+        )
+
+    summary = [
+        f"Best weights: alpha={best['alpha']:.2f} beta={best['beta']:.2f} gamma={best['gamma']:.2f}",
+    ] + [
+        f"top_k={k}: hybrid_rank_memories p50 {latency[k]:.3f} ms, "
+        f"recall {pooled[k]:.4f} (candidate pool) vs {best['recall'][k]:.4f} (full ranking)"
+        for k in ks
+    ]
+
+    for line in lines[:11]:
+        print(line)
+    print()
+    for line in summary:
+        print(line)
+
+    report_path = os.path.join(os.path.dirname(__file__), "sweep_report.txt")
+
+    with open(report_path, "w") as f:
+        f.write("========== HYBRID WEIGHT SWEEP REPORT ==========\n\n")
+        f.write("\n".join(summary) + "\n\n")
+        f.write("\n".join(lines) + "\n")
+
+    print(f"\nSweep report saved to: {report_path}")
+
+
+# -------------------------------
+# Quantization Recall
+# -------------------------------
+
+def evaluate_quantization(k=3, dataset_path=DEFAULT_DATASET):
+    """
+    Compares the int8 and binary two-stage indexes against the exact
+    index on the dataset: recall@k versus exact search, plus Top-1
+    accuracy and resident bytes of the scanned representation.
+    """
+
+    dataset = load_dataset(dataset_path)
+    contents = [item["memory"] for item in dataset]
+    memory_vectors = get_embeddings(contents)
+    query_vectors = get_embeddings([item["query"] for item in dataset])
+
+    ids = np.arange(1, len(dataset) + 1)
+    vectors_by_id = dict(zip(ids.tolist(), memory_vectors))
+    content_by_id = dict(zip(ids.tolist(), contents))
+
+    def load_vectors(memory_ids):
+        return {memory_id: vectors_by_id[memory_id] for memory_id in memory_ids}
+
+    indexes = {"exact": VectorIndex()}
+    for codec in ("int8", "binary"):
+        indexes[codec] = QuantizedIndex(codec=codec, vector_loader=load_vectors)
+
+    print("\n========== QUANTIZATION RECALL ==========\n")
+
+    lines = []
+    for name, index in indexes.items():
+        index.add(ids, memory_vectors)
+
+        recall = measure_recall(index, query_vectors, k)
+        top1 = sum(
+            content_by_id[int(index.search(query, 1)[0][0])] == item["expected_memory"]
+            for query, item in zip(query_vectors, dataset)
+        ) / len(dataset)
+        _, rows = index.snapshot()
+
+        line = (
+            f"{name:<7} Recall@{k} vs exact: {recall:.4f}  "
+            f"Top-1 Accuracy: {top1:.4f}  Scanned bytes: {rows.nbytes}"
+        )
+        print(line)
+        lines.append(line)
+
+    report_path = os.path.join(os.path.dirname(__file__), "quantization_report.txt")
+
+    with open(report_path, "w") as f:
+        f.write("========== QUANTIZATION RECALL REPORT ==========\n\n")
+        f.write("\n".join(lines) + "\n")
+
+    print(f"\nQuantization report saved to: {report_path}")
+
+
 # -------------------------------
 # Run
 # -------------------------------
 
 if __name__ == "__main__":
-    evaluate()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Memory retrieval evaluator")
+    parser.add_argument(
+        "--quantization",
+        action="store_true",
+        help="Report recall of the int8/binary two-stage indexes against exact search"
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="Sweep hybrid ranking weights and top-k, reporting recall@k, MRR and latency"
+    )
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="Path to a dataset JSON file")
+    parser.add_argument("--step", type=float, default=0.1, help="Weight grid step for --sweep")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5], help="Top-k values for --sweep")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --sweep")
+    args = parser.parse_args()
+
+    if args.quantization:
+        evaluate_quantization(dataset_path=args.dataset)
+    elif args.sweep:
+        evaluate_sweep(args.dataset, step=args.step, ks=args.k, workers=args.workers)
+    else:
+        evaluate(args.dataset)
\ No newline at end of file
@@ -1,4 +1,7 @@
 from django.contrib import admin
-from .models import Memory
+from .models import ChatSession, ChatTurn, IngestionJob, Memory
 
 admin.site.register(Memory)
+admin.site.register(IngestionJob)
+admin.site.register(ChatSession)
+admin.site.register(ChatTurn)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MemoryAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'memory_app'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals
+
+        post_migrate.connect(signals.sync_keyword_index, sender=self)
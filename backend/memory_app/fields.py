@@ -0,0 +1,90 @@
+import base64
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+
+
+# Every blob starts with a 4-byte header: b"EMB" plus the numpy type code
+# of the payload. Four bytes keep float16/float32 payloads aligned.
+EMBEDDING_MAGIC = b"EMB"
+EMBEDDING_HEADER_SIZE = 4
+
+STORAGE_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+
+def storage_dtype():
+    """
+    Returns the numpy dtype new embeddings are written with,
+    from settings.EMBEDDING_STORAGE_DTYPE (float32 by default).
+    """
+
+    name = getattr(settings, "EMBEDDING_STORAGE_DTYPE", "float32")
+
+    try:
+        return STORAGE_DTYPES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported EMBEDDING_STORAGE_DTYPE {name!r}, "
+            f"expected one of {sorted(STORAGE_DTYPES)}"
+        )
+
+
+def encode_embedding(vector, dtype=None):
+    """
+    Packs a vector (list or ndarray) into the binary blob format.
+    """
+
+    dtype = np.dtype(dtype) if dtype is not None else storage_dtype()
+    payload = np.asarray(vector, dtype=dtype.newbyteorder("<")).reshape(-1)
+    return EMBEDDING_MAGIC + dtype.char.encode() + payload.tobytes()
+
+
+def decode_embedding(blob):
+    """
+    Zero-copy read of a binary blob into a read-only 1-D ndarray.
+    """
+
+    header = bytes(blob[:EMBEDDING_HEADER_SIZE])
+    if len(header) != EMBEDDING_HEADER_SIZE or header[:3] != EMBEDDING_MAGIC:
+        raise ValueError("Not a binary embedding blob")
+
+    dtype = np.dtype(header[3:].decode()).newbyteorder("<")
+    return np.frombuffer(blob, dtype=dtype, offset=EMBEDDING_HEADER_SIZE)
+
+
+class EmbeddingField(models.BinaryField):
+    """
+    Stores an embedding vector as a compact BLOB.
+
+    Values come back from the database as ndarrays that view the row
+    buffer directly; lists and ndarrays are accepted on write.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decode_embedding(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, (list, tuple)):
+            return np.asarray(value, dtype=np.float32)
+        if isinstance(value, str):
+            value = base64.b64decode(value.encode("ascii"))
+        return decode_embedding(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is not None and not isinstance(value, (bytes, memoryview)):
+            value = encode_embedding(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        if value is None:
+            return value
+        return base64.b64encode(encode_embedding(value)).decode("ascii")
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from memory_app.models import Memory
+from memory_app.services.embedding import EMBEDDING_BACKENDS, load_model
+from memory_app.services.index import normalize, top_k_indices
+
+DATASET_PATH = Path(settings.BASE_DIR) / "evaluator" / "dataset.json"
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes (Linux), or None.
+    """
+
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def sample_texts(limit):
+    """
+    Up to `limit` stored memories, topped up with the evaluator's
+    memories and queries when the store is small.
+    """
+
+    texts = list(Memory.objects.order_by("id").values_list("content", flat=True)[:limit])
+
+    if len(texts) < limit and DATASET_PATH.exists():
+        for item in json.loads(DATASET_PATH.read_text()):
+            texts.extend([item["memory"], item["query"]])
+
+    return list(dict.fromkeys(texts))[:limit]
+
+
+def throughput(model, texts, batch_size, repeat):
+    """
+    Best-of-`repeat` texts per second, after one warm-up batch.
+    """
+
+    model.encode(texts[:batch_size], batch_size=batch_size)
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        vectors = model.encode(texts, batch_size=batch_size)
+        best = min(best, time.perf_counter() - started)
+
+    return len(texts) / best, np.asarray(vectors, dtype=np.float32)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares an embedding backend against the torch reference: cosine "
+        "drift, nearest-neighbour agreement, encode throughput and RSS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend", choices=[b for b in EMBEDDING_BACKENDS if b != "torch"],
+            default="onnx-int8",
+            help="Backend to check against torch (default: onnx-int8)."
+        )
+        parser.add_argument("--samples", type=int, default=500, help="Texts to encode.")
+        parser.add_argument("--batch-size", type=int, default=64)
+        parser.add_argument("--repeat", type=int, default=3, help="Timed passes per backend.")
+        parser.add_argument("--top-k", type=int, default=10, help="Neighbours compared per query.")
+        parser.add_argument(
+            "--min-cosine", type=float, default=0.99,
+            help="Fail if the mean cosine to the reference is below this."
+        )
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        texts = sample_texts(options["samples"])
+        if len(texts) < 2:
+            raise CommandError("Need at least two texts; store some memories first.")
+
+        report = {
+            "model": settings.EMBEDDING_MODEL_NAME,
+            "samples": len(texts),
+            "intra_op_threads": settings.EMBEDDING_INTRA_OP_THREADS,
+            "inter_op_threads": settings.EMBEDDING_INTER_OP_THREADS,
+            "backends": {},
+        }
+        vectors = {}
+
+        for backend in ("torch", options["backend"]):
+            rss_before = current_rss()
+            started = time.perf_counter()
+            model = load_model(backend)
+            load_seconds = time.perf_counter() - started
+            rss_after = current_rss()
+
+            texts_per_second, encoded = throughput(
+                model, texts, options["batch_size"], options["repeat"]
+            )
+            vectors[backend] = normalize(encoded)
+
+            report["backends"][backend] = {
+                "load_seconds": round(load_seconds, 3),
+                # Growth of this process while loading; the first backend
+                # also pays for importing the libraries
+                "rss_load_mb": (
+                    round((rss_after - rss_before) / 2 ** 20, 1) if rss_before is not None else None
+                ),
+                "texts_per_second": round(texts_per_second, 1),
+            }
+            del model
+
+        reference, candidate = vectors["torch"], vectors[options["backend"]]
+        cosines = np.einsum("ij,ij->i", reference, candidate)
+
+        # Do both backends retrieve the same neighbours for each text?
+        k = min(options["top_k"], len(texts) - 1)
+        overlaps = []
+        for position in range(len(texts)):
+            expected = set(top_k_indices(reference @ reference[position], k + 1).tolist()) - {position}
+            found = set(top_k_indices(candidate @ candidate[position], k + 1).tolist()) - {position}
+            overlaps.append(len(expected & found) / max(1, len(expected)))
+
+        report["parity"] = {
+            "mean_cosine": round(float(cosines.mean()), 6),
+            "min_cosine": round(float(cosines.min()), 6),
+            "p01_cosine": round(float(np.percentile(cosines, 1)), 6),
+            f"top{k}_overlap": round(float(np.mean(overlaps)), 4),
+        }
+        speedup = (
+            report["backends"][options["backend"]]["texts_per_second"]
+            / report["backends"]["torch"]["texts_per_second"]
+        )
+        report["speedup"] = round(speedup, 2)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print(report)
+
+        if report["parity"]["mean_cosine"] < options["min_cosine"]:
+            raise CommandError(
+                f"Mean cosine {report['parity']['mean_cosine']} is below {options['min_cosine']}"
+            )
+
+    def _print(self, report):
+        self.stdout.write(f"Model {report['model']}, {report['samples']} texts")
+        self.stdout.write(f"{'backend':<12}{'load s':>10}{'RSS MB':>10}{'texts/s':>12}")
+        for backend, stats in report["backends"].items():
+            rss = "-" if stats["rss_load_mb"] is None else stats["rss_load_mb"]
+            self.stdout.write(
+                f"{backend:<12}{stats['load_seconds']:>10}{rss:>10}{stats['texts_per_second']:>12}"
+            )
+        for name, value in report["parity"].items():
+            self.stdout.write(f"{name:<22}{value}")
+        self.stdout.write(self.style.SUCCESS(f"Speedup over torch: {report['speedup']}x"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from memory_app.services.embedding import CACHE_MODEL, get_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Invalidates cached embeddings, e.g. after changing EMBEDDING_MODEL_NAME "
+        "or EMBEDDING_BACKEND."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            help="Only drop vectors computed by this model (name@backend, or a bare name for every backend)."
+        )
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Drop vectors from every model and backend except the configured one."
+        )
+
+    def handle(self, *args, **options):
+        if options["model"]:
+            get_cache().invalidate(model_name=options["model"])
+            target = f"model {options['model']!r}"
+        elif options["stale"]:
+            get_cache().invalidate(keep_model=CACHE_MODEL)
+            target = f"every model except {CACHE_MODEL!r}"
+        else:
+            get_cache().invalidate()
+            target = "every model"
+
+        self.stdout.write(self.style.SUCCESS(f"Cleared cached embeddings for {target}."))
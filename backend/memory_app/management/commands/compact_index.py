@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from memory_app.models import Memory
+from memory_app.namespaces import is_valid_namespace
+from memory_app.services.index import get_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Folds the delta logs of memory-mapped index snapshots into a new "
+        "generation (MEMORY_INDEX_BACKEND=mmap)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--namespace", help="Only compact this namespace (default: all).")
+        parser.add_argument(
+            "--interval", type=float,
+            help="Keep running, compacting every this many seconds."
+        )
+
+    def handle(self, *args, **options):
+        if settings.MEMORY_INDEX_BACKEND != "mmap":
+            raise CommandError("Snapshots are only used with MEMORY_INDEX_BACKEND=mmap")
+
+        namespace = options["namespace"]
+        if namespace is not None and not is_valid_namespace(namespace):
+            raise CommandError(f"Invalid namespace {namespace!r}")
+
+        if not options["interval"]:
+            self._run(namespace)
+            return
+
+        self.stdout.write(f"Compacting every {options['interval']}s (Ctrl+C to stop)...")
+        try:
+            while True:
+                self._run(namespace)
+                close_old_connections()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Stopped."))
+
+    def _run(self, namespace):
+        if namespace is not None:
+            namespaces = [namespace]
+        else:
+            namespaces = list(
+                Memory.objects.order_by("namespace").values_list("namespace", flat=True).distinct()
+            )
+
+        compacted = 0
+        for name in namespaces:
+            index = get_index(name)
+            if not index.delta_records:
+                continue
+
+            stats = index.compact()
+            if stats is None:
+                self.stdout.write(f"{name}: another process is compacting, skipped")
+                continue
+
+            compacted += 1
+            self.stdout.write(
+                f"{name}: generation {stats['generation']}, {stats['rows']} rows "
+                f"({stats['folded']} delta records folded)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {compacted} of {len(namespaces)} namespaces."
+        ))
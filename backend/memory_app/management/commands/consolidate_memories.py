@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from memory_app.namespaces import is_valid_namespace
+from memory_app.services.consolidation import CONSOLIDATION_BLOCK_SIZE, consolidate_memories
+from memory_app.services.ingestion import DUPLICATE_THRESHOLD
+
+
+class Command(BaseCommand):
+    help = "Merges clusters of near-duplicate memories and reports how much the corpus shrank."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--namespace", help="Only consolidate this namespace (default: all).")
+        parser.add_argument(
+            "--threshold", type=float, default=DUPLICATE_THRESHOLD,
+            help=f"Cosine similarity at which memories are merged (default {DUPLICATE_THRESHOLD})."
+        )
+        parser.add_argument(
+            "--block-size", type=int, default=CONSOLIDATION_BLOCK_SIZE,
+            help="Rows per side of each similarity block."
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be merged without changing anything."
+        )
+        parser.add_argument(
+            "--interval", type=float,
+            help="Keep running, consolidating every this many seconds."
+        )
+
+    def handle(self, *args, **options):
+        namespace = options["namespace"]
+        if namespace is not None and not is_valid_namespace(namespace):
+            raise CommandError(f"Invalid namespace {namespace!r}")
+
+        if not options["interval"]:
+            self._run(options)
+            return
+
+        self.stdout.write(f"Consolidating every {options['interval']}s (Ctrl+C to stop)...")
+        try:
+            while True:
+                self._run(options)
+                close_old_connections()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Stopped."))
+
+    def _run(self, options):
+        started = time.perf_counter()
+        results = consolidate_memories(
+            options["namespace"], options["threshold"],
+            options["block_size"], options["dry_run"]
+        )
+        elapsed = time.perf_counter() - started
+
+        for stats in results:
+            if stats["removed"] or options["verbosity"] > 1:
+                self.stdout.write(
+                    f"{stats['namespace']}: {stats['before']} -> {stats['after']} memories "
+                    f"({stats['clusters']} clusters, {stats['removed']} merged away)"
+                )
+
+        before = sum(stats["before"] for stats in results)
+        removed = sum(stats["removed"] for stats in results)
+        shrink = removed / before if before else 0.0
+        verb = "Would remove" if options["dry_run"] else "Removed"
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {removed} of {before} memories ({shrink:.1%}) "
+            f"across {len(results)} namespaces in {elapsed:.2f}s."
+        ))
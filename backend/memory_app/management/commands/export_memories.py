@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from memory_app.namespaces import is_valid_namespace
+from memory_app.services.transfer import export_memories
+
+
+class Command(BaseCommand):
+    help = "Exports memories as NDJSON, oldest first."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-",
+            help="File to write, or '-' for stdout (default)."
+        )
+        parser.add_argument("--namespace", help="Only export this namespace (default: all).")
+        parser.add_argument(
+            "--embeddings",
+            action="store_true",
+            help="Include stored vectors so re-importing with the same model skips encoding."
+        )
+
+    def handle(self, *args, **options):
+        namespace = options["namespace"]
+        if namespace is not None and not is_valid_namespace(namespace):
+            raise CommandError(f"Invalid namespace {namespace!r}")
+
+        chunks = export_memories(namespace, options["embeddings"])
+
+        if options["path"] == "-":
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+
+        with open(options["path"], "w", encoding="utf-8") as output:
+            for chunk in chunks:
+                output.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported memories to {options['path']}"))
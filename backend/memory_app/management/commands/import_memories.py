@@ -0,0 +1,66 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from memory_app.namespaces import is_valid_namespace
+from memory_app.services.ingestion import DUPLICATE_THRESHOLD
+from memory_app.services.transfer import IMPORT_BATCH_SIZE, import_memories
+
+
+class Command(BaseCommand):
+    help = "Imports memories from an NDJSON file (one JSON object with a 'content' field per line)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file to read, or '-' for stdin.")
+        parser.add_argument(
+            "--namespace",
+            help="Import every line into this namespace (default: each line's own, else 'default')."
+        )
+        parser.add_argument(
+            "--no-dedup",
+            action="store_true",
+            help="Keep near-duplicates instead of dropping them, e.g. when restoring an export."
+        )
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            "--workers", type=int, default=2,
+            help="Threads embedding upcoming chunks while earlier ones are written."
+        )
+
+    def handle(self, *args, **options):
+        namespace = options["namespace"]
+        if namespace is not None and not is_valid_namespace(namespace):
+            raise CommandError(f"Invalid namespace {namespace!r}")
+
+        started = time.perf_counter()
+
+        if options["path"] == "-":
+            summary = self._import(sys.stdin.buffer, options)
+        else:
+            try:
+                # Bytes, so undecodable lines count as invalid instead of aborting
+                with open(options["path"], "rb") as lines:
+                    summary = self._import(lines, options)
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - started
+
+        for error in summary["errors"]:
+            self.stderr.write(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['imported']} of {summary['read']} lines in {elapsed:.1f}s "
+            f"({summary['duplicates']} duplicates, {summary['invalid']} invalid, "
+            f"{summary['encoded']} embedded)."
+        ))
+
+    def _import(self, lines, options):
+        return import_memories(
+            lines,
+            namespace=options["namespace"],
+            threshold=None if options["no_dedup"] else DUPLICATE_THRESHOLD,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+        )
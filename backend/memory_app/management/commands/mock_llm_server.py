@@ -0,0 +1,167 @@
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockCompletionsHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OpenAI-compatible /v1/chat/completions, plain and streamed.
+    Behaviour comes from the server's `options`.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.options["verbosity"] > 1:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._send_json(200, {"object": "list", "data": [
+                {"id": "mock", "object": "model", "owned_by": "mock"}
+            ]})
+        self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "Not found"}})
+
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "Invalid JSON"}})
+
+        options = self.server.options
+        time.sleep(max(0.0, random.gauss(options["latency"], options["jitter"])))
+
+        if random.random() < options["error_rate"]:
+            return self._send_json(
+                503, {"error": {"message": "Mock upstream overloaded", "type": "server_error"}}
+            )
+
+        model = request.get("model", "mock")
+        prompt_tokens = sum(
+            estimate_tokens(str(message.get("content", "")))
+            for message in request.get("messages", [])
+        )
+        reply = options["reply"]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": estimate_tokens(reply),
+            "total_tokens": prompt_tokens + estimate_tokens(reply),
+        }
+
+        if request.get("stream"):
+            return self._stream(model, reply, usage, request)
+
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, model, reply, usage, request):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def chunk(choices, **extra):
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(data)}\n\n".encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        words = reply.split(" ")
+        for position, word in enumerate(words):
+            token = word if position == 0 else " " + word
+            self.wfile.write(chunk([{"index": 0, "delta": {"content": token}, "finish_reason": None}]))
+            self.wfile.flush()
+            time.sleep(self.server.options["token_delay"])
+
+        self.wfile.write(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self.wfile.write(chunk([], usage=usage))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_json(self, status_code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local OpenAI-compatible chat completions server for tests "
+        "and load runs. Point OPENAI_BASE_URL at http://HOST:PORT/v1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--latency", type=float, default=0.2,
+            help="Mean seconds before each response starts."
+        )
+        parser.add_argument(
+            "--jitter", type=float, default=0.0,
+            help="Standard deviation of the latency, in seconds."
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0.0,
+            help="Fraction of requests answered with 503, to exercise retries."
+        )
+        parser.add_argument(
+            "--token-delay", type=float, default=0.02,
+            help="Seconds between streamed words."
+        )
+        parser.add_argument(
+            "--reply", default="This is a mock completion.",
+            help="Text returned by every completion."
+        )
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer((options["host"], options["port"]), MockCompletionsHandler)
+        server.daemon_threads = True
+        server.options = options
+
+        self.stdout.write(
+            f"Mock LLM server on http://{options['host']}:{options['port']}/v1 "
+            f"(latency {options['latency']}s, error rate {options['error_rate']:.0%}); Ctrl+C to stop."
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Stopped."))
+        finally:
+            server.server_close()
@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from memory_app.services.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Processes queued ingestion jobs (use with INGESTION_WORKER=command)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue once and exit instead of polling."
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=settings.INGESTION_POLL_INTERVAL,
+            help="Seconds to sleep when the queue is empty."
+        )
+
+    def handle(self, *args, **options):
+        if settings.MEMORY_INDEX_BACKEND != "mmap" and settings.MEMORY_INDEX_CHECK_INTERVAL is None:
+            # Web processes would never load the memories stored here
+            raise CommandError(
+                "Separate ingestion workers need MEMORY_INDEX_CHECK_INTERVAL "
+                "or MEMORY_INDEX_BACKEND=mmap"
+            )
+
+        if options["once"]:
+            processed = run_pending_jobs()
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} ingestion jobs."))
+            return
+
+        self.stdout.write("Waiting for ingestion jobs (Ctrl+C to stop)...")
+        try:
+            while True:
+                processed = run_pending_jobs()
+                if processed:
+                    self.stdout.write(f"Processed {processed} ingestion jobs.")
+                close_old_connections()
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Stopped."))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from memory_app.services.sessions import prune_sessions
+
+
+class Command(BaseCommand):
+    help = "Deletes chat sessions idle for longer than CHAT_SESSION_TTL (run it from cron)."
+
+    def handle(self, *args, **options):
+        if settings.CHAT_SESSION_TTL is None:
+            self.stdout.write("CHAT_SESSION_TTL is None; sessions never expire.")
+            return
+
+        deleted = prune_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired chat sessions."))
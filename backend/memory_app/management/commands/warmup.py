@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from memory_app.services.startup import warmup
+
+
+class Command(BaseCommand):
+    help = "Preloads the embedding model, LLM client and vector index, and reports startup timings."
+
+    def handle(self, *args, **options):
+        timings = warmup()
+
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name:<36} {seconds * 1000:10.1f} ms")
+
+        self.stdout.write(self.style.SUCCESS("Warm-up complete."))
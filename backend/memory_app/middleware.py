@@ -0,0 +1,59 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .services.metrics import (
+    REQUEST_SECONDS, REQUESTS, begin_request, end_request, server_timing_header
+)
+
+
+class ServerTimingMiddleware:
+    """
+    Times each request, records it in the request metrics and reports
+    its stages in a Server-Timing header.
+
+    For streamed responses the timings cover the work done before the
+    first byte; stages that run while streaming only reach /metrics.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = begin_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = end_request(token)
+
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        token = begin_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = end_request(token)
+
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    def _finish(self, request, response, timings, elapsed):
+        # Label by URL pattern, not path, to keep cardinality bounded
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match is not None else "unmatched"
+
+        REQUEST_SECONDS.observe(elapsed, route=route, method=request.method)
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+
+        response["Server-Timing"] = server_timing_header(timings, elapsed)
+        return response
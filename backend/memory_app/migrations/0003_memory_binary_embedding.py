@@ -0,0 +1,74 @@
+from django.db import migrations, models
+
+import memory_app.fields
+from memory_app.fields import encode_embedding
+
+
+BATCH_SIZE = 1000
+
+
+def json_to_blob(apps, schema_editor):
+    Memory = apps.get_model("memory_app", "Memory")
+
+    batch = []
+    for memory in Memory.objects.only("id", "embedding").iterator(chunk_size=BATCH_SIZE):
+        memory.embedding_blob = encode_embedding(memory.embedding)
+        batch.append(memory)
+
+        if len(batch) >= BATCH_SIZE:
+            Memory.objects.bulk_update(batch, ["embedding_blob"])
+            batch = []
+
+    if batch:
+        Memory.objects.bulk_update(batch, ["embedding_blob"])
+
+
+def blob_to_json(apps, schema_editor):
+    Memory = apps.get_model("memory_app", "Memory")
+
+    batch = []
+    for memory in Memory.objects.only("id", "embedding_blob").iterator(chunk_size=BATCH_SIZE):
+        memory.embedding = memory.embedding_blob.astype(float).tolist()
+        batch.append(memory)
+
+        if len(batch) >= BATCH_SIZE:
+            Memory.objects.bulk_update(batch, ["embedding"])
+            batch = []
+
+    if batch:
+        Memory.objects.bulk_update(batch, ["embedding"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memory_app', '0002_memory_importance_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='embedding_blob',
+            field=memory_app.fields.EmbeddingField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='memory',
+            name='embedding',
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(json_to_blob, blob_to_json),
+        migrations.RemoveField(
+            model_name='memory',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='memory',
+            old_name='embedding_blob',
+            new_name='embedding',
+        ),
+        migrations.AlterField(
+            model_name='memory',
+            name='embedding',
+            field=memory_app.fields.EmbeddingField(),
+        ),
+    ]
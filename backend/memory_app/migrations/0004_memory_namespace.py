@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memory_app', '0003_memory_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='namespace',
+            field=models.CharField(db_index=True, default='default', max_length=64),
+        ),
+    ]
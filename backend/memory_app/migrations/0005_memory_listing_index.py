@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memory_app', '0004_memory_namespace'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='memory',
+            index=models.Index(fields=['namespace', '-created_at', '-id'], name='memory_namespace_created_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memory_app', '0007_chat_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='access_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='last_accessed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='memory',
+            index=models.Index(fields=['namespace', '-last_accessed_at'], name='memory_namespace_accessed_idx'),
+        ),
+    ]
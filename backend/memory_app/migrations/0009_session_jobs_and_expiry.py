@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memory_app', '0008_memory_access_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='kind',
+            field=models.CharField(choices=[('extract', 'Extract memories'), ('compact', 'Compact chat session')], default='extract', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='memory_app.chatsession'),
+        ),
+        migrations.AlterField(
+            model_name='ingestionjob',
+            name='text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['updated_at'], name='chatsession_updated_idx'),
+        ),
+    ]
@@ -1,11 +1,140 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
+
+from .fields import EmbeddingField
+from .namespaces import DEFAULT_NAMESPACE, NAMESPACE_MAX_LENGTH
 
 class Memory(models.Model):
+    namespace = models.CharField(
+        max_length=NAMESPACE_MAX_LENGTH,
+        default=DEFAULT_NAMESPACE,
+        db_index=True
+    )
     content = models.TextField()
-    embedding = models.JSONField()
+    embedding = EmbeddingField()
     created_at = models.DateTimeField(auto_now_add=True)
     importance_score = models.FloatField(default=0.5)
+    # How often retrieval returned this memory; flushed in batches
+    access_count = models.PositiveIntegerField(default=0)
+    last_accessed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a namespace's listing, newest first
+            models.Index(
+                fields=["namespace", "-created_at", "-id"],
+                name="memory_namespace_created_idx"
+            ),
+            # Selecting a namespace's hot tier, most recently used first
+            models.Index(
+                fields=["namespace", "-last_accessed_at"],
+                name="memory_namespace_accessed_idx"
+            ),
+        ]
 
 
     def __str__(self):
         return self.content[:50]
+
+
+class IngestionJob(models.Model):
+    """
+    Queued work processed outside the request by a background worker:
+    extraction of memories from a piece of text, or compaction of a
+    chat session's older turns into its summary.
+    """
+
+    EXTRACT = "extract"
+    COMPACT = "compact"
+    KIND_CHOICES = [
+        (EXTRACT, "Extract memories"),
+        (COMPACT, "Compact chat session"),
+    ]
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default=EXTRACT)
+    namespace = models.CharField(max_length=NAMESPACE_MAX_LENGTH, default=DEFAULT_NAMESPACE)
+    text = models.TextField(blank=True, default="")
+    # Set for compaction jobs
+    session = models.ForeignKey(
+        "ChatSession", null=True, blank=True, on_delete=models.SET_NULL, related_name="jobs"
+    )
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    extracted_count = models.PositiveIntegerField(default=0)
+    memory_ids = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Not claimed before this time; pushed back when a retry is scheduled
+    available_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest pending job
+            models.Index(fields=["status", "id"], name="ingestionjob_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"IngestionJob {self.id} ({self.status})"
+
+
+class ChatSession(models.Model):
+    """
+    Server-side conversation. Recent turns are kept verbatim; older
+    ones are folded into `summary` as the token budget is exceeded.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    namespace = models.CharField(max_length=NAMESPACE_MAX_LENGTH, default=DEFAULT_NAMESPACE)
+    summary = models.TextField(blank=True, default="")
+    # Turns with an id up to this one are covered by the summary
+    summarized_through = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Expired sessions are found by last activity
+            models.Index(fields=["updated_at"], name="chatsession_updated_idx"),
+        ]
+
+    def __str__(self):
+        return f"ChatSession {self.id}"
+
+
+class ChatTurn(models.Model):
+    USER = "user"
+    ASSISTANT = "assistant"
+    ROLE_CHOICES = [
+        (USER, "User"),
+        (ASSISTANT, "Assistant"),
+    ]
+
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name="turns")
+    role = models.CharField(max_length=16, choices=ROLE_CHOICES)
+    content = models.TextField()
+    token_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Unsummarized turns of a session, in order
+            models.Index(fields=["session", "id"], name="chatturn_session_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.role}: {self.content[:50]}"
@@ -0,0 +1,14 @@
+import re
+
+
+# Memories, indexes and chats are scoped to a namespace (one per user
+# or tenant). Requests without one use DEFAULT_NAMESPACE.
+DEFAULT_NAMESPACE = "default"
+NAMESPACE_MAX_LENGTH = 64
+
+# Also used in index file names, so no path separators or leading dot
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,63}$")
+
+
+def is_valid_namespace(namespace):
+    return isinstance(namespace, str) and bool(NAMESPACE_PATTERN.match(namespace))
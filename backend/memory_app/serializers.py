@@ -1,7 +1,47 @@
 from rest_framework import serializers
-from .models import Memory
+from .models import ChatSession, ChatTurn, IngestionJob, Memory
 
 class MemorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Memory
-        fields = ["id", "content", "importance_score", "created_at"]
+        fields = ["id", "namespace", "content", "importance_score", "created_at"]
+
+
+class IngestionJobSerializer(serializers.ModelSerializer):
+    stored_count = serializers.SerializerMethodField()
+    memories = serializers.SerializerMethodField()
+
+    class Meta:
+        model = IngestionJob
+        fields = [
+            "id", "kind", "namespace", "status", "attempts", "error",
+            "extracted_count", "stored_count", "memories",
+            "created_at", "started_at", "finished_at",
+        ]
+
+    def get_stored_count(self, job):
+        return len(job.memory_ids)
+
+    def get_memories(self, job):
+        # Memories deleted since the job ran are left out
+        memories = Memory.objects.filter(id__in=job.memory_ids).order_by("id")
+        return MemorySerializer(memories, many=True).data
+
+
+class ChatTurnSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatTurn
+        fields = ["id", "role", "content", "created_at"]
+
+
+class ChatSessionSerializer(serializers.ModelSerializer):
+    recent_turns = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChatSession
+        fields = ["id", "namespace", "summary", "recent_turns", "created_at", "updated_at"]
+
+    def get_recent_turns(self, session):
+        # Turns already folded into the summary are not repeated
+        turns = session.turns.filter(id__gt=session.summarized_through).order_by("id")
+        return ChatTurnSerializer(turns, many=True).data
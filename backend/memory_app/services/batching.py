@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent encode requests into batched model calls.
+
+    Callers submit texts and get a Future for their rows. A single
+    worker thread takes the oldest request, keeps collecting requests
+    until `max_batch_size` texts are queued or `max_wait_ms` has passed,
+    encodes the unique texts in one call and resolves every Future.
+
+    The worker only waits for a batch to fill while there is concurrent
+    traffic (the previous batch coalesced several requests, or more are
+    already queued), so a lone request is never delayed.
+    """
+
+    def __init__(self, encode, max_batch_size=64, max_wait_ms=5):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.batches = 0
+        self.texts = 0
+        self.batch_sizes = Counter()
+        self._last_request_count = 0
+
+    def submit(self, texts):
+        """
+        Queues texts for encoding. The Future resolves to a
+        (len(texts), dim) float32 matrix.
+        """
+
+        self._ensure_worker()
+
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode_many(self, texts):
+        """
+        Blocking helper: submit and wait for the result.
+        """
+
+        return self.submit(texts).result()
+
+    def stats(self):
+        """
+        Queue depth and batch-size metrics.
+        """
+
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "texts": self.texts,
+                "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="embedding-batcher",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        requests = [self._queue.get()]
+        size = len(requests[0][0])
+
+        idle = self._last_request_count <= 1 and self._queue.empty()
+        deadline = time.monotonic() + (0 if idle else self.max_wait)
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request[0])
+
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+
+            unique = list(dict.fromkeys(
+                text for texts, _ in requests for text in texts
+            ))
+
+            try:
+                encoded = np.asarray(self.encode(unique), dtype=np.float32)
+            except Exception as exc:
+                for _, future in requests:
+                    future.set_exception(exc)
+                continue
+
+            self._last_request_count = len(requests)
+
+            rows = {text: position for position, text in enumerate(unique)}
+            for texts, future in requests:
+                future.set_result(encoded[[rows[text] for text in texts]])
+
+            with self._stats_lock:
+                self.batches += 1
+                self.texts += len(unique)
+                self.batch_sizes[len(unique)] += 1
@@ -1,31 +1,54 @@
-from openai import OpenAI
-from django.conf import settings
-from .embedding import get_embedding, cosine_similarity
+from . import llm
+from .embedding import get_embedding
+from .metrics import stage
+from .response_cache import context_key, get_response_cache
+from .tiering import record_access, tiered_search
 from memory_app.models import Memory
+from memory_app.namespaces import DEFAULT_NAMESPACE
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+CHAT_MODEL = "gpt-4o-mini"
+CHAT_TEMPERATURE = 0.3
 
 
-def retrieve_relevant_memories(query, top_k=3):
-    query_embedding = get_embedding(query)
-    memories = Memory.objects.all()
+def retrieve_relevant_memories(query, top_k=3, namespace=DEFAULT_NAMESPACE):
+    with stage("embed"):
+        query_embedding = get_embedding(query)
+
+    with stage("retrieve"):
+        ids, scores = tiered_search(namespace, query_embedding, top_k)
+        contents = dict(
+            Memory.objects.filter(id__in=ids.tolist()).values_list("id", "content")
+        )
 
     scored = []
-    for memory in memories:
-        score = cosine_similarity(query_embedding, memory.embedding)
+    for memory_id, score in zip(ids.tolist(), scores.tolist()):
+        if memory_id not in contents:
+            continue
         scored.append({
-            "content": memory.content,
+            "id": memory_id,
+            "content": contents[memory_id],
             "score": float(score)
         })
 
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    return scored[:top_k]
+    record_access([m["id"] for m in scored])
+    return scored
+
+
+def build_messages(query, chat_history=None, namespace=DEFAULT_NAMESPACE):
+    """
+    Retrieves relevant memories from the namespace and assembles the
+    prompt messages. Returns (messages, relevant_memories).
+    """
+
+    relevant_memories = retrieve_relevant_memories(query, namespace=namespace)
 
+    with stage("prompt"):
+        messages = _assemble_messages(query, chat_history, relevant_memories)
 
+    return messages, relevant_memories
 
-def generate_response(query, chat_history=None):
-    relevant_memories = retrieve_relevant_memories(query)
 
+def _assemble_messages(query, chat_history, relevant_memories):
     formatted_memories = "\n".join(
         [f"- {m['content']}" if isinstance(m, dict) else f"- {m}" 
          for m in relevant_memories]
@@ -56,10 +79,73 @@ def generate_response(query, chat_history=None):
 
     messages.append({"role": "user", "content": query})
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.3
+    return messages
+
+
+def cached_answer(query, chat_history, namespace, relevant_memories):
+    """
+    A previous answer to a near-identical query asked with the same
+    memories and history, or None.
+    """
+
+    cache = get_response_cache()
+    if cache is None:
+        return None
+
+    with stage("cache_lookup"):
+        return cache.get(
+            namespace,
+            get_embedding(query),
+            [m["id"] for m in relevant_memories],
+            context_key(chat_history)
+        )
+
+
+def remember_answer(query, chat_history, namespace, relevant_memories, answer):
+    cache = get_response_cache()
+    if cache is None or not answer:
+        return
+
+    cache.put(
+        namespace,
+        get_embedding(query),
+        [m["id"] for m in relevant_memories],
+        answer,
+        context_key(chat_history)
     )
 
-    return response.choices[0].message.content, relevant_memories
+
+def generate_response(query, chat_history=None, namespace=DEFAULT_NAMESPACE):
+    """
+    Answers `query`, reusing a cached answer when possible.
+    Returns (answer, relevant_memories, cache_hit).
+    """
+
+    messages, relevant_memories = build_messages(query, chat_history, namespace)
+
+    answer = cached_answer(query, chat_history, namespace, relevant_memories)
+    if answer is not None:
+        return answer, relevant_memories, True
+
+    with stage("llm"):
+        response = llm.complete(
+            CHAT_MODEL, messages, "chat", temperature=CHAT_TEMPERATURE
+        )
+
+    answer = response.choices[0].message.content
+    remember_answer(query, chat_history, namespace, relevant_memories, answer)
+
+    return answer, relevant_memories, False
+
+
+async def stream_response(messages):
+    """
+    Streams the completion for `messages`, yielding text deltas
+    as they arrive.
+    """
+
+    with stage("llm_stream"):
+        async for delta in llm.stream(
+            CHAT_MODEL, messages, "chat_stream", temperature=CHAT_TEMPERATURE
+        ):
+            yield delta
@@ -0,0 +1,205 @@
+import numpy as np
+from django.db import connections, transaction
+
+from memory_app.models import Memory
+from .index import normalize, unindex_memories
+from .ingestion import DUPLICATE_THRESHOLD
+from .listing import STREAM_CHUNK_SIZE
+from .metrics import stage
+from .response_cache import get_response_cache
+from .tiering import forget_memories
+
+
+# Rows per side of each similarity block: a block is at most
+# BLOCK_SIZE x BLOCK_SIZE float32 scores (16 MB at 2048)
+CONSOLIDATION_BLOCK_SIZE = 2048
+
+# Ids per DELETE statement, under SQLite's bound-parameter limit
+DELETE_BATCH_SIZE = 500
+
+
+def load_vectors(namespace):
+    """
+    (ids, normalized vectors, importances) of every memory in the
+    namespace, in id order.
+    """
+
+    rows = (
+        Memory.objects
+        .filter(namespace=namespace)
+        .order_by("id")
+        .values_list("id", "embedding", "importance_score")
+    )
+
+    ids, vectors, importances = [], [], []
+    for memory_id, vector, importance in rows.iterator(chunk_size=STREAM_CHUNK_SIZE):
+        ids.append(memory_id)
+        vectors.append(vector)
+        importances.append(importance)
+
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), np.empty(0)
+
+    return (
+        np.asarray(ids, dtype=np.int64),
+        normalize(np.stack(vectors)),
+        np.asarray(importances, dtype=np.float64),
+    )
+
+
+def similar_pairs(vectors, threshold, block_size=CONSOLIDATION_BLOCK_SIZE):
+    """
+    Yields (rows, cols) position arrays of every pair i < j whose
+    cosine similarity reaches `threshold`, scoring the upper triangle
+    one block x block matrix product at a time.
+    """
+
+    n = len(vectors)
+    for row_start in range(0, n, block_size):
+        block = vectors[row_start:row_start + block_size]
+
+        for col_start in range(row_start, n, block_size):
+            scores = block @ vectors[col_start:col_start + block_size].T
+            rows, cols = np.nonzero(scores >= threshold)
+            rows += row_start
+            cols += col_start
+
+            upper = rows < cols
+            if upper.any():
+                yield rows[upper], cols[upper]
+
+
+def find_clusters(vectors, threshold, block_size=CONSOLIDATION_BLOCK_SIZE):
+    """
+    Groups positions connected by similar pairs (union-find). Returns
+    a list of position arrays, one per cluster of two or more.
+    """
+
+    parent = list(range(len(vectors)))
+
+    def find(position):
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+    for rows, cols in similar_pairs(vectors, threshold, block_size):
+        for a, b in zip(rows.tolist(), cols.tolist()):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    # Point every position at its root, then group by root
+    roots = np.asarray(parent, dtype=np.int64)
+    while True:
+        jumped = roots[roots]
+        if np.array_equal(jumped, roots):
+            break
+        roots = jumped
+
+    order = np.argsort(roots, kind="stable")
+    boundaries = np.flatnonzero(np.diff(roots[order])) + 1
+    return [group for group in np.split(order, boundaries) if len(group) > 1]
+
+
+def plan_merges(ids, vectors, importances, clusters, threshold):
+    """
+    For each cluster, picks the most central memory as canonical and
+    merges into it the members at least `threshold` similar to it
+    (others, only linked through a chain, are left alone). Returns
+    (canonical_id, importance_score, duplicate_ids) per merge.
+    """
+
+    merges = []
+    for positions in clusters:
+        scores = vectors[positions] @ vectors[positions].T
+        center = int(np.argmax(scores.sum(axis=1)))
+
+        close = positions[scores[center] >= threshold]
+        duplicates = close[close != positions[center]]
+        if not len(duplicates):
+            continue
+
+        merges.append((
+            int(ids[positions[center]]),
+            float(importances[close].max()),
+            ids[duplicates].tolist(),
+        ))
+
+    return merges
+
+
+def _apply_merges(namespace, merges, using):
+    connection = connections[using]
+    table = Memory._meta.db_table
+    removed = [memory_id for _, _, duplicates in merges for memory_id in duplicates]
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET importance_score = %s WHERE id = %s",
+            [(importance, canonical_id) for canonical_id, importance, _ in merges]
+        )
+
+        # Raw deletes skip per-row signals; the index and response
+        # cache are updated once for the whole batch below. The
+        # keyword index follows through its triggers.
+        for start in range(0, len(removed), DELETE_BATCH_SIZE):
+            batch = removed[start:start + DELETE_BATCH_SIZE]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", batch)
+
+        transaction.on_commit(lambda: unindex_memories(removed, namespace), using=using)
+        transaction.on_commit(lambda: forget_memories(removed, namespace), using=using)
+
+    cache = get_response_cache()
+    if cache is not None:
+        cache.invalidate(namespace, removed)
+
+    return removed
+
+
+def consolidate_namespace(namespace, threshold=DUPLICATE_THRESHOLD,
+                          block_size=CONSOLIDATION_BLOCK_SIZE, dry_run=False):
+    """
+    Merges near-duplicate memories of one namespace. Each merge keeps
+    the canonical memory's text with the highest importance_score of
+    its group and deletes the rest. Returns a stats dict.
+    """
+
+    with stage("consolidate_scan"):
+        ids, vectors, importances = load_vectors(namespace)
+        clusters = find_clusters(vectors, threshold, block_size) if len(ids) else []
+        merges = plan_merges(ids, vectors, importances, clusters, threshold)
+
+    removed = sum(len(duplicates) for _, _, duplicates in merges)
+    if merges and not dry_run:
+        with stage("consolidate_apply"):
+            _apply_merges(namespace, merges, Memory.objects.db)
+
+    return {
+        "namespace": namespace,
+        "before": len(ids),
+        "clusters": len(merges),
+        "removed": removed,
+        "after": len(ids) - removed,
+    }
+
+
+def consolidate_memories(namespace=None, threshold=DUPLICATE_THRESHOLD,
+                         block_size=CONSOLIDATION_BLOCK_SIZE, dry_run=False):
+    """
+    Runs consolidate_namespace() over one namespace, or all of them.
+    Returns one stats dict per namespace.
+    """
+
+    if namespace is not None:
+        namespaces = [namespace]
+    else:
+        namespaces = list(
+            Memory.objects.order_by("namespace").values_list("namespace", flat=True).distinct()
+        )
+
+    return [
+        consolidate_namespace(name, threshold, block_size, dry_run)
+        for name in namespaces
+    ]
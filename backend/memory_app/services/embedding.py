@@ -1,19 +1,194 @@
+import logging
+import threading
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from django.conf import settings
+
+from .batching import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache
+from .startup import timed
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = settings.EMBEDDING_MODEL_NAME
+
+# Cached vectors are keyed on model and backend: ONNX and int8 outputs
+# differ slightly from torch, so they must not be served for each other
+CACHE_MODEL = f"{MODEL_NAME}@{settings.EMBEDDING_BACKEND}"
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+_model = None
+_cache = None
+_batcher = None
+_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Returns the SentenceTransformer, loading it on first use so that
+    importing this module (and every manage.py command) stays cheap.
+    """
+
+    global _model
+
+    if _model is None:
+        with _lock:
+            if _model is None:
+                with timed("embedding.model_load"):
+                    _model = load_model()
+
+    return _model
+
+
+def _configure_torch_threads():
+    if not (settings.EMBEDDING_INTRA_OP_THREADS or settings.EMBEDDING_INTER_OP_THREADS):
+        return
+
+    import torch
+
+    if settings.EMBEDDING_INTRA_OP_THREADS:
+        torch.set_num_threads(settings.EMBEDDING_INTRA_OP_THREADS)
+    if settings.EMBEDDING_INTER_OP_THREADS:
+        try:
+            torch.set_num_interop_threads(settings.EMBEDDING_INTER_OP_THREADS)
+        except RuntimeError:
+            # Only settable before torch first runs parallel work
+            logger.warning("torch inter-op threads already initialised; keeping them")
+
+
+def _onnx_model_kwargs(quantized):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    if settings.EMBEDDING_INTRA_OP_THREADS:
+        options.intra_op_num_threads = settings.EMBEDDING_INTRA_OP_THREADS
+    if settings.EMBEDDING_INTER_OP_THREADS:
+        options.inter_op_num_threads = settings.EMBEDDING_INTER_OP_THREADS
+
+    kwargs = {"provider": "CPUExecutionProvider", "session_options": options}
+    if quantized:
+        kwargs["file_name"] = settings.EMBEDDING_ONNX_INT8_FILE
+    return kwargs
+
+
+def load_model(backend=None):
+    """
+    Loads a new SentenceTransformer for MODEL_NAME on `backend`
+    (default EMBEDDING_BACKEND), with the configured CPU threads.
+    """
+
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend {backend!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}"
+        )
+
+    with timed("import sentence_transformers"):
+        from sentence_transformers import SentenceTransformer
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+    if backend == "torch":
+        _configure_torch_threads()
+        return SentenceTransformer(MODEL_NAME)
+
+    return SentenceTransformer(
+        MODEL_NAME,
+        backend="onnx",
+        model_kwargs=_onnx_model_kwargs(quantized=backend == "onnx-int8")
+    )
+
+
+def get_cache():
+    """
+    Returns the embedding cache, opening its disk tier on first use.
+    """
+
+    global _cache
+
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    max_entries=settings.EMBEDDING_CACHE_SIZE,
+                    path=settings.EMBEDDING_CACHE_PATH
+                )
+
+    return _cache
+
+
+def get_batcher():
+    """
+    Returns the micro-batching scheduler that coalesces concurrent
+    encode calls, or None when EMBEDDING_BATCHING is off.
+    """
+
+    global _batcher
+
+    if not settings.EMBEDDING_BATCHING:
+        return None
+
+    if _batcher is None:
+        with _lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher(
+                    lambda texts: get_model().encode(texts),
+                    max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                    max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+                )
+
+    return _batcher
+
+
+def encode(texts):
+    """
+    Runs the model on texts, through the batcher when enabled.
+    """
+
+    batcher = get_batcher()
+    if batcher is None:
+        return get_model().encode(texts)
+    return batcher.encode_many(texts)
+
+
+def encode_bulk(texts):
+    """
+    Runs the model directly, bypassing the cache and the batcher, for
+    bulk jobs whose texts are not worth caching.
+    """
+
+    return np.asarray(get_model().encode(list(texts)), dtype=np.float32)
 
 
 def get_embedding(text):
-    return model.encode(text).tolist()
+    return get_embeddings([text])[0]
+
+
+def get_embeddings(texts):
+    """
+    Encodes many texts in one batched model call, skipping any
+    text already in the embedding cache.
+    Returns a (len(texts), dim) float32 matrix.
+    """
+
+    texts = list(texts)
+    cache = get_cache()
+    vectors = cache.get_many(CACHE_MODEL, texts)
+
+    missing = list(dict.fromkeys(text for text in texts if text not in vectors))
+    if missing:
+        encoded = encode(missing)
+        cache.put_many(CACHE_MODEL, missing, encoded)
+        vectors.update(zip(missing, encoded))
+
+    return np.stack([vectors[text] for text in texts]).astype(np.float32, copy=False)
 
 
 def cosine_similarity(vec1, vec2):
-    v1 = np.array(vec1)
-    v2 = np.array(vec2)
+    v1 = np.asarray(vec1, dtype=np.float32)
+    v2 = np.asarray(vec2, dtype=np.float32)
     # return np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
     
     v1 = v1 / np.linalg.norm(v1)
     v2 = v2 / np.linalg.norm(v2)
 
-    return np.dot(v1, v2)
\ No newline at end of file
+    return np.dot(v1, v2)
@@ -0,0 +1,214 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from memory_app.fields import decode_embedding, encode_embedding
+
+
+def cache_key(model_name, text):
+    """
+    Content address of an embedding: model name plus a hash of the text.
+    """
+
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class DiskEmbeddingStore:
+    """
+    Persistent embedding tier backed by its own SQLite file, so cached
+    vectors survive restarts without touching the application database.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+
+    def _connection(self):
+        # sqlite3 connections can't be shared across threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get_many(self, keys):
+        found = {}
+        connection = self._connection()
+
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                chunk
+            )
+            for key, vector in rows:
+                found[key] = decode_embedding(vector)
+
+        return found
+
+    def put_many(self, items):
+        with self._connection() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [
+                    (key, model_name, encode_embedding(vector, np.float32))
+                    for key, model_name, vector in items
+                ]
+            )
+
+    def delete(self, model_name=None, keep_model=None):
+        with self._connection() as connection:
+            if model_name is not None:
+                connection.execute(
+                    "DELETE FROM embeddings WHERE model = ? OR substr(model, 1, ?) = ?",
+                    (model_name, len(model_name) + 1, f"{model_name}@")
+                )
+            elif keep_model is not None:
+                connection.execute("DELETE FROM embeddings WHERE model != ?", (keep_model,))
+            else:
+                connection.execute("DELETE FROM embeddings")
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache: a bounded in-memory LRU in front
+    of an optional persistent disk tier.
+
+    Keys combine the model name with a hash of the text, so vectors from
+    different models never mix. Cached vectors are read-only.
+    """
+
+    def __init__(self, max_entries=10000, path=None):
+        self.max_entries = max_entries
+        self.disk = DiskEmbeddingStore(path) if path else None
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_many(self, model_name, texts):
+        """
+        Looks up texts; returns {text: vector} for every cached one.
+        """
+
+        keys = {text: cache_key(model_name, text) for text in texts}
+        found = {}
+        missing = []
+
+        with self._lock:
+            for text, key in keys.items():
+                vector = self._entries.get(key)
+                if vector is None:
+                    missing.append(text)
+                else:
+                    self._entries.move_to_end(key)
+                    found[text] = vector
+
+        disk_found = {}
+        if missing and self.disk is not None:
+            stored = self.disk.get_many([keys[text] for text in missing])
+            for text in missing:
+                vector = stored.get(keys[text])
+                if vector is not None:
+                    disk_found[text] = vector
+
+            # Promote disk hits into the memory tier
+            with self._lock:
+                for text, vector in disk_found.items():
+                    self._remember(keys[text], vector)
+
+        with self._lock:
+            self.hits += len(found) + len(disk_found)
+            self.disk_hits += len(disk_found)
+            self.misses += len(keys) - len(found) - len(disk_found)
+
+        found.update(disk_found)
+        return found
+
+    def put_many(self, model_name, texts, vectors):
+        """
+        Stores freshly computed vectors in both tiers.
+        """
+
+        items = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(model_name, text)
+                vector = np.array(vector, dtype=np.float32)
+                self._remember(key, vector)
+                items.append((key, model_name, vector))
+
+        if self.disk is not None and items:
+            self.disk.put_many(items)
+
+    def invalidate(self, model_name=None, keep_model=None):
+        """
+        Drops cached vectors for one model, for every model except
+        `keep_model`, or (with no arguments) everything. A bare model
+        name also matches its "model@backend" entries.
+        """
+
+        with self._lock:
+            if model_name is None and keep_model is None:
+                self._entries.clear()
+            else:
+                for key in list(self._entries):
+                    key_model = key.rsplit(":", 1)[0]
+                    if model_name in (key_model, key_model.split("@", 1)[0]) or (
+                        keep_model is not None and key_model != keep_model
+                    ):
+                        del self._entries[key]
+
+        if self.disk is not None:
+            self.disk.delete(model_name=model_name, keep_model=keep_model)
+
+    def stats(self):
+        """
+        Hit/miss counters and current tier sizes.
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._entries),
+            }
+
+        if self.disk is not None:
+            stats["disk_entries"] = len(self.disk)
+
+        return stats
+
+    def _remember(self, key, vector):
+        vector.flags.writeable = False
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
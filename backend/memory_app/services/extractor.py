@@ -1,7 +1,7 @@
-from openai import OpenAI
-from django.conf import settings
+from . import llm
+
+EXTRACTION_MODEL = "gpt-4.1-nano"
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
 def extract_memories(text):
     prompt = f"""
@@ -13,9 +13,10 @@ Conversation:
 {text}
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4.1-nano",
-        messages=[{"role": "user", "content": prompt}]
+    response = llm.complete(
+        EXTRACTION_MODEL,
+        [{"role": "user", "content": prompt}],
+        "extraction"
     )
 
     output = response.choices[0].message.content
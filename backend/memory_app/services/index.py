@@ -0,0 +1,1194 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from memory_app.namespaces import DEFAULT_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+# Queries scored per matrix-matrix product in search_many()
+QUERY_BLOCK_SIZE = 256
+
+# Rows widened to float32 at a time when scanning int8 codes
+CODE_BLOCK_SIZE = 65536
+
+# Memory ids fetched per query when loading full-precision vectors
+LOADER_CHUNK_SIZE = 5000
+
+
+def normalize(vectors):
+    """
+    L2-normalize a vector or a stack of row vectors as float32.
+    Zero rows are left as zeros instead of producing NaNs.
+    """
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """
+    Process-wide exact cosine index over stored memory embeddings.
+
+    Embeddings are kept pre-normalized in one contiguous float32 matrix,
+    so scoring a query is a single matrix-vector product. `ids` maps each
+    matrix row back to a Memory primary key.
+
+    Appends write into spare capacity past the live rows and removals
+    build new arrays, so readers can score a snapshot without holding
+    the lock.
+    """
+
+    backend = "exact"
+
+    # True when add() and remove() persist themselves, without save()
+    durable = False
+
+    def __init__(self, dim=None):
+        self.dim = dim
+        self._matrix = np.empty((0, dim or 0), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        self._positions = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, memory_id):
+        return memory_id in self._positions
+
+    @property
+    def approximate(self):
+        """
+        True when search() may miss rows that an exact scan would return.
+        """
+
+        return False
+
+    def snapshot(self):
+        """
+        Returns (ids, matrix) views over the live rows.
+        """
+
+        with self._lock:
+            size = self._size
+            return self._ids[:size], self._matrix[:size]
+
+    def live_ids(self):
+        """
+        Memory ids of the live rows.
+        """
+
+        ids, _ = self.snapshot()
+        return ids
+
+    def add(self, ids, vectors):
+        """
+        Inserts or replaces rows for the given memory ids.
+        """
+
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if not len(ids):
+            return
+
+        vectors = normalize(vectors).reshape(len(ids), -1)
+
+        with self._lock:
+            if self.dim is None or not self._size:
+                self._reset(vectors.shape[1])
+
+            self._insert_rows(ids, self._encode_rows(vectors))
+
+    def _insert_rows(self, ids, rows):
+        # Caller holds the lock; rows are already in storage format
+        new_ids = []
+        new_rows = []
+        replaced = []
+        for memory_id, row in zip(ids.tolist(), rows):
+            position = self._positions.get(memory_id)
+            if position is not None:
+                self._matrix[position] = row
+                replaced.append(position)
+            else:
+                new_ids.append(memory_id)
+                new_rows.append(row)
+
+        if replaced:
+            self._rows_replaced(replaced)
+
+        if not new_ids:
+            return
+
+        self._reserve(self._size + len(new_ids))
+
+        start = self._size
+        end = start + len(new_ids)
+        self._matrix[start:end] = np.stack(new_rows)
+        self._ids[start:end] = new_ids
+        for offset, memory_id in enumerate(new_ids):
+            self._positions[memory_id] = start + offset
+        self._size = end
+
+        self._rows_appended(start, end)
+
+    def remove(self, ids):
+        """
+        Drops rows for the given memory ids. Unknown ids are ignored.
+        """
+
+        with self._lock:
+            doomed = [
+                self._positions[memory_id]
+                for memory_id in ids
+                if memory_id in self._positions
+            ]
+            if not doomed:
+                return
+
+            keep = np.ones(self._size, dtype=bool)
+            keep[doomed] = False
+
+            # Fresh arrays, so in-flight readers keep a consistent snapshot
+            self._matrix = np.ascontiguousarray(self._matrix[:self._size][keep])
+            self._ids = self._ids[:self._size][keep].copy()
+            self._size = len(self._ids)
+            self._positions = {
+                memory_id: position
+                for position, memory_id in enumerate(self._ids.tolist())
+            }
+
+            self._rows_removed(keep)
+
+    def similarities(self, query):
+        """
+        Cosine similarity of `query` against every indexed row.
+        Returns (ids, scores).
+        """
+
+        ids, matrix = self.snapshot()
+        if not len(ids):
+            return ids, np.empty(0, dtype=np.float32)
+
+        return ids, self._score(matrix, normalize(query))
+
+    def score_ids(self, query, ids):
+        """
+        Cosine similarity of `query` to the given memory ids only,
+        NaN for ids that are not indexed.
+        """
+
+        found, rows = self._rows_for(ids)
+        scores = np.full(len(found), np.nan, dtype=np.float32)
+        if len(rows):
+            scores[found] = self._score(rows, normalize(query))
+        return scores
+
+    def score_ids_many(self, queries, ids):
+        """
+        Cosine similarity of each query in a stack to the given memory
+        ids, as one (len(queries), len(ids)) matrix product. Columns of
+        ids that are not indexed are NaN.
+        """
+
+        queries = np.atleast_2d(normalize(queries))
+        found, rows = self._rows_for(ids)
+        scores = np.full((len(queries), len(found)), np.nan, dtype=np.float32)
+        if len(rows):
+            scores[:, found] = queries @ rows.T
+        return scores
+
+    def _rows_for(self, ids):
+        # Positions are only valid under the lock: add() reuses the dict
+        # and may reallocate the matrix, so copy the rows out here
+        with self._lock:
+            positions = np.array(
+                [self._positions.get(memory_id, -1) for memory_id in ids], dtype=np.int64
+            )
+            found = positions >= 0
+            rows = self._matrix[positions[found]]
+        return found, rows
+
+    def search(self, query, k, exact=False):
+        """
+        Top-k rows by cosine similarity, best first.
+        Returns (ids, scores).
+        """
+
+        ids, scores = self.similarities(query)
+        top = top_k_indices(scores, k)
+        return ids[top], scores[top]
+
+    def search_many(self, queries, k, exact=False):
+        """
+        Top-k rows for each query in a stack of query vectors, scored
+        in blocks of matrix-matrix products.
+        Returns (ids, scores), both shaped (len(queries), min(k, len(self))).
+        """
+
+        ids, matrix = self.snapshot()
+        queries = np.atleast_2d(normalize(queries))
+        k = min(k, len(ids))
+
+        result_ids = np.empty((len(queries), k), dtype=np.int64)
+        result_scores = np.empty((len(queries), k), dtype=np.float32)
+        if not k:
+            return result_ids, result_scores
+
+        for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+            block = slice(start, start + QUERY_BLOCK_SIZE)
+            scores = queries[block] @ matrix.T
+            top = top_k_columns(scores, k)
+            result_ids[block] = ids[top]
+            result_scores[block] = np.take_along_axis(scores, top, axis=1)
+
+        return result_ids, result_scores
+
+    def max_similarities(self, queries):
+        """
+        Highest cosine similarity of each query to any indexed row,
+        or -1.0 for every query against an empty index.
+        """
+
+        _, scores = self.search_many(queries, 1)
+        if not scores.shape[1]:
+            return np.full(len(scores), -1.0, dtype=np.float32)
+        return scores[:, 0]
+
+    def max_similarity(self, query):
+        """
+        Highest cosine similarity of `query` to any indexed row,
+        or -1.0 for an empty index.
+        """
+
+        _, scores = self.search(query, 1)
+        if not len(scores):
+            return -1.0
+        return float(scores[0])
+
+    def state(self):
+        """
+        Arrays that fully describe the index, for save().
+        """
+
+        with self._lock:
+            ids, matrix = self.snapshot()
+            return {"ids": ids, "matrix": matrix, "dim": np.array(self.dim or 0)}
+
+    def save(self, path):
+        """
+        Atomically writes the index to `path` as an .npz archive.
+        """
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        state = self.state()
+        state["backend"] = np.array(self.backend)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **state)
+        os.replace(tmp_path, path)
+
+    def load_state(self, state):
+        """
+        Restores rows from the arrays written by save().
+        """
+
+        ids = np.asarray(state["ids"], dtype=np.int64)
+        if not len(ids):
+            return
+
+        with self._lock:
+            self._reset(int(state["dim"]))
+            self._insert_rows(ids, state["matrix"])
+
+    def _reset(self, dim):
+        self.dim = dim
+        self._matrix = np.empty((0, self._row_width()), dtype=self.row_dtype)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        self._positions = {}
+
+    # Storage format hooks; rows are normalized float32 vectors here
+    row_dtype = np.float32
+
+    def _row_width(self):
+        return self.dim
+
+    def _encode_rows(self, vectors):
+        return vectors
+
+    def _score(self, rows, query):
+        return rows @ query
+
+    # Hooks for subclasses that keep per-row structures
+    def _rows_appended(self, start, end):
+        pass
+
+    def _rows_replaced(self, positions):
+        pass
+
+    def _rows_removed(self, keep):
+        pass
+
+    def _reserve(self, capacity):
+        if capacity <= len(self._matrix):
+            return
+
+        new_capacity = max(capacity, 2 * len(self._matrix), 1024)
+
+        matrix = np.empty((new_capacity, self._row_width()), dtype=self.row_dtype)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.empty(new_capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+
+        self._matrix = matrix
+        self._ids = ids
+
+
+class IVFIndex(VectorIndex):
+    """
+    Approximate index that partitions rows into `nlist` k-means cells.
+
+    A query scores the centroids, then only the rows in the `nprobe`
+    closest cells, so raising nprobe trades latency for recall. Rows
+    appended after the last rebuild of the inverted lists sit in a small
+    tail that is always scanned exactly; the lists are rebuilt once that
+    tail grows past a fraction of the index.
+
+    Until `min_train` rows exist the index is untrained and searches
+    exactly.
+    """
+
+    backend = "ivf"
+
+    def __init__(self, dim=None, nlist=None, nprobe=8, min_train=1000,
+                 train_iterations=10, tail_fraction=0.05):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.train_iterations = train_iterations
+        self.tail_fraction = tail_fraction
+
+        self._centroids = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._list_order = np.empty(0, dtype=np.int64)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+        self._listed = 0
+        # Serializes k-means runs; separate from _lock so searches and
+        # writes are not blocked while one trains
+        self._train_lock = threading.Lock()
+
+    @property
+    def trained(self):
+        return self._centroids is not None
+
+    @property
+    def approximate(self):
+        return self.trained and self.nprobe < len(self._centroids)
+
+    def train(self):
+        """
+        Runs spherical k-means over (a sample of) the indexed rows and
+        assigns every row to its nearest centroid.
+        """
+
+        with self._train_lock:
+            self._train()
+
+    def _train_if_due(self):
+        # The first search past min_train trains; searches arriving
+        # meanwhile scan exactly instead of training again or waiting
+        if self.trained or self._size < self.min_train:
+            return
+        if not self._train_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.trained:
+                self._train()
+        finally:
+            self._train_lock.release()
+
+    def _train(self):
+        ids, matrix = self.snapshot()
+        n = len(ids)
+        if not n:
+            return
+
+        nlist = self.nlist or int(np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+
+        rng = np.random.default_rng(0)
+        sample = matrix[rng.choice(n, min(n, nlist * 256), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            assignments = _nearest_centroids(sample, centroids)
+
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            filled = counts > 0
+
+            # Empty cells keep their previous centroid
+            sums = np.add.reduceat(sample[order], starts[filled], axis=0)
+            centroids[filled] = normalize(sums)
+
+        with self._lock:
+            self._centroids = centroids
+            size = self._size
+            self._assignments = np.empty(len(self._matrix), dtype=np.int32)
+            self._assignments[:size] = _nearest_centroids(
+                self._matrix[:size], centroids
+            )
+            self._rebuild_lists()
+
+    def search(self, query, k, exact=False):
+        self._train_if_due()
+
+        if exact or not self.approximate:
+            return super().search(query, k)
+
+        query = normalize(query)
+
+        with self._lock:
+            size = self._size
+            ids = self._ids[:size]
+            matrix = self._matrix[:size]
+            centroids = self._centroids
+            order = self._list_order
+            offsets = self._list_offsets
+            listed = self._listed
+
+        cells = top_k_indices(centroids @ query, self.nprobe)
+        candidates = [order[offsets[cell]:offsets[cell + 1]] for cell in cells.tolist()]
+        candidates.append(np.arange(listed, size, dtype=np.int64))
+        candidates = np.concatenate(candidates)
+
+        scores = matrix[candidates] @ query
+        top = top_k_indices(scores, k)
+        rows = candidates[top]
+        return ids[rows], scores[top]
+
+    def search_many(self, queries, k, exact=False):
+        self._train_if_due()
+        if exact or not self.approximate:
+            return super().search_many(queries, k)
+
+        queries = np.atleast_2d(normalize(queries))
+        k = min(k, len(self))
+        result_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+        # Probed cells differ per query, so fall back to one search each.
+        # Rows with fewer candidates than k are padded with id -1.
+        for row, query in enumerate(queries):
+            ids, scores = self.search(query, k)
+            result_ids[row, :len(ids)] = ids
+            result_scores[row, :len(ids)] = scores
+
+        return result_ids, result_scores
+
+    def state(self):
+        with self._lock:
+            state = super().state()
+            if self.trained:
+                state["centroids"] = self._centroids
+                state["assignments"] = self._assignments[:len(state["ids"])]
+        return state
+
+    def load_state(self, state):
+        super().load_state(state)
+        if "centroids" in state and len(self):
+            with self._lock:
+                self._centroids = np.asarray(state["centroids"], dtype=np.float32)
+                self._assignments = np.empty(len(self._matrix), dtype=np.int32)
+                if "assignments" in state:
+                    self._assignments[:self._size] = state["assignments"]
+                else:
+                    self._assignments[:self._size] = _nearest_centroids(
+                        self._matrix[:self._size], self._centroids
+                    )
+                self._rebuild_lists()
+
+    def _rebuild_lists(self):
+        size = self._size
+        assignments = self._assignments[:size]
+
+        self._list_order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(self._centroids))
+        self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._listed = size
+
+    def _reserve(self, capacity):
+        super()._reserve(capacity)
+        if len(self._assignments) < len(self._matrix):
+            assignments = np.empty(len(self._matrix), dtype=np.int32)
+            assignments[:self._size] = self._assignments[:self._size]
+            self._assignments = assignments
+
+    def _rows_appended(self, start, end):
+        if not self.trained:
+            return
+
+        self._assignments[start:end] = _nearest_centroids(
+            self._matrix[start:end], self._centroids
+        )
+        if end - self._listed > max(1024, self.tail_fraction * end):
+            self._rebuild_lists()
+
+    def _rows_replaced(self, positions):
+        if not self.trained:
+            return
+
+        self._assignments[positions] = _nearest_centroids(
+            self._matrix[positions], self._centroids
+        )
+        self._rebuild_lists()
+
+    def _rows_removed(self, keep):
+        if not self.trained:
+            return
+
+        self._assignments = self._assignments[:len(keep)][keep].copy()
+        self._rebuild_lists()
+
+
+class QuantizedIndex(VectorIndex):
+    """
+    Two-stage index over compressed codes instead of float32 rows.
+
+    Stage one scans compact codes for a shortlist of
+    `rerank_factor * k` rows: int8 scalar codes (4x smaller) scored
+    by a dot product, or 1-bit sign codes (32x smaller) scored by Hamming
+    distance. Stage two re-ranks the shortlist by exact cosine over the
+    float embeddings from `vector_loader`, which reads them from the
+    Memory table by default. Full-precision vectors are never held for
+    the whole store.
+    """
+
+    def __init__(self, dim=None, codec="int8", rerank_factor=10,
+                 int8_clip=0.5, vector_loader=None):
+        if codec not in ("int8", "binary"):
+            raise ValueError(f"Unsupported quantization codec {codec!r}")
+
+        self.codec = codec
+        self.rerank_factor = rerank_factor
+        self.int8_clip = int8_clip
+        self.vector_loader = vector_loader or load_embeddings
+        super().__init__(dim)
+
+    @property
+    def backend(self):
+        return self.codec
+
+    @property
+    def row_dtype(self):
+        return np.int8 if self.codec == "int8" else np.uint8
+
+    @property
+    def approximate(self):
+        return self._size > 0
+
+    def search(self, query, k, exact=False):
+        if exact:
+            return self._exact_search(query, k)
+
+        # Stage one: scan codes for a shortlist
+        ids, scores = self.similarities(query)
+        shortlist = ids[top_k_indices(scores, k * self.rerank_factor)]
+
+        # Stage two: exact cosine on the shortlist only
+        return self._rerank(shortlist, normalize(query), k)
+
+    def search_many(self, queries, k, exact=False):
+        queries = np.atleast_2d(normalize(queries))
+        k = min(k, len(self))
+        result_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+        for row, query in enumerate(queries):
+            ids, scores = self.search(query, k, exact=exact)
+            result_ids[row, :len(ids)] = ids
+            result_scores[row, :len(ids)] = scores
+
+        return result_ids, result_scores
+
+    def score_ids(self, query, ids):
+        vectors = self.vector_loader([memory_id for memory_id in ids if memory_id in self])
+        query = normalize(query)
+
+        scores = np.full(len(ids), np.nan, dtype=np.float32)
+        for position, memory_id in enumerate(ids):
+            vector = vectors.get(memory_id)
+            if vector is not None:
+                scores[position] = normalize(vector) @ query
+        return scores
+
+    def score_ids_many(self, queries, ids):
+        queries = np.atleast_2d(normalize(queries))
+        vectors = self.vector_loader([memory_id for memory_id in ids if memory_id in self])
+
+        scores = np.full((len(queries), len(ids)), np.nan, dtype=np.float32)
+        found = [position for position, memory_id in enumerate(ids) if memory_id in vectors]
+        if found:
+            matrix = normalize(np.stack([vectors[ids[position]] for position in found]))
+            scores[:, found] = queries @ matrix.T
+        return scores
+
+    def state(self):
+        state = super().state()
+        state["int8_clip"] = np.array(self.int8_clip)
+        return state
+
+    def load_state(self, state):
+        if "int8_clip" in state:
+            self.int8_clip = float(state["int8_clip"])
+        super().load_state(state)
+
+    def _rerank(self, candidates, query, k):
+        vectors = self.vector_loader(candidates.tolist())
+        found = [memory_id for memory_id in candidates.tolist() if memory_id in vectors]
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        candidates = np.array(found, dtype=np.int64)
+        matrix = normalize(np.stack([vectors[memory_id] for memory_id in found]))
+        scores = matrix @ query
+        top = top_k_indices(scores, k)
+        return candidates[top], scores[top]
+
+    def _exact_search(self, query, k):
+        # Reference scan over full-precision vectors, for recall checks
+        ids, _ = self.snapshot()
+        query = normalize(query)
+
+        best_ids = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(ids), LOADER_CHUNK_SIZE):
+            chunk_ids, chunk_scores = self._rerank(ids[start:start + LOADER_CHUNK_SIZE], query, k)
+            best_ids = np.concatenate([best_ids, chunk_ids])
+            best_scores = np.concatenate([best_scores, chunk_scores])
+
+        top = top_k_indices(best_scores, k)
+        return best_ids[top], best_scores[top]
+
+    def _row_width(self):
+        if self.codec == "int8":
+            return self.dim
+        return (self.dim + 7) // 8
+
+    def _encode_rows(self, vectors):
+        if self.codec == "int8":
+            scale = 127 / self.int8_clip
+            return np.clip(np.rint(vectors * scale), -127, 127).astype(np.int8)
+        return np.packbits(vectors > 0, axis=1)
+
+    def _score(self, rows, query):
+        if self.codec == "int8":
+            # numpy has no int8 BLAS path; widen block by block instead
+            scores = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), CODE_BLOCK_SIZE):
+                block = rows[start:start + CODE_BLOCK_SIZE]
+                scores[start:start + CODE_BLOCK_SIZE] = block.astype(np.float32) @ query
+            return scores * (self.int8_clip / 127)
+
+        # Hamming distance between sign codes, mapped onto [-1, 1]
+        query_code = np.packbits(query > 0)
+        distances = np.bitwise_count(rows ^ query_code).sum(axis=1, dtype=np.int32)
+        return 1 - 2 * distances.astype(np.float32) / self.dim
+
+
+def load_embeddings(ids):
+    """
+    Default QuantizedIndex vector loader: full-precision embeddings for
+    the given memory ids, read from the Memory table.
+    Returns {memory_id: vector}.
+    """
+
+    from memory_app.models import Memory
+
+    ids = list(ids)
+    vectors = {}
+    for start in range(0, len(ids), LOADER_CHUNK_SIZE):
+        chunk = ids[start:start + LOADER_CHUNK_SIZE]
+        vectors.update(
+            Memory.objects.filter(id__in=chunk).values_list("id", "embedding")
+        )
+    return vectors
+
+
+def _nearest_centroids(vectors, centroids, block_size=16384):
+    """
+    Index of the most similar centroid for each row, computed in blocks
+    to bound the size of the rows x centroids score matrix.
+    """
+
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        assignments[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def measure_recall(index, queries, k=10):
+    """
+    Mean recall@k of index.search() against an exact scan of the same
+    index, over a stack of query vectors.
+    """
+
+    if not len(index):
+        return 1.0
+
+    hits = 0
+    total = 0
+    for query in queries:
+        approximate_ids, _ = index.search(query, k)
+        exact_ids, _ = index.search(query, k, exact=True)
+        hits += len(np.intersect1d(approximate_ids, exact_ids))
+        total += len(exact_ids)
+
+    return hits / total if total else 1.0
+
+
+def top_k_columns(scores, k):
+    """
+    Row-wise top_k_indices for a 2-D score matrix: column indices of the
+    k largest scores in each row, sorted descending.
+    """
+
+    if k >= scores.shape[1]:
+        return np.argsort(-scores, axis=1, kind="stable")
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the k largest scores, sorted descending.
+    Uses argpartition so only the selected k are fully sorted.
+    """
+
+    n = len(scores)
+    if k is None or k >= n:
+        return np.argsort(-scores, kind="stable")
+
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+# -------------------------------
+# Per-namespace indexes
+# -------------------------------
+
+# Each namespace gets its own index, built or loaded on first use and
+# kept in an LRU of at most MEMORY_INDEX_MAX_NAMESPACES; the coldest is
+# saved (if dirty) and dropped when a new one is loaded.
+INDEX_FILENAME = "index.npz"
+
+_indexes = OrderedDict()
+_index_lock = threading.Lock()
+_build_locks = {}
+_pending_changes = {}
+_last_checked = {}
+
+
+def _index_settings():
+    from django.conf import settings
+
+    return {
+        "backend": getattr(settings, "MEMORY_INDEX_BACKEND", "exact"),
+        "path": getattr(settings, "MEMORY_INDEX_PATH", None),
+        "nlist": getattr(settings, "MEMORY_INDEX_NLIST", None),
+        "nprobe": getattr(settings, "MEMORY_INDEX_NPROBE", 8),
+        "min_train": getattr(settings, "MEMORY_INDEX_MIN_TRAIN", 1000),
+        "save_every": getattr(settings, "MEMORY_INDEX_SAVE_EVERY", 500),
+        "rerank_factor": getattr(settings, "MEMORY_INDEX_RERANK_FACTOR", 10),
+        "max_namespaces": getattr(settings, "MEMORY_INDEX_MAX_NAMESPACES", 64),
+        "compact_every": getattr(settings, "MEMORY_SNAPSHOT_COMPACT_EVERY", 20000),
+        "sync_interval": getattr(settings, "MEMORY_SNAPSHOT_SYNC_INTERVAL", 1.0),
+        "check_every": getattr(settings, "MEMORY_INDEX_CHECK_INTERVAL", 5.0),
+    }
+
+
+def create_index(backend=None):
+    """
+    Returns an empty index for the configured (or given) backend.
+    """
+
+    config = _index_settings()
+    backend = backend or config["backend"]
+
+    if backend == "exact":
+        return VectorIndex()
+    if backend == "ivf":
+        return IVFIndex(
+            nlist=config["nlist"],
+            nprobe=config["nprobe"],
+            min_train=config["min_train"],
+        )
+    if backend in ("int8", "binary"):
+        return QuantizedIndex(codec=backend, rerank_factor=config["rerank_factor"])
+    if backend == "mmap":
+        raise ValueError("The 'mmap' backend maps a namespace's snapshot; use get_index()")
+
+    raise ValueError(
+        f"Unsupported MEMORY_INDEX_BACKEND {backend!r}, "
+        "expected 'exact', 'ivf', 'int8', 'binary' or 'mmap'"
+    )
+
+
+def index_path(path, namespace=DEFAULT_NAMESPACE):
+    return Path(path) / namespace / INDEX_FILENAME
+
+
+def _table_fingerprint(namespace=DEFAULT_NAMESPACE):
+    from django.db.models import Count, Max, Sum
+    from memory_app.models import Memory
+
+    stats = Memory.objects.filter(namespace=namespace).aggregate(
+        count=Count("id"), max_id=Max("id"), id_sum=Sum("id")
+    )
+    return stats["count"], stats["max_id"] or 0, stats["id_sum"] or 0
+
+
+def _index_fingerprint(index):
+    ids = index.live_ids()
+    if not len(ids):
+        return 0, 0, 0
+    return len(ids), int(ids.max()), int(ids.sum())
+
+
+def build_index(namespace=DEFAULT_NAMESPACE):
+    """
+    Builds a fresh index from the namespace's stored Memory rows.
+    """
+
+    from memory_app.models import Memory
+
+    index = create_index()
+    rows = Memory.objects.filter(namespace=namespace).values_list("id", "embedding")
+
+    ids, vectors = [], []
+    for memory_id, embedding in rows.iterator(chunk_size=2000):
+        ids.append(memory_id)
+        vectors.append(embedding)
+
+    if ids:
+        index.add(ids, np.asarray(vectors, dtype=np.float32))
+
+    if isinstance(index, IVFIndex) and len(index) >= index.min_train:
+        index.train()
+
+    return index
+
+
+def load_index(path, namespace=DEFAULT_NAMESPACE):
+    """
+    Loads a namespace's saved index if it matches the configured backend
+    and the current table; returns None when it is missing or stale.
+    """
+
+    path = index_path(path, namespace)
+    if not path.exists():
+        return None
+
+    try:
+        with np.load(path) as archive:
+            state = {name: archive[name] for name in archive.files}
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable vector index %s: %s", path, exc)
+        return None
+
+    if str(state.pop("backend")) != _index_settings()["backend"]:
+        return None
+
+    index = create_index()
+    index.load_state(state)
+
+    if _index_fingerprint(index) != _table_fingerprint(namespace):
+        logger.info("Saved vector index %s is stale, rebuilding", path)
+        return None
+
+    return index
+
+
+def save_index(namespace=None):
+    """
+    Persists one namespace's index, or (with no argument) every loaded
+    index with unsaved changes, if a path is configured.
+    """
+
+    path = _index_settings()["path"]
+    if not path:
+        return
+
+    with _index_lock:
+        if namespace is None:
+            targets = [
+                (name, index) for name, index in _indexes.items()
+                if _pending_changes.get(name)
+            ]
+        else:
+            index = _indexes.get(namespace)
+            targets = [(namespace, index)] if index is not None else []
+
+    for name, index in targets:
+        index.save(index_path(path, name))
+        _pending_changes.pop(name, None)
+
+
+def get_index(namespace=DEFAULT_NAMESPACE):
+    """
+    Returns the namespace's index, loading it from disk or building it
+    from the table on first use.
+    """
+
+    with _index_lock:
+        index = _indexes.get(namespace)
+        if index is not None:
+            _indexes.move_to_end(namespace)
+            check = _check_due(namespace)
+        else:
+            build_lock = _build_locks.setdefault(namespace, threading.Lock())
+
+    if index is not None:
+        if check:
+            sync_index(namespace, index)
+        return index
+
+    # Build outside the registry lock so other namespaces stay available
+    with build_lock:
+        with _index_lock:
+            index = _indexes.get(namespace)
+        if index is not None:
+            return index
+
+        config = _index_settings()
+        path = config["path"]
+
+        if config["backend"] == "mmap":
+            index = _open_snapshot(namespace, config)
+        else:
+            index = load_index(path, namespace) if path else None
+
+        if index is None:
+            index = build_index(namespace)
+            # Empty namespaces are cheap to rebuild; don't litter the disk
+            if path and len(index):
+                index.save(index_path(path, namespace))
+
+        with _index_lock:
+            _indexes[namespace] = index
+            _last_checked[namespace] = time.monotonic()
+            evicted = _evict_cold_indexes()
+
+    for name, cold_index in evicted:
+        if path:
+            cold_index.save(index_path(path, name))
+
+    return index
+
+
+def _check_due(namespace):
+    # Caller holds _index_lock; claims the check so only one thread runs it
+    interval = _index_settings()["check_every"]
+    if interval is None:
+        return False
+
+    now = time.monotonic()
+    if now - _last_checked.get(namespace, 0.0) < interval:
+        return False
+
+    _last_checked[namespace] = now
+    return True
+
+
+def sync_index(namespace=DEFAULT_NAMESPACE, index=None):
+    """
+    Catches a loaded index up with the table: indexes rows written by
+    other processes (import_memories, the ingestion command, other
+    workers) and drops rows they deleted. When nothing changed this
+    costs one aggregate query. Returns (added, removed).
+    """
+
+    from memory_app.models import Memory
+
+    if index is None:
+        with _index_lock:
+            index = _indexes.get(namespace)
+        if index is None:
+            return 0, 0
+
+    if _index_fingerprint(index) == _table_fingerprint(namespace):
+        return 0, 0
+
+    table_ids = np.fromiter(
+        Memory.objects.filter(namespace=namespace).values_list("id", flat=True)
+        .iterator(chunk_size=LOADER_CHUNK_SIZE),
+        dtype=np.int64
+    )
+    indexed = index.live_ids()
+    missing = np.setdiff1d(table_ids, indexed).tolist()
+    gone = np.setdiff1d(indexed, table_ids).tolist()
+
+    vectors = load_embeddings(missing)
+    added = [memory_id for memory_id in missing if memory_id in vectors]
+    if added:
+        index.add(added, np.stack([vectors[memory_id] for memory_id in added]))
+    if gone:
+        index.remove(gone)
+
+    if added or gone:
+        logger.info(
+            "Vector index %r caught up with the table: %d added, %d removed",
+            namespace, len(added), len(gone)
+        )
+        _record_changes(namespace, index, len(added) + len(gone))
+
+    return len(added), len(gone)
+
+
+def _open_snapshot(namespace, config):
+    from .snapshot import open_snapshot_index
+
+    if not config["path"]:
+        raise ValueError("MEMORY_INDEX_BACKEND 'mmap' needs MEMORY_INDEX_PATH")
+
+    return open_snapshot_index(
+        config["path"], namespace,
+        compact_every=config["compact_every"],
+        sync_interval=config["sync_interval"],
+    )
+
+
+def _log_unloaded_changes(namespace, **changes):
+    # Under the mmap backend, processes that have the namespace loaded
+    # pick changes up from its snapshot's delta logs
+    config = _index_settings()
+    if config["backend"] == "mmap" and config["path"]:
+        from .snapshot import log_changes
+
+        log_changes(config["path"], namespace, **changes)
+
+
+def _evict_cold_indexes():
+    # Caller holds _index_lock; returns evicted indexes that need saving
+    evicted = []
+    limit = max(1, _index_settings()["max_namespaces"])
+
+    while len(_indexes) > limit:
+        name, index = _indexes.popitem(last=False)
+        _build_locks.pop(name, None)
+        _last_checked.pop(name, None)
+        if _pending_changes.pop(name, 0):
+            evicted.append((name, index))
+
+    return evicted
+
+
+def loaded_namespaces():
+    """
+    Namespaces whose indexes are currently in memory, coldest first.
+    """
+
+    with _index_lock:
+        return list(_indexes)
+
+
+def index_sizes():
+    """
+    Vector count of each loaded namespace index.
+    """
+
+    with _index_lock:
+        return {namespace: len(index) for namespace, index in _indexes.items()}
+
+
+def reset_index(namespace=None):
+    """
+    Drops one namespace's index, or every index; the next get_index()
+    rebuilds it.
+    """
+
+    with _index_lock:
+        if namespace is None:
+            _indexes.clear()
+            _pending_changes.clear()
+            _last_checked.clear()
+        else:
+            _indexes.pop(namespace, None)
+            _pending_changes.pop(namespace, None)
+            _last_checked.pop(namespace, None)
+
+
+def _record_changes(namespace, index, count):
+    if index.durable:
+        return
+
+    _pending_changes[namespace] = _pending_changes.get(namespace, 0) + count
+    if _pending_changes[namespace] >= _index_settings()["save_every"]:
+        save_index(namespace)
+
+
+def index_memories(memories):
+    """
+    Adds saved memories to their namespaces' indexes, where built.
+    An unbuilt index will pick them up from the table when it loads.
+    """
+
+    by_namespace = {}
+    for memory in memories:
+        by_namespace.setdefault(memory.namespace, []).append(memory)
+
+    for namespace, group in by_namespace.items():
+        with _index_lock:
+            index = _indexes.get(namespace)
+        ids = [memory.id for memory in group]
+        vectors = np.asarray([memory.embedding for memory in group], dtype=np.float32)
+        if index is None:
+            _log_unloaded_changes(namespace, ids=ids, vectors=vectors)
+            continue
+
+        index.add(ids, vectors)
+        _record_changes(namespace, index, len(group))
+
+
+def unindex_memories(ids, namespace=DEFAULT_NAMESPACE):
+    """
+    Removes deleted memory ids from the namespace's index, if built.
+    """
+
+    with _index_lock:
+        index = _indexes.get(namespace)
+    if index is None:
+        _log_unloaded_changes(namespace, removed=ids)
+        return
+
+    index.remove(ids)
+    _record_changes(namespace, index, len(ids))
+
+
+@atexit.register
+def _save_on_exit():
+    if any(_pending_changes.values()):
+        try:
+            save_index()
+        except Exception:
+            logger.exception("Could not persist vector index on exit")
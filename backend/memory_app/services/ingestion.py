@@ -0,0 +1,83 @@
+import numpy as np
+from django.db import transaction
+
+from memory_app.models import Memory
+from memory_app.namespaces import DEFAULT_NAMESPACE
+from .embedding import get_embeddings
+from .index import get_index, index_memories, normalize
+from .metrics import stage
+from .tiering import admit_memories
+
+
+DUPLICATE_THRESHOLD = 0.90
+
+
+def find_new_facts(embeddings, threshold=DUPLICATE_THRESHOLD, namespace=DEFAULT_NAMESPACE):
+    """
+    Returns the positions of facts that are not duplicates, in order.
+
+    A fact is a duplicate when its cosine similarity reaches `threshold`
+    against any stored memory in the namespace, or against an earlier
+    fact in the same batch that is itself being kept.
+    """
+
+    embeddings = normalize(embeddings)
+
+    # One pass against the stored corpus, one facts x facts matrix
+    corpus_scores = get_index(namespace).max_similarities(embeddings)
+    batch_scores = embeddings @ embeddings.T
+
+    kept = []
+    for position in range(len(embeddings)):
+        if corpus_scores[position] >= threshold:
+            continue
+        if kept and batch_scores[position, kept].max() >= threshold:
+            continue
+        kept.append(position)
+
+    return kept
+
+
+def store_facts(facts, embeddings=None, threshold=DUPLICATE_THRESHOLD,
+                namespace=DEFAULT_NAMESPACE, importances=None):
+    """
+    Embeds a batch of facts in one encode call, drops duplicates within
+    the namespace and writes the rest with bulk_create. Returns the
+    created memories.
+
+    A threshold of None keeps every fact. `importances`, if given,
+    holds one importance_score (or None for the default) per fact.
+    """
+
+    facts = list(facts)
+    if not facts:
+        return []
+
+    if embeddings is None:
+        with stage("embed"):
+            embeddings = get_embeddings(facts)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+
+    if threshold is None:
+        kept = range(len(facts))
+    else:
+        with stage("dedup"):
+            kept = find_new_facts(embeddings, threshold, namespace)
+
+    memories = []
+    for position in kept:
+        memory = Memory(namespace=namespace, content=facts[position], embedding=embeddings[position])
+        if importances is not None and importances[position] is not None:
+            memory.importance_score = importances[position]
+        memories.append(memory)
+    if not memories:
+        return []
+
+    with stage("store"):
+        created = Memory.objects.bulk_create(memories)
+
+    # bulk_create sends no post_save signals, so sync the index here
+    transaction.on_commit(lambda: index_memories(created))
+    transaction.on_commit(lambda: admit_memories(created))
+
+    return created
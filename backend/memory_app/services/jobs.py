@@ -0,0 +1,232 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from memory_app.models import IngestionJob
+from memory_app.namespaces import DEFAULT_NAMESPACE
+from .embedding import get_embeddings
+from .extractor import extract_memories
+from .ingestion import store_facts
+from .metrics import INGESTION_JOBS, stage
+from .sessions import compact_session
+
+logger = logging.getLogger(__name__)
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enqueue_ingestion(text, namespace=DEFAULT_NAMESPACE):
+    """
+    Queues text for memory extraction and returns the job.
+    Only the job row is written here; the LLM call happens later.
+    """
+
+    job = IngestionJob.objects.create(namespace=namespace, text=text)
+    _notify_worker()
+    return job
+
+
+def enqueue_compaction(session):
+    """
+    Queues compaction of a chat session's older turns and returns the
+    job, or None when one is already waiting for that session.
+    """
+
+    queued = IngestionJob.objects.filter(
+        kind=IngestionJob.COMPACT, session=session,
+        status__in=[IngestionJob.PENDING, IngestionJob.RUNNING]
+    )
+    if queued.exists():
+        return None
+
+    job = IngestionJob.objects.create(
+        kind=IngestionJob.COMPACT, namespace=session.namespace, session=session
+    )
+    _notify_worker()
+    return job
+
+
+def _notify_worker():
+    if settings.INGESTION_WORKER == "thread":
+        # Inside a transaction, the worker can only see the job after commit
+        transaction.on_commit(get_worker().notify)
+
+
+def claim_next_job():
+    """
+    Marks the oldest runnable job as running and returns it, or None.
+
+    Runnable means pending and due, or running for longer than
+    INGESTION_STALE_AFTER seconds (its worker died). The conditional
+    UPDATE makes the claim safe across worker threads and processes.
+    """
+
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.INGESTION_STALE_AFTER)
+
+    while True:
+        candidate = (
+            IngestionJob.objects
+            .filter(status=IngestionJob.PENDING, available_at__lte=now)
+            .order_by("id")
+            .values_list("id", "status", "started_at")
+            .first()
+        ) or (
+            IngestionJob.objects
+            .filter(status=IngestionJob.RUNNING, started_at__lt=stale_before)
+            .order_by("id")
+            .values_list("id", "status", "started_at")
+            .first()
+        )
+        if candidate is None:
+            return None
+
+        job_id, job_status, started_at = candidate
+        claimed = IngestionJob.objects.filter(
+            id=job_id, status=job_status, started_at=started_at
+        ).update(status=IngestionJob.RUNNING, started_at=now)
+
+        if claimed:
+            return IngestionJob.objects.get(id=job_id)
+        # Another worker got there first; try the next one
+
+
+def _extract(job):
+    """
+    Extracts and stores memories from the job's text. The extraction and
+    embedding calls run outside any transaction; only the final dedup +
+    insert holds the write lock. Returns (facts, created memories).
+    """
+
+    with stage("extract"):
+        facts = extract_memories(job.text)
+    with stage("embed"):
+        embeddings = get_embeddings(facts) if facts else None
+
+    with transaction.atomic():
+        created = store_facts(facts, embeddings, namespace=job.namespace)
+    return facts, created
+
+
+def run_job(job):
+    """
+    Runs a claimed job: extraction, or compaction of its chat session
+    (a no-op once the session is deleted). Failures are retried with
+    backoff up to INGESTION_MAX_ATTEMPTS.
+    """
+
+    job.attempts += 1
+
+    try:
+        if job.kind == IngestionJob.COMPACT:
+            if job.session is not None:
+                compact_session(job.session)
+            facts, created = [], []
+        else:
+            facts, created = _extract(job)
+    except Exception as exc:
+        logger.exception("Ingestion job %s (%s) failed", job.id, job.kind)
+        retry = job.attempts < settings.INGESTION_MAX_ATTEMPTS
+        job.error = str(exc)
+
+        if retry:
+            # Exponential backoff: RETRY_DELAY, 2x, 4x, ...
+            delay = settings.INGESTION_RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.status = IngestionJob.PENDING
+            job.available_at = timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = IngestionJob.FAILED
+            job.finished_at = timezone.now()
+
+        job.save(update_fields=["status", "attempts", "error", "available_at", "finished_at"])
+        INGESTION_JOBS.inc(outcome="retried" if retry else "failed")
+        return job
+
+    job.status = IngestionJob.SUCCEEDED
+    job.error = ""
+    job.extracted_count = len(facts)
+    job.memory_ids = [memory.id for memory in created]
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        "status", "attempts", "error", "extracted_count", "memory_ids", "finished_at"
+    ])
+    INGESTION_JOBS.inc(outcome="succeeded")
+    return job
+
+
+def run_pending_jobs(limit=None):
+    """
+    Processes runnable jobs until the queue is empty (or `limit` jobs
+    have run). Returns how many ran.
+    """
+
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+class IngestionWorker:
+    """
+    Background thread that drains the job queue. It wakes when a job is
+    enqueued in this process and also polls every
+    INGESTION_POLL_INTERVAL seconds, for jobs queued by other processes.
+    """
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self.run_forever, name="ingestion-worker", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def run_forever(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                run_pending_jobs()
+            except Exception:
+                logger.exception("Ingestion worker iteration failed")
+            finally:
+                # This thread owns its own DB connection
+                close_old_connections()
+
+            self._wakeup.wait(self.poll_interval)
+
+
+def get_worker():
+    """
+    Returns this process's ingestion worker thread, started on first use.
+    """
+
+    global _worker
+
+    with _worker_lock:
+        if _worker is None:
+            _worker = IngestionWorker(settings.INGESTION_POLL_INTERVAL)
+        _worker.start()
+
+    return _worker
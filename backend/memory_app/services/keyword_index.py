@@ -0,0 +1,147 @@
+import re
+
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+# SQLite FTS5 index over Memory.content. It is an external-content table,
+# so it stores only the postings; triggers keep it in sync with every
+# insert, update and delete on the memory table, bulk writes included.
+FTS_TABLE = "memory_app_memory_fts"
+MEMORY_TABLE = "memory_app_memory"
+
+CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    content,
+    content='{MEMORY_TABLE}',
+    content_rowid='id',
+    tokenize='porter unicode61'
+)
+"""
+
+TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {MEMORY_TABLE} BEGIN
+    INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+END
+""",
+    f"{FTS_TABLE}_ad": f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {MEMORY_TABLE} BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+END
+""",
+    f"{FTS_TABLE}_au": f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF content ON {MEMORY_TABLE} BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+END
+""",
+}
+
+_available = {}
+
+
+def ensure_keyword_index(using=DEFAULT_DB_ALIAS):
+    """
+    Creates the FTS5 table and its sync triggers if they are missing,
+    and rebuilds the postings when anything had to be (re)created.
+
+    Runs after every migrate: SQLite schema changes rebuild the memory
+    table, which silently drops its triggers.
+    """
+
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s) OR type = 'trigger'",
+            [FTS_TABLE, MEMORY_TABLE]
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+
+        if MEMORY_TABLE not in existing:
+            return False
+
+        missing = [name for name in [FTS_TABLE, *TRIGGERS] if name not in existing]
+        if not missing:
+            _available[using] = True
+            return True
+
+        cursor.execute(CREATE_TABLE)
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    _available[using] = True
+    return True
+
+
+def keyword_index_available(using=DEFAULT_DB_ALIAS):
+    """
+    True when the FTS5 keyword index exists on this database.
+    """
+
+    if using not in _available:
+        connection = connections[using]
+        available = False
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [FTS_TABLE]
+                )
+                available = cursor.fetchone() is not None
+        _available[using] = available
+
+    return _available[using]
+
+
+def match_expression(query):
+    """
+    Turns free text into an FTS5 query that matches any of its terms.
+    """
+
+    terms = dict.fromkeys(re.findall(r"\w+", str(query).lower()))
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def bm25_search(query, limit=None, ids=None, namespace=None, using=DEFAULT_DB_ALIAS):
+    """
+    BM25 scores for memories sharing at least one term with `query`,
+    optionally restricted to `ids` and/or one namespace. Higher is
+    better. Returns {memory_id: score}, best first.
+    """
+
+    expression = match_expression(query)
+    if not expression:
+        return {}
+
+    sql = f"SELECT {FTS_TABLE}.rowid, -bm25({FTS_TABLE}) FROM {FTS_TABLE}"
+    params = []
+
+    if namespace is not None:
+        sql += f" JOIN {MEMORY_TABLE} ON {MEMORY_TABLE}.id = {FTS_TABLE}.rowid"
+
+    sql += f" WHERE {FTS_TABLE} MATCH %s"
+    params.append(expression)
+
+    if namespace is not None:
+        sql += f" AND {MEMORY_TABLE}.namespace = %s"
+        params.append(namespace)
+
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return {}
+        sql += f" AND {FTS_TABLE}.rowid IN ({','.join(['%s'] * len(ids))})"
+        params.extend(ids)
+
+    sql += f" ORDER BY bm25({FTS_TABLE})"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return {memory_id: score for memory_id, score in cursor.fetchall()}
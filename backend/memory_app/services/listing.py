@@ -0,0 +1,134 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.fields import DateTimeField
+
+from memory_app.models import Memory
+from memory_app.namespaces import DEFAULT_NAMESPACE
+
+
+# Columns returned by the listing; never the embedding
+LIST_FIELDS = ("id", "namespace", "content", "importance_score", "created_at")
+
+# Rows fetched per database round trip while streaming
+STREAM_CHUNK_SIZE = 2000
+
+# Formats created_at exactly like MemorySerializer
+_datetime_field = DateTimeField()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, memory_id):
+    """
+    Opaque keyset cursor pointing just past (created_at, id).
+    """
+
+    raw = json.dumps([created_at.isoformat(), memory_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor(); raises InvalidCursor on bad input.
+    """
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, memory_id = json.loads(raw)
+        created_at = parse_datetime(created_at)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+
+    if created_at is None or not isinstance(memory_id, int):
+        raise InvalidCursor("malformed cursor")
+
+    return created_at, memory_id
+
+
+def memory_rows(namespace=DEFAULT_NAMESPACE, cursor=None):
+    """
+    Newest-first queryset of plain dicts for the namespace, starting
+    after `cursor`. Ordered on (created_at, id) so the keyset is total.
+    """
+
+    rows = (
+        Memory.objects
+        .filter(namespace=namespace)
+        .order_by("-created_at", "-id")
+        .values(*LIST_FIELDS)
+    )
+
+    if cursor:
+        created_at, memory_id = decode_cursor(cursor)
+        rows = rows.filter(
+            Q(created_at__lt=created_at) |
+            Q(created_at=created_at, id__lt=memory_id)
+        )
+
+    return rows
+
+
+def represent(row):
+    """
+    MemorySerializer's output for a values() row, without the
+    serializer machinery.
+    """
+
+    row["created_at"] = _datetime_field.to_representation(row["created_at"])
+    return row
+
+
+def memory_page(namespace=DEFAULT_NAMESPACE, limit=100, cursor=None):
+    """
+    One page of the listing. Returns (rows, next_cursor); next_cursor
+    is None on the last page.
+    """
+
+    rows = list(memory_rows(namespace, cursor)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+
+    return [represent(row) for row in rows], next_cursor
+
+
+def _encoded_rows(namespace, cursor):
+    # One JSON document per row, joined into one chunk per round trip
+    batch = []
+    for row in memory_rows(namespace, cursor).iterator(chunk_size=STREAM_CHUNK_SIZE):
+        batch.append(json.dumps(represent(row)))
+        if len(batch) == STREAM_CHUNK_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_ndjson(namespace=DEFAULT_NAMESPACE, cursor=None):
+    """
+    Yields every memory from `cursor` on as one JSON line each.
+    """
+
+    for batch in _encoded_rows(namespace, cursor):
+        yield "\n".join(batch) + "\n"
+
+
+def stream_json_array(namespace=DEFAULT_NAMESPACE, cursor=None):
+    """
+    Yields every memory from `cursor` on as chunks of one JSON array.
+    """
+
+    yield "["
+    separator = ""
+    for batch in _encoded_rows(namespace, cursor):
+        yield separator + ",".join(batch)
+        separator = ","
+    yield "]"
@@ -0,0 +1,371 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from .metrics import LLM_ERRORS, LLM_REJECTED, LLM_RETRIES, record_llm_usage
+from .startup import timed
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_async_clients = {}
+_client_lock = threading.Lock()
+
+
+class LLMUnavailable(Exception):
+    """
+    The upstream LLM could not be used: the circuit is open, too many
+    calls are already in flight, or retries ran out before the deadline.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling an unhealthy upstream. After `threshold` consecutive
+    failures the circuit opens and calls fail immediately; after
+    `cooldown` seconds a single probe call is let through, which closes
+    the circuit on success or reopens it on failure.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return "open"
+            return "half_open"
+
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning("LLM circuit opened after %d failures", self._failures)
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_COOLDOWN)
+
+# Bounds calls in flight across this process's threads and event
+# loops, streams included
+_slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+
+# How often a stream waiting for a slot checks again
+SLOT_POLL_INTERVAL = 0.01
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def _http_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+        keepalive_expiry=60
+    )
+
+
+def get_client():
+    """
+    Returns the shared OpenAI client, created on first use. Its
+    connection pool keeps connections to the upstream alive between
+    calls; retries are handled here rather than by the SDK.
+    """
+
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                with timed("llm.client_init"):
+                    from openai import DefaultHttpxClient, OpenAI
+
+                    _client = OpenAI(
+                        api_key=settings.OPENAI_API_KEY,
+                        base_url=settings.OPENAI_BASE_URL,
+                        max_retries=0,
+                        timeout=settings.LLM_TIMEOUT,
+                        http_client=DefaultHttpxClient(limits=_http_limits())
+                    )
+
+    return _client
+
+
+def _async_client():
+    """
+    AsyncOpenAI client for the running event loop.
+
+    Async HTTP connections belong to the loop that opened them, and
+    under WSGI each streamed request runs on a fresh loop.
+    """
+
+    loop = asyncio.get_running_loop()
+
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            # Drop clients whose loops have shut down
+            for stale_loop in [key for key in _async_clients if key.is_closed()]:
+                del _async_clients[stale_loop]
+
+            client = _async_clients[loop] = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                max_retries=0,
+                timeout=settings.LLM_TIMEOUT,
+                http_client=DefaultAsyncHttpxClient(limits=_http_limits())
+            )
+
+    return client
+
+
+async def _acquire_slot(timeout):
+    """
+    Takes one of the process-wide slots without blocking the event
+    loop. Returns False if none freed up within `timeout` seconds.
+
+    Polls instead of waiting on a thread, so a cancelled stream never
+    leaves a slot taken.
+    """
+
+    deadline = time.monotonic() + timeout
+    while not _slots.acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+    return True
+
+
+def _is_retryable(exc):
+    # Connection errors, timeouts, rate limits and 5xx; never other 4xx
+    import openai
+
+    if isinstance(exc, openai.APIConnectionError):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def _retry_delay(exc, attempt, deadline):
+    """
+    Seconds to wait before retrying after `exc`, or None to give up.
+    Honours Retry-After, otherwise exponential backoff with jitter,
+    and never sleeps past the deadline.
+    """
+
+    if attempt >= settings.LLM_MAX_RETRIES:
+        return None
+
+    delay = settings.LLM_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.0)
+
+    response = getattr(exc, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+def _before_call(purpose):
+    if not breaker.allow():
+        LLM_REJECTED.inc(purpose=purpose, reason="circuit_open")
+        raise LLMUnavailable(
+            "The language model is temporarily unavailable.",
+            retry_after=breaker.retry_after()
+        )
+
+
+def _after_error(exc, purpose, attempt, deadline):
+    """
+    Records a failed attempt. Returns the backoff before retrying;
+    raises when the call should not be retried.
+    """
+
+    retryable = _is_retryable(exc)
+    LLM_ERRORS.inc(purpose=purpose, retryable=retryable)
+
+    if not retryable:
+        # The upstream answered; the request itself was at fault
+        breaker.record_success()
+        raise exc
+
+    breaker.record_failure()
+    delay = _retry_delay(exc, attempt, deadline)
+    if delay is None:
+        raise LLMUnavailable(
+            f"The language model did not respond successfully: {exc}",
+            retry_after=breaker.retry_after() or None
+        ) from exc
+
+    LLM_RETRIES.inc(purpose=purpose)
+    return delay
+
+
+def _saturated(purpose):
+    LLM_REJECTED.inc(purpose=purpose, reason="saturated")
+    return LLMUnavailable("Too many language model calls in flight.", retry_after=1)
+
+
+def _track_in_flight(change):
+    global _in_flight
+
+    with _in_flight_lock:
+        _in_flight += change
+
+
+def complete(model, messages, purpose, **params):
+    """
+    Chat completion through the shared client.
+
+    At most LLM_MAX_CONCURRENCY calls run at once; a caller waits up to
+    LLM_QUEUE_TIMEOUT seconds for a slot. Transient failures are retried
+    with backoff until LLM_TIMEOUT seconds after the call started.
+    Raises LLMUnavailable when the upstream cannot be used.
+    """
+
+    deadline = time.monotonic() + settings.LLM_TIMEOUT
+
+    if not _slots.acquire(timeout=settings.LLM_QUEUE_TIMEOUT):
+        raise _saturated(purpose)
+    _track_in_flight(1)
+
+    try:
+        attempt = 0
+        while True:
+            _before_call(purpose)
+            try:
+                response = get_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    timeout=max(0.1, deadline - time.monotonic()),
+                    **params
+                )
+                break
+            except Exception as exc:
+                delay = _after_error(exc, purpose, attempt, deadline)
+
+            time.sleep(delay)
+            attempt += 1
+    finally:
+        _track_in_flight(-1)
+        _slots.release()
+
+    breaker.record_success()
+    record_llm_usage(model, purpose, getattr(response, "usage", None))
+    return response
+
+
+async def stream(model, messages, purpose, **params):
+    """
+    Streams a chat completion, yielding text deltas. Same limits as
+    complete(); only opening the stream is retried, since text already
+    sent to the client cannot be taken back.
+    """
+
+    deadline = time.monotonic() + settings.LLM_TIMEOUT
+
+    if not await _acquire_slot(settings.LLM_QUEUE_TIMEOUT):
+        raise _saturated(purpose)
+    _track_in_flight(1)
+
+    try:
+        attempt = 0
+        while True:
+            _before_call(purpose)
+            try:
+                response = await _async_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    # The last chunk then carries token usage
+                    stream_options={"include_usage": True},
+                    timeout=max(0.1, deadline - time.monotonic()),
+                    **params
+                )
+                break
+            except Exception as exc:
+                delay = _after_error(exc, purpose, attempt, deadline)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        # The upstream is answering, even if the client stops reading
+        breaker.record_success()
+
+        usage = None
+        try:
+            async for chunk in response:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except Exception as exc:
+            LLM_ERRORS.inc(purpose=purpose, retryable=_is_retryable(exc))
+            if _is_retryable(exc):
+                breaker.record_failure()
+            raise
+    finally:
+        _track_in_flight(-1)
+        _slots.release()
+
+    record_llm_usage(model, purpose, usage)
+
+
+def gateway_stats():
+    with _in_flight_lock:
+        in_flight = _in_flight
+
+    return {
+        "circuit": breaker.state,
+        "in_flight": in_flight,
+    }
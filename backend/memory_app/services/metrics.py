@@ -0,0 +1,250 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Histogram upper bounds in seconds, 1 ms to 30 s
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# Stages timed during the current request, for Server-Timing
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic count per label set.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label set, as Prometheus expects.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        position = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if position < len(self.buckets):
+                series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = _format_value(float(bound))
+                    samples.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), count))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get_or_create(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def render(self, collected=()):
+        """
+        Prometheus text exposition (format 0.0.4) of every metric, plus
+        `collected` families, (name, type, help, [(labels dict, value)]),
+        read by the caller at scrape time.
+        """
+
+        lines = []
+
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, kind, help_text, values in collected:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                labels = tuple(sorted(labels.items()))
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "hebbrix_http_request_duration_seconds",
+    "Time until the response (or its first byte, when streamed) is ready."
+)
+REQUESTS = REGISTRY.counter(
+    "hebbrix_http_requests_total",
+    "HTTP requests by route, method and status."
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "hebbrix_stage_duration_seconds",
+    "Time spent in each processing stage (embed, retrieve, llm, ...)."
+)
+LLM_REQUESTS = REGISTRY.counter(
+    "hebbrix_llm_requests_total",
+    "LLM calls by model and purpose."
+)
+LLM_TOKENS = REGISTRY.counter(
+    "hebbrix_llm_tokens_total",
+    "LLM tokens by model, purpose and kind (prompt or completion)."
+)
+LLM_RETRIES = REGISTRY.counter(
+    "hebbrix_llm_retries_total",
+    "LLM calls retried after a transient failure."
+)
+LLM_ERRORS = REGISTRY.counter(
+    "hebbrix_llm_errors_total",
+    "Failed LLM attempts, by whether they were retryable."
+)
+LLM_REJECTED = REGISTRY.counter(
+    "hebbrix_llm_rejected_total",
+    "LLM calls refused without reaching the upstream (circuit_open or saturated)."
+)
+TIER_SEARCHES = REGISTRY.counter(
+    "hebbrix_tier_searches_total",
+    "Vector searches answered by the hot tier or by the full index."
+)
+INGESTION_JOBS = REGISTRY.counter(
+    "hebbrix_ingestion_jobs_total",
+    "Finished ingestion job attempts by outcome."
+)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times the wrapped block as processing stage `name`: recorded in
+    the stage histogram and, inside a request, its Server-Timing header.
+    """
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def record_llm_usage(model, purpose, usage):
+    """
+    Counts one LLM call and, when the response reported usage, its
+    prompt and completion tokens.
+    """
+
+    LLM_REQUESTS.inc(model=model, purpose=purpose)
+
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if isinstance(tokens, int):
+            LLM_TOKENS.inc(tokens, model=model, purpose=purpose, kind=kind)
+
+
+def begin_request():
+    return _request_timings.set([])
+
+
+def end_request(token):
+    """
+    Stops collecting stage timings for the request; returns them.
+    """
+
+    timings = _request_timings.get()
+    _request_timings.reset(token)
+    return timings or []
+
+
+def server_timing_header(timings, total):
+    """
+    Server-Timing value for the request's stages (repeated stages
+    summed) and its total, in milliseconds.
+    """
+
+    durations = {}
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0.0) + seconds
+    durations["total"] = total
+
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()
+    )
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .index import normalize
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def context_key(chat_history):
+    """
+    Fingerprint of the conversation so far; answers are only reused
+    for the same preceding turns.
+    """
+
+    if not chat_history:
+        return ""
+    payload = json.dumps(chat_history, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Semantic cache of chat answers.
+
+    An entry is reused when a new query's embedding is within
+    `threshold` cosine similarity of a cached query, the same memory
+    ids were injected into the prompt, and the chat history matches.
+    Entries expire after `ttl` seconds; beyond `max_entries` the least
+    recently used are evicted. Entries that used a memory are dropped
+    when that memory is changed or deleted.
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600, threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+        # Per (namespace, memory ids, context) group: entry keys and a
+        # stacked matrix of their query vectors, rebuilt lazily
+        self._groups = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace, query_vector, memory_ids, context=""):
+        """
+        Returns a cached answer or None.
+        """
+
+        group_key = (namespace, frozenset(memory_ids), context)
+        query = normalize(query_vector)
+        now = time.monotonic()
+
+        with self._lock:
+            group = self._groups.get(group_key)
+            answer = None
+
+            if group is not None:
+                keys, matrix = self._group_matrix(group)
+                scores = matrix @ query
+                for position in np.argsort(-scores):
+                    if scores[position] < self.threshold:
+                        break
+                    entry = self._entries[keys[position]]
+                    if entry["expires_at"] > now:
+                        self._entries.move_to_end(keys[position])
+                        answer = entry["answer"]
+                        break
+
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def put(self, namespace, query_vector, memory_ids, answer, context=""):
+        group_key = (namespace, frozenset(memory_ids), context)
+
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+
+            self._entries[key] = {
+                "group": group_key,
+                "vector": normalize(query_vector),
+                "answer": answer,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            group = self._groups.setdefault(group_key, {"keys": [], "matrix": None})
+            group["keys"].append(key)
+            group["matrix"] = None
+
+            self._evict()
+
+    def invalidate(self, namespace, memory_ids):
+        """
+        Drops every answer whose prompt included any of `memory_ids`.
+        """
+
+        memory_ids = set(memory_ids)
+        with self._lock:
+            for group_key in [
+                key for key in self._groups
+                if key[0] == namespace and key[1] & memory_ids
+            ]:
+                for key in self._groups.pop(group_key)["keys"]:
+                    self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def _group_matrix(self, group):
+        if group["matrix"] is None:
+            group["matrix"] = np.stack([self._entries[key]["vector"] for key in group["keys"]])
+        return group["keys"], group["matrix"]
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry["expires_at"] <= now]:
+            self._remove(key)
+
+        # Least recently used first
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        group = self._groups[entry["group"]]
+        group["keys"].remove(key)
+        group["matrix"] = None
+        if not group["keys"]:
+            del self._groups[entry["group"]]
+
+
+def get_response_cache():
+    """
+    Returns the process-wide chat response cache, or None when
+    CHAT_CACHE_ENABLED is off.
+    """
+
+    global _cache
+
+    if not settings.CHAT_CACHE_ENABLED:
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_entries=settings.CHAT_CACHE_SIZE,
+                    ttl=settings.CHAT_CACHE_TTL,
+                    threshold=settings.CHAT_CACHE_THRESHOLD
+                )
+
+    return _cache
@@ -1,5 +1,47 @@
 import numpy as np
-from .embedding import get_embedding, cosine_similarity
+from django.db import DEFAULT_DB_ALIAS
+
+from memory_app.namespaces import DEFAULT_NAMESPACE
+from .embedding import get_embedding, get_embeddings
+from .index import get_index, load_embeddings, normalize, top_k_columns, top_k_indices
+from .keyword_index import bm25_search, keyword_index_available
+from .metrics import stage
+from .tiering import record_access, tiered_search, tiered_search_many
+
+
+# Candidates taken from each of the vector and keyword indexes,
+# relative to top_k
+HYBRID_CANDIDATE_FACTOR = 10
+
+# Queries of a batch ranked together: each block fetches and scores
+# the union of its queries' candidates as one matrix
+BATCH_BLOCK_SIZE = 64
+
+# Ids per IN (...) lookup, under SQLite's bound-parameter limit
+FETCH_CHUNK_SIZE = 5000
+
+
+def semantic_similarities(index, query_embeddings, ids):
+    """
+    Cosine similarity of each query in a stack to each memory id,
+    (len(queries), len(ids)), from the vector index. Ids the index has
+    not caught up with yet (written by another process since its last
+    sync) are scored from their stored embeddings instead; only ids
+    gone from the table stay NaN.
+    """
+
+    queries = np.atleast_2d(normalize(query_embeddings))
+    scores = index.score_ids_many(queries, ids)
+
+    missing = np.flatnonzero(np.isnan(scores).any(axis=0)).tolist()
+    if missing:
+        vectors = load_embeddings([ids[i] for i in missing])
+        found = [i for i in missing if ids[i] in vectors]
+        if found:
+            matrix = normalize(np.stack([vectors[ids[i]] for i in found]))
+            scores[:, found] = queries @ matrix.T
+
+    return scores
 
 
 def keyword_overlap_score(query: str, memory_text) -> float:
@@ -26,57 +68,311 @@ def keyword_overlap_score(query: str, memory_text) -> float:
     return len(overlap) / len(query_words)
 
 
-def hybrid_rank_memories(query: str, memories, 
+def keyword_scores(query: str, ids, contents, use_fts: bool,
+                   restrict: bool = True,
+                   namespace: str = DEFAULT_NAMESPACE,
+                   using=DEFAULT_DB_ALIAS,
+                   hits=None):
+    """
+    Keyword relevance of each memory to `query`, between 0 and 1:
+    BM25 scaled so the best memory scores 1, or plain overlap when the
+    FTS5 index is unavailable. With `restrict`, BM25 is computed over
+    `ids` only, otherwise over the whole namespace.
+
+    `hits` reuses BM25 scores the caller already has ({memory_id:
+    score}, e.g. from the candidate search) instead of matching again;
+    ids missing from it score 0.
+    """
+
+    if not use_fts:
+        return np.array([
+            keyword_overlap_score(query, content) for content in contents
+        ], dtype=np.float64)
+
+    if hits is not None:
+        keyword_hits = hits
+    elif restrict:
+        keyword_hits = bm25_search(query, ids=ids, using=using)
+    else:
+        keyword_hits = bm25_search(query, namespace=namespace, using=using)
+    raw_scores = np.array(
+        [keyword_hits.get(memory_id, 0.0) for memory_id in ids], dtype=np.float64
+    )
+    best = raw_scores.max() if len(raw_scores) else 0.0
+    return raw_scores / best if best > 0 else raw_scores
+
+
+def hybrid_score_matrix(queries, memories, query_embeddings=None,
+                        namespace: str = DEFAULT_NAMESPACE):
+    """
+    Hybrid score components of every query against every memory, for
+    evaluating many queries or weightings at once.
+
+    Semantic scores for all queries come from one matrix product over
+    the vector index. Returns a dict with `ids`, `contents`,
+    `semantic` and `keyword` (len(queries) x len(ids), in [0,1]) and
+    `importance` (len(ids)). Combine with combine_scores().
+    """
+
+    if query_embeddings is None:
+        query_embeddings = get_embeddings(list(queries))
+
+    memories = memories.filter(namespace=namespace)
+    rows = list(memories.order_by("id").values_list("id", "content", "importance_score"))
+    ids, contents, importances = zip(*rows) if rows else ((), (), ())
+
+    similarities = semantic_similarities(get_index(namespace), query_embeddings, ids)
+
+    # Drop memories deleted meanwhile, as hybrid_rank_memories does
+    keep = np.flatnonzero(~np.isnan(similarities).any(axis=0))
+    ids = [ids[i] for i in keep]
+    contents = [contents[i] for i in keep]
+
+    use_fts = keyword_index_available(memories.db)
+
+    return {
+        "ids": ids,
+        "contents": contents,
+        "semantic": (similarities[:, keep].astype(np.float64) + 1) / 2,
+        "keyword": np.array([
+            keyword_scores(
+                query, ids, contents, use_fts,
+                restrict=False, namespace=namespace, using=memories.db
+            )
+            for query in queries
+        ]).reshape(len(queries), len(ids)),
+        "importance": np.array([importances[i] or 0.0 for i in keep], dtype=np.float64),
+    }
+
+
+def combine_scores(semantic, keyword, importance,
+                   alpha: float = 0.7,
+                   beta: float = 0.2,
+                   gamma: float = 0.1):
+    """
+    Final hybrid score; broadcasts over single rows or whole matrices.
+    """
+
+    return alpha * semantic + beta * keyword + gamma * importance
+
+
+def hybrid_rank_memories(query: str, memories,
                          alpha: float = 0.7,
                          beta: float = 0.2,
-                         gamma: float = 0.1):
+                         gamma: float = 0.1,
+                         top_k: int = None,
+                         query_embedding=None,
+                         namespace: str = DEFAULT_NAMESPACE):
     """
     Hybrid ranking combining:
     - Semantic similarity (alpha)
-    - Keyword overlap (beta)
+    - Keyword relevance (beta)
     - Importance score (gamma)
 
     alpha + beta + gamma should sum to 1.
+
+    With a top_k, only a candidate set is ranked: the vector index's
+    nearest HYBRID_CANDIDATE_FACTOR * top_k memories plus as many BM25
+    keyword hits from the FTS5 index. Without one, every memory is
+    ranked. Semantic scores come from the vector index and keyword
+    scores from the inverted index, so no memory text is tokenized
+    per query.
+
+    Only memories in `namespace` are considered, scored against that
+    namespace's own index.
     """
 
-    query_embedding = get_embedding(query)
+    if query_embedding is None:
+        with stage("embed"):
+            query_embedding = get_embedding(query)
+    index = get_index(namespace)
+    memories = memories.filter(namespace=namespace)
+    use_fts = keyword_index_available(memories.db)
+    keyword_hits = None
 
-    results = []
+    if top_k:
+        limit = top_k * HYBRID_CANDIDATE_FACTOR
+        with stage("retrieve"):
+            candidate_ids, _ = tiered_search(namespace, query_embedding, limit)
+        candidates = set(candidate_ids.tolist())
+
+        if use_fts:
+            with stage("keyword"):
+                keyword_hits = bm25_search(
+                    query, limit=limit, namespace=namespace, using=memories.db
+                )
+            candidates.update(keyword_hits)
+
+        memories = memories.filter(id__in=candidates)
 
-    for memory in memories:
+    with stage("fetch"):
+        rows = list(memories.values_list("id", "content", "importance_score"))
+    if not rows:
+        return []
 
-        # 1️⃣ Semantic similarity
-        semantic_score = cosine_similarity(
-            query_embedding,
-            memory.embedding
+    ids, contents, importances = zip(*rows)
+
+    # 1️⃣ Semantic similarity, normalized from [-1,1] to [0,1]
+    similarities = semantic_similarities(index, query_embedding, ids)[0]
+    present = ~np.isnan(similarities)
+    if not present.all():
+        # Deleted since the rows were fetched
+        ids, contents, importances = (
+            [values[i] for i in np.flatnonzero(present)]
+            for values in (ids, contents, importances)
         )
+        similarities = similarities[present]
+        if not ids:
+            return []
 
-        # Normalize cosine similarity from [-1,1] to [0,1]
-        semantic_score = (semantic_score + 1) / 2
+    semantic_scores = (similarities.astype(np.float64) + 1) / 2
 
-        # 2️⃣ Keyword overlap (already normalized)
-        keyword_score = keyword_overlap_score(query, memory.content)
+    # 2️⃣ Keyword score: BM25 scaled so the best candidate scores 1,
+    # or plain overlap when the FTS5 index is unavailable. Candidates
+    # reuse the scores of the keyword search that found them; vector
+    # candidates outside its top `limit` count as no keyword match.
+    keyword = keyword_scores(
+        query, ids, contents, use_fts,
+        restrict=bool(top_k), namespace=namespace, using=memories.db,
+        hits=keyword_hits
+    )
 
-        # 3️⃣ Importance score (assumed already between 0 and 1)
-        importance_score = memory.importance_score or 0.0
+    # 3️⃣ Importance score (assumed already between 0 and 1)
+    importance_scores = np.array([score or 0.0 for score in importances])
 
-        # 4️⃣ Final weighted score
-        final_score = (
-            alpha * semantic_score +
-            beta * keyword_score +
-            gamma * importance_score
-        )
+    # 4️⃣ Final weighted score
+    final_scores = combine_scores(
+        semantic_scores, keyword, importance_scores, alpha, beta, gamma
+    )
 
+    results = []
+    for position in top_k_indices(final_scores, top_k).tolist():
         results.append({
-            "id": memory.id,
-            "content": memory.content,
-            "semantic_score": round(semantic_score, 4),
-            "keyword_score": round(keyword_score, 4),
-            "importance_score": round(importance_score, 4),
-            "final_score": round(final_score, 4)
+            "id": ids[position],
+            "content": contents[position],
+            "semantic_score": round(float(semantic_scores[position]), 4),
+            "keyword_score": round(float(keyword[position]), 4),
+            "importance_score": round(float(importance_scores[position]), 4),
+            "final_score": round(float(final_scores[position]), 4)
         })
 
-    # Sort by final score descending
-    results.sort(key=lambda x: x["final_score"], reverse=True)
+    # Full rankings (e.g. the evaluator) are not retrieval hits
+    if top_k:
+        record_access([result["id"] for result in results])
+
+    return results
+
+
+def hybrid_rank_batch(queries, memories, top_k: int = 5,
+                      alpha: float = 0.7,
+                      beta: float = 0.2,
+                      gamma: float = 0.1,
+                      query_embeddings=None,
+                      namespace: str = DEFAULT_NAMESPACE):
+    """
+    hybrid_rank_memories() with a top_k for many queries at once.
+    Returns one result list per query, in the same format. Offline
+    batch lookups are not retrieval hits, so access counts (and with
+    them the hot tier) are left alone.
+
+    All queries are embedded in one call and their vector candidates
+    come from one search_many(). Queries are then ranked in blocks of
+    BATCH_BLOCK_SIZE: the union of a block's candidates is fetched once,
+    scored against every query of the block as one queries x candidates
+    matrix, and each row's top_k is picked by partial selection. A
+    query only ranks its own candidates, so results match the
+    single-query ranking.
+    """
+
+    queries = list(queries)
+    if not queries:
+        return []
+
+    if query_embeddings is None:
+        with stage("embed"):
+            query_embeddings = get_embeddings(queries)
+    index = get_index(namespace)
+    memories = memories.filter(namespace=namespace)
+    use_fts = keyword_index_available(memories.db)
+    limit = top_k * HYBRID_CANDIDATE_FACTOR
+
+    with stage("retrieve"):
+        vector_ids, _ = tiered_search_many(namespace, query_embeddings, limit)
+    candidates = [set(row.tolist()) for row in vector_ids]
+    keyword_hits = [None] * len(queries)
+
+    if use_fts:
+        with stage("keyword"):
+            for position, query in enumerate(queries):
+                keyword_hits[position] = bm25_search(
+                    query, limit=limit, namespace=namespace, using=memories.db
+                )
+                candidates[position].update(keyword_hits[position])
+
+    results = []
+    for start in range(0, len(queries), BATCH_BLOCK_SIZE):
+        block = slice(start, start + BATCH_BLOCK_SIZE)
+        results.extend(_rank_block(
+            queries[block], query_embeddings[block], candidates[block], keyword_hits[block],
+            memories, top_k, (alpha, beta, gamma), use_fts, namespace
+        ))
+
+    return results
+
+
+def _rank_block(queries, query_embeddings, candidates, keyword_hits, memories,
+                top_k, weights, use_fts, namespace):
+    union = sorted(set().union(*candidates))
+    with stage("fetch"):
+        rows = []
+        for start in range(0, len(union), FETCH_CHUNK_SIZE):
+            rows.extend(memories.filter(
+                id__in=union[start:start + FETCH_CHUNK_SIZE]
+            ).values_list("id", "content", "importance_score"))
+    if not rows:
+        return [[] for _ in queries]
+
+    ids, contents, importances = zip(*rows)
+
+    # Semantic similarity of every query to every candidate in one product
+    similarities = semantic_similarities(get_index(namespace), query_embeddings, ids)
+    present = np.flatnonzero(~np.isnan(similarities).any(axis=0))
+    ids = [ids[i] for i in present]
+    contents = [contents[i] for i in present]
+    importance_scores = np.array([importances[i] or 0.0 for i in present])
+    semantic_scores = (similarities[:, present].astype(np.float64) + 1) / 2
+
+    # Keyword scores only for each query's own candidates; the rest of
+    # its row is masked out of the selection
+    columns = {memory_id: column for column, memory_id in enumerate(ids)}
+    keyword = np.zeros(semantic_scores.shape)
+    own = np.zeros(semantic_scores.shape, dtype=bool)
+    for row, (query, candidate_ids) in enumerate(zip(queries, candidates)):
+        own_columns = [columns[i] for i in candidate_ids if i in columns]
+        if not own_columns:
+            continue
+        own[row, own_columns] = True
+        keyword[row, own_columns] = keyword_scores(
+            query, [ids[c] for c in own_columns], [contents[c] for c in own_columns],
+            use_fts, namespace=namespace, using=memories.db, hits=keyword_hits[row]
+        )
+
+    final_scores = combine_scores(semantic_scores, keyword, importance_scores, *weights)
+    final_scores[~own] = -np.inf
+    top = top_k_columns(final_scores, min(top_k, len(ids)))[:, :top_k]
 
-    return results
\ No newline at end of file
+    ranked = []
+    for row, positions in enumerate(top.tolist()):
+        ranked.append([
+            {
+                "id": ids[position],
+                "content": contents[position],
+                "semantic_score": round(float(semantic_scores[row, position]), 4),
+                "keyword_score": round(float(keyword[row, position]), 4),
+                "importance_score": round(float(importance_scores[position]), 4),
+                "final_score": round(float(final_scores[row, position]), 4)
+            }
+            for position in positions
+            if own[row, position]
+        ])
+    return ranked
@@ -0,0 +1,206 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from memory_app.models import ChatSession, ChatTurn
+from memory_app.namespaces import DEFAULT_NAMESPACE
+from . import llm
+from .metrics import stage
+
+SUMMARY_MODEL = "gpt-4.1-nano"
+
+# Most recent turns never folded into the summary, so the model always
+# sees the last exchange verbatim
+MIN_RECENT_TURNS = 2
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (~4 characters per token plus per-message
+    overhead); close enough for budgeting without a tokenizer.
+    """
+
+    return len(text) // 4 + 4
+
+
+def start_session(namespace=DEFAULT_NAMESPACE):
+    return ChatSession.objects.create(namespace=namespace)
+
+
+def _expired_before():
+    if settings.CHAT_SESSION_TTL is None:
+        return None
+    return timezone.now() - timedelta(seconds=settings.CHAT_SESSION_TTL)
+
+
+def get_session(session_id, namespace=DEFAULT_NAMESPACE):
+    """
+    The namespace's session with this id, or None. Sessions idle for
+    longer than CHAT_SESSION_TTL seconds are treated as gone.
+    """
+
+    try:
+        session_id = uuid.UUID(str(session_id))
+    except ValueError:
+        return None
+
+    sessions = ChatSession.objects.filter(id=session_id, namespace=namespace)
+    expired_before = _expired_before()
+    if expired_before is not None:
+        sessions = sessions.filter(updated_at__gte=expired_before)
+    return sessions.first()
+
+
+def prune_sessions():
+    """
+    Deletes sessions idle for longer than CHAT_SESSION_TTL seconds,
+    with their turns. Returns how many sessions were deleted.
+    """
+
+    expired_before = _expired_before()
+    if expired_before is None:
+        return 0
+
+    deleted, per_model = ChatSession.objects.filter(updated_at__lt=expired_before).delete()
+    return per_model.get(ChatSession._meta.label, 0)
+
+
+def _recent_turns(session):
+    return (
+        session.turns
+        .filter(id__gt=session.summarized_through)
+        .order_by("id")
+    )
+
+
+def session_history(session):
+    """
+    Prompt messages for the session: the rolling summary of older
+    turns, then the recent turns verbatim.
+    """
+
+    messages = []
+    if session.summary:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{session.summary}"
+        })
+
+    messages.extend(
+        {"role": role, "content": content}
+        for role, content in _recent_turns(session).values_list("role", "content")
+    )
+    return messages
+
+
+def summarize_turns(summary, turns):
+    """
+    Folds `turns` (role, content pairs) into the existing summary.
+    Only the new turns are sent, never the whole conversation.
+    """
+
+    transcript = "\n".join(f"{role}: {content}" for role, content in turns)
+    max_tokens = settings.CHAT_SUMMARY_MAX_TOKENS
+
+    prompt = f"""
+Update the running summary of a conversation with the new turns below.
+Keep facts, decisions, open questions and anything the user may refer back to.
+Drop pleasantries. Write plain prose, at most {max_tokens * 3 // 4} words.
+
+Current summary:
+{summary or "(none)"}
+
+New turns:
+{transcript}
+"""
+
+    with stage("summarize"):
+        response = llm.complete(
+            SUMMARY_MODEL,
+            [{"role": "user", "content": prompt}],
+            "summary",
+            max_tokens=max_tokens
+        )
+
+    return response.choices[0].message.content.strip()
+
+
+def unsummarized_tokens(session):
+    return _recent_turns(session).aggregate(total=Sum("token_count"))["total"] or 0
+
+
+def compact_session(session):
+    """
+    Folds the oldest unsummarized turns into the summary once they
+    exceed CHAT_HISTORY_TOKEN_BUDGET. Returns whether it did.
+
+    Turns are folded until the rest fit in half the budget, so the
+    summarizer runs once every few exchanges rather than on every turn.
+    """
+
+    budget = settings.CHAT_HISTORY_TOKEN_BUDGET
+    turns = list(_recent_turns(session).values_list("id", "role", "content", "token_count"))
+
+    total = sum(turn[3] for turn in turns)
+    if total <= budget:
+        return False
+
+    folded = 0
+    while folded < len(turns) - MIN_RECENT_TURNS and total > budget // 2:
+        total -= turns[folded][3]
+        folded += 1
+
+    if not folded:
+        return False
+
+    summary = summarize_turns(
+        session.summary,
+        [(role, content) for _, role, content, _ in turns[:folded]]
+    )
+    summarized_through = turns[folded - 1][0]
+
+    # Conditional, so a concurrent compaction of the same turns wins once
+    updated = ChatSession.objects.filter(
+        id=session.id, summarized_through=session.summarized_through
+    ).update(
+        summary=summary,
+        summarized_through=summarized_through,
+        updated_at=timezone.now()
+    )
+
+    if updated:
+        session.summary = summary
+        session.summarized_through = summarized_through
+    return bool(updated)
+
+
+def record_exchange(session, query, answer):
+    """
+    Appends a user query and the assistant's answer to the session.
+
+    Once the unsummarized turns exceed CHAT_HISTORY_TOKEN_BUDGET, a
+    compaction job is queued; the summary is an LLM call, so it never
+    runs inside the chat request. Returns the job, or None.
+    """
+
+    # jobs imports this module
+    from .jobs import enqueue_compaction
+
+    ChatTurn.objects.bulk_create([
+        ChatTurn(
+            session=session, role=ChatTurn.USER,
+            content=query, token_count=estimate_tokens(query)
+        ),
+        ChatTurn(
+            session=session, role=ChatTurn.ASSISTANT,
+            content=answer, token_count=estimate_tokens(answer)
+        ),
+    ])
+    ChatSession.objects.filter(id=session.id).update(updated_at=timezone.now())
+
+    if unsummarized_tokens(session) <= settings.CHAT_HISTORY_TOKEN_BUDGET:
+        return None
+    return enqueue_compaction(session)
@@ -0,0 +1,678 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.utils import timezone
+
+from memory_app.namespaces import DEFAULT_NAMESPACE
+from .index import (
+    QUERY_BLOCK_SIZE,
+    VectorIndex,
+    _table_fingerprint,
+    index_path,
+    normalize,
+    top_k_columns,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Layout under each namespace's index directory:
+#   snapshot/manifest.json        current generation, row count, dim
+#   snapshot/lock                 shared by writers, exclusive to switch generations
+#   snapshot/compact.lock         held by the one process compacting
+#   snapshot/gen-000001/ids.npy   sorted memory ids
+#   snapshot/gen-000001/vectors.npy   normalized float32 rows, memory-mapped
+#   snapshot/gen-000001/delta-<pid>.log   appends/removals since the generation
+SNAPSHOT_DIRNAME = "snapshot"
+MANIFEST_FILENAME = "manifest.json"
+LOCK_FILENAME = "lock"
+COMPACT_LOCK_FILENAME = "compact.lock"
+
+OP_ADD = 1
+OP_REMOVE = 2
+
+# Rows copied at a time while writing a generation
+WRITE_CHUNK_SIZE = 65536
+
+
+def record_dtype(dim):
+    """
+    One fixed-size delta log record: op, memory id and normalized
+    vector (zeros for removals).
+    """
+
+    return np.dtype([("op", "<i8"), ("id", "<i8"), ("vector", "<f4", (dim,))])
+
+
+def make_records(dim, ids=(), vectors=None, removed=()):
+    added = np.asarray(ids, dtype=np.int64).reshape(-1)
+    removed = np.asarray(removed, dtype=np.int64).reshape(-1)
+
+    records = np.zeros(len(added) + len(removed), dtype=record_dtype(dim))
+    records["op"][:len(added)] = OP_ADD
+    records["op"][len(added):] = OP_REMOVE
+    records["id"] = np.concatenate([added, removed])
+    if len(added):
+        records["vector"][:len(added)] = normalize(vectors).reshape(len(added), dim)
+    return records
+
+
+def snapshot_dir(path, namespace=DEFAULT_NAMESPACE):
+    return index_path(path, namespace).parent / SNAPSHOT_DIRNAME
+
+
+def generation_dir(directory, generation):
+    return Path(directory) / f"gen-{generation:06d}"
+
+
+def read_manifest(directory):
+    try:
+        return json.loads((Path(directory) / MANIFEST_FILENAME).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory, generation, rows, dim):
+    path = Path(directory) / MANIFEST_FILENAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps({
+        "generation": generation,
+        "rows": rows,
+        "dim": dim,
+        "created_at": timezone.now().isoformat(),
+    }))
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def file_lock(path, exclusive=False, blocking=True):
+    """
+    flock() on `path`. Yields False instead of waiting when
+    non-blocking and another process holds a conflicting lock.
+    """
+
+    with open(path, "a+b") as f:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(f, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_records(path, offset, dtype):
+    """
+    Whole records appended to a delta log past `offset`, and the offset
+    after them. A record still being written is left for next time.
+    """
+
+    count = (path.stat().st_size - offset) // dtype.itemsize
+    if count <= 0:
+        return np.empty(0, dtype=dtype), offset
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        records = np.fromfile(f, dtype=dtype, count=count)
+    return records, offset + len(records) * dtype.itemsize
+
+
+def _append_records(directory, generation, records):
+    # Caller holds the shared lock, so the generation cannot switch mid-write
+    path = generation_dir(directory, generation) / f"delta-{os.getpid()}.log"
+    with open(path, "ab", buffering=0) as f:
+        f.write(records.tobytes())
+
+
+def _write_generation(directory, generation, ids, dim, take):
+    """
+    Writes a generation's ids.npy and vectors.npy, sorted by id.
+    `take(positions)` returns the vectors at those positions of `ids`.
+    """
+
+    target = generation_dir(directory, generation)
+    # Leftovers of a compaction that died before switching
+    shutil.rmtree(target, ignore_errors=True)
+    target.mkdir(parents=True)
+
+    order = np.argsort(ids, kind="stable")
+    np.save(target / "ids.npy", np.asarray(ids, dtype=np.int64)[order])
+
+    if not len(ids):
+        np.save(target / "vectors.npy", np.empty((0, dim), dtype=np.float32))
+        return
+
+    matrix = np.lib.format.open_memmap(
+        target / "vectors.npy", mode="w+", dtype=np.float32, shape=(len(ids), dim)
+    )
+    for start in range(0, len(ids), WRITE_CHUNK_SIZE):
+        matrix[start:start + WRITE_CHUNK_SIZE] = take(order[start:start + WRITE_CHUNK_SIZE])
+    matrix.flush()
+    del matrix
+
+
+def _switch_generation(directory, old_generation, offsets, generation, rows, dim):
+    """
+    Points the manifest at a freshly written generation. Records that
+    reached the old generation's logs past `offsets` while it was being
+    written are carried over, so no change is lost.
+    """
+
+    with file_lock(Path(directory) / LOCK_FILENAME, exclusive=True):
+        if old_generation is not None:
+            dtype = record_dtype(dim)
+            carried = []
+            for path in sorted(generation_dir(directory, old_generation).glob("delta-*.log")):
+                records, _ = _read_records(path, offsets.get(path.name, 0), dtype)
+                carried.append(records)
+
+            carried = np.concatenate(carried) if carried else np.empty(0, dtype=dtype)
+            if len(carried):
+                # pid 0 never writes, so this name is free
+                with open(generation_dir(directory, generation) / "delta-0.log", "wb") as f:
+                    f.write(carried.tobytes())
+
+        _write_manifest(directory, generation, rows, dim)
+
+    if old_generation is not None:
+        # Processes still mapping the old files keep their pages until they remap
+        shutil.rmtree(generation_dir(directory, old_generation), ignore_errors=True)
+
+
+def _positions_in(base_ids, live, ids):
+    """
+    Rows of `ids` in a sorted base, -1 where absent or removed.
+    """
+
+    ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+    if not len(base_ids):
+        return np.full(len(ids), -1, dtype=np.int64)
+
+    positions = np.minimum(np.searchsorted(base_ids, ids), len(base_ids) - 1)
+    found = base_ids[positions] == ids
+    if live is not None:
+        found &= live[positions]
+    return np.where(found, positions, -1)
+
+
+class SnapshotIndex:
+    """
+    Exact cosine index over a read-only, memory-mapped snapshot that
+    every worker process shares through the page cache.
+
+    The snapshot is a generation of sorted ids and normalized vectors
+    written once. Inserts and deletes are appended to this process's
+    delta log in the generation directory and kept in a small in-memory
+    VectorIndex; rows they supersede are masked out of the base. Other
+    processes' logs are replayed at most every `sync_interval` seconds.
+    Once `compact_every` records have accumulated, compact() folds them
+    into the next generation and every process remaps it.
+
+    Records of one id from two processes are applied in log order, not
+    time order; the table fingerprint check on open catches any drift.
+    """
+
+    backend = "mmap"
+    approximate = False
+
+    # Changes persist through the delta logs, never through save()
+    durable = True
+
+    def __init__(self, directory, compact_every=20000, sync_interval=1.0):
+        self.directory = Path(directory)
+        self.compact_every = compact_every
+        self.sync_interval = sync_interval
+        self.generation = None
+        self.dim = None
+        self._lock = threading.RLock()
+        self._load_base(None)
+
+    def __len__(self):
+        return self._base_count + len(self._delta)
+
+    def __contains__(self, memory_id):
+        base_ids, _, live, delta = self._view()
+        return memory_id in delta or _positions_in(base_ids, live, [memory_id])[0] >= 0
+
+    @property
+    def delta_records(self):
+        """
+        Log records replayed on top of the mapped generation.
+        """
+
+        return self._records_applied
+
+    def _load_base(self, manifest):
+        # Caller holds self._lock
+        if manifest is None:
+            self.generation = None
+            self._base_ids = np.empty(0, dtype=np.int64)
+            self._base_matrix = np.empty((0, self.dim or 0), dtype=np.float32)
+        else:
+            self.generation = manifest["generation"]
+            self.dim = manifest["dim"]
+            target = generation_dir(self.directory, self.generation)
+            if manifest["rows"]:
+                self._base_ids = np.load(target / "ids.npy", mmap_mode="r")
+                self._base_matrix = np.load(target / "vectors.npy", mmap_mode="r")
+            else:
+                self._base_ids = np.empty(0, dtype=np.int64)
+                self._base_matrix = np.empty((0, self.dim), dtype=np.float32)
+
+        self._base_live = None
+        self._base_count = len(self._base_ids)
+        self._delta = VectorIndex(self.dim)
+        self._offsets = {}
+        self._records_applied = 0
+        self._last_sync = time.monotonic()
+
+    def _view(self):
+        with self._lock:
+            return self._base_ids, self._base_matrix, self._base_live, self._delta
+
+    def sync(self):
+        """
+        Remaps a new generation if one was written and replays records
+        appended to the delta logs since the last sync.
+        """
+
+        with file_lock(self.directory / LOCK_FILENAME):
+            self._sync_locked()
+
+    def _maybe_sync(self):
+        if time.monotonic() - self._last_sync < self.sync_interval:
+            return
+
+        # Skip rather than wait while a generation switch holds the lock
+        with file_lock(self.directory / LOCK_FILENAME, blocking=False) as acquired:
+            if acquired:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        # Caller holds the shared file lock
+        with self._lock:
+            manifest = read_manifest(self.directory)
+            if manifest is None:
+                self._last_sync = time.monotonic()
+                return
+            if manifest["generation"] != self.generation:
+                self._load_base(manifest)
+
+            dtype = record_dtype(self.dim)
+            for path in sorted(generation_dir(self.directory, self.generation).glob("delta-*.log")):
+                records, offset = _read_records(path, self._offsets.get(path.name, 0), dtype)
+                if len(records):
+                    self._apply(records)
+                    self._offsets[path.name] = offset
+
+            self._last_sync = time.monotonic()
+
+    def _apply(self, records):
+        # Caller holds self._lock; only the last record per id matters
+        _, last = np.unique(records["id"][::-1], return_index=True)
+        final = records[len(records) - 1 - last]
+
+        positions = _positions_in(self._base_ids, self._base_live, final["id"])
+        positions = positions[positions >= 0]
+        if len(positions):
+            # Fresh mask, so in-flight readers keep a consistent view
+            live = (
+                np.ones(len(self._base_ids), dtype=bool)
+                if self._base_live is None else self._base_live.copy()
+            )
+            live[positions] = False
+            self._base_live = live
+            self._base_count -= len(positions)
+
+        removed = final[final["op"] == OP_REMOVE]
+        if len(removed):
+            self._delta.remove(removed["id"].tolist())
+
+        added = final[final["op"] == OP_ADD]
+        if len(added):
+            self._delta.add(added["id"], added["vector"])
+
+        self._records_applied += len(records)
+
+    def add(self, ids, vectors):
+        """
+        Inserts or replaces rows for the given memory ids.
+        """
+
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if not len(ids):
+            return
+
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if self.generation is None:
+            self._create(vectors.shape[1])
+
+        self._write(make_records(self.dim, ids, vectors))
+
+    def remove(self, ids):
+        """
+        Drops rows for the given memory ids. Unknown ids are ignored.
+        """
+
+        ids = list(ids)
+        if not ids or self.generation is None:
+            return
+
+        self._write(make_records(self.dim, removed=ids))
+
+    def _write(self, records):
+        with file_lock(self.directory / LOCK_FILENAME):
+            manifest = read_manifest(self.directory)
+            if manifest["dim"] != self.dim:
+                raise ValueError(
+                    f"Snapshot {self.directory} holds {manifest['dim']}-d vectors, got {self.dim}-d"
+                )
+            _append_records(self.directory, manifest["generation"], records)
+            # Replays our own records too, after any that came before them
+            self._sync_locked()
+
+        if self._records_applied >= self.compact_every:
+            self.compact()
+
+    def _create(self, dim):
+        # First rows of a namespace that had no snapshot: start an empty generation
+        with file_lock(self.directory / COMPACT_LOCK_FILENAME, exclusive=True):
+            if read_manifest(self.directory) is None:
+                _write_generation(self.directory, 1, np.empty(0, dtype=np.int64), dim, None)
+                _switch_generation(self.directory, None, {}, 1, 0, dim)
+        self.sync()
+
+    def compact(self):
+        """
+        Folds every delta log into a new generation and remaps it.
+        Returns a stats dict, or None when another process is already
+        compacting this namespace.
+        """
+
+        with file_lock(self.directory / COMPACT_LOCK_FILENAME, exclusive=True, blocking=False) as acquired:
+            if not acquired or self.generation is None:
+                return None
+
+            self.sync()
+            with self._lock:
+                base_ids, matrix, live, delta = self._view()
+                generation, offsets = self.generation, dict(self._offsets)
+                folded = self._records_applied
+
+            # Written without the shared lock: other processes keep
+            # appending to the current generation meanwhile
+            keep = np.flatnonzero(live) if live is not None else np.arange(len(base_ids))
+            delta_ids, delta_matrix = delta.snapshot()
+            ids = np.concatenate([np.asarray(base_ids)[keep], delta_ids])
+
+            def take(positions):
+                rows = np.empty((len(positions), self.dim), dtype=np.float32)
+                from_base = positions < len(keep)
+                rows[from_base] = matrix[keep[positions[from_base]]]
+                rows[~from_base] = delta_matrix[positions[~from_base] - len(keep)]
+                return rows
+
+            _write_generation(self.directory, generation + 1, ids, self.dim, take)
+            _switch_generation(self.directory, generation, offsets, generation + 1, len(ids), self.dim)
+
+        self.sync()
+        return {"generation": generation + 1, "rows": len(ids), "folded": folded}
+
+    def live_ids(self):
+        base_ids, _, live, delta = self._view()
+        base_ids = np.asarray(base_ids)
+        if live is not None:
+            base_ids = base_ids[live]
+        delta_ids, _ = delta.snapshot()
+        return np.concatenate([base_ids, delta_ids])
+
+    def fingerprint(self):
+        ids = self.live_ids()
+        if not len(ids):
+            return 0, 0, 0
+        return len(ids), int(ids.max()), int(ids.sum())
+
+    def snapshot(self):
+        """
+        Returns (ids, matrix) of the live rows. This copies the mapped
+        rows into process memory; prefer the scoring methods.
+        """
+
+        base_ids, matrix, live, delta = self._view()
+        delta_ids, delta_matrix = delta.snapshot()
+        if live is not None:
+            base_ids, matrix = base_ids[live], matrix[live]
+        return (
+            np.concatenate([base_ids, delta_ids]),
+            np.concatenate([matrix, delta_matrix.reshape(-1, matrix.shape[1])]),
+        )
+
+    def similarities(self, query):
+        """
+        Cosine similarity of `query` against every live row.
+        Returns (ids, scores).
+        """
+
+        self._maybe_sync()
+        base_ids, matrix, live, delta = self._view()
+        query = normalize(query)
+
+        scores = matrix @ query if len(base_ids) else np.empty(0, dtype=np.float32)
+        base_ids = np.asarray(base_ids)
+        if live is not None:
+            base_ids, scores = base_ids[live], scores[live]
+
+        delta_ids, delta_scores = delta.similarities(query)
+        return np.concatenate([base_ids, delta_ids]), np.concatenate([scores, delta_scores])
+
+    def score_ids(self, query, ids):
+        """
+        Cosine similarity of `query` to the given memory ids only,
+        NaN for ids that are not indexed.
+        """
+
+        return self.score_ids_many(query, ids)[0]
+
+    def score_ids_many(self, queries, ids):
+        """
+        Cosine similarity of each query in a stack to the given memory
+        ids. Columns of ids that are not indexed are NaN.
+        """
+
+        self._maybe_sync()
+        base_ids, matrix, live, delta = self._view()
+        queries = np.atleast_2d(normalize(queries))
+        ids = list(ids)
+
+        scores = np.full((len(queries), len(ids)), np.nan, dtype=np.float32)
+        in_delta = np.array([memory_id in delta for memory_id in ids], dtype=bool)
+        if in_delta.any():
+            scores[:, in_delta] = delta.score_ids_many(queries, np.asarray(ids)[in_delta].tolist())
+
+        positions = _positions_in(base_ids, live, ids)
+        found = (positions >= 0) & ~in_delta
+        if found.any():
+            scores[:, found] = queries @ matrix[positions[found]].T
+        return scores
+
+    def search(self, query, k, exact=False):
+        """
+        Top-k rows by cosine similarity, best first.
+        Returns (ids, scores).
+        """
+
+        ids, scores = self.search_many(query, len(self) if k is None else k)
+        return ids[0], scores[0]
+
+    def search_many(self, queries, k, exact=False):
+        """
+        Top-k rows for each query in a stack: the mapped base is scored
+        in blocks of matrix-matrix products and merged with the delta.
+        Returns (ids, scores), both shaped (len(queries), min(k, len(self))).
+        """
+
+        self._maybe_sync()
+        base_ids, matrix, live, delta = self._view()
+        queries = np.atleast_2d(normalize(queries))
+        k = min(k, len(self))
+
+        result_ids = np.empty((len(queries), k), dtype=np.int64)
+        result_scores = np.empty((len(queries), k), dtype=np.float32)
+        if not k:
+            return result_ids, result_scores
+
+        delta_ids, delta_scores = delta.search_many(queries, k)
+        dead = np.flatnonzero(~live) if live is not None else None
+
+        for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+            block = slice(start, start + QUERY_BLOCK_SIZE)
+            scores = queries[block] @ matrix.T
+            if dead is not None:
+                scores[:, dead] = -np.inf
+
+            top = top_k_columns(scores, k)
+            candidate_ids = np.concatenate([np.asarray(base_ids)[top], delta_ids[block]], axis=1)
+            candidate_scores = np.concatenate(
+                [np.take_along_axis(scores, top, axis=1), delta_scores[block]], axis=1
+            )
+
+            best = top_k_columns(candidate_scores, k)[:, :k]
+            result_ids[block] = np.take_along_axis(candidate_ids, best, axis=1)
+            result_scores[block] = np.take_along_axis(candidate_scores, best, axis=1)
+
+        return result_ids, result_scores
+
+    def max_similarities(self, queries):
+        """
+        Highest cosine similarity of each query to any indexed row,
+        or -1.0 for every query against an empty index.
+        """
+
+        _, scores = self.search_many(queries, 1)
+        if not scores.shape[1]:
+            return np.full(len(scores), -1.0, dtype=np.float32)
+        return scores[:, 0]
+
+    def max_similarity(self, query):
+        """
+        Highest cosine similarity of `query` to any indexed row,
+        or -1.0 for an empty index.
+        """
+
+        _, scores = self.search(query, 1)
+        if not len(scores):
+            return -1.0
+        return float(scores[0])
+
+
+def _build_from_table(directory, namespace, previous):
+    """
+    Writes the next generation from the namespace's Memory rows,
+    carrying over changes logged to `previous` meanwhile.
+    """
+
+    from memory_app.models import Memory
+
+    old_generation = previous["generation"] if previous else None
+    offsets = {}
+    if old_generation is not None:
+        for path in generation_dir(directory, old_generation).glob("delta-*.log"):
+            offsets[path.name] = path.stat().st_size
+
+    rows = Memory.objects.filter(namespace=namespace).order_by("id").values_list("id", "embedding")
+    ids, vectors = [], []
+    for memory_id, embedding in rows.iterator(chunk_size=2000):
+        ids.append(memory_id)
+        vectors.append(embedding)
+
+    if ids:
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        dim = vectors.shape[1]
+    elif previous:
+        # Every memory was deleted; keep the layout with no rows
+        ids = np.empty(0, dtype=np.int64)
+        dim = previous["dim"]
+        vectors = np.empty((0, dim), dtype=np.float32)
+    else:
+        return False
+
+    if previous and previous["dim"] != dim:
+        # Carried records would not fit the new rows
+        old_generation = None
+
+    generation = (previous["generation"] if previous else 0) + 1
+    _write_generation(directory, generation, ids, dim, lambda positions: vectors[positions])
+    _switch_generation(directory, old_generation, offsets, generation, len(ids), dim)
+    if previous and old_generation is None:
+        shutil.rmtree(generation_dir(directory, previous["generation"]), ignore_errors=True)
+
+    logger.info("Wrote vector snapshot %s generation %d (%d rows)", directory, generation, len(ids))
+    return True
+
+
+def open_snapshot_index(path, namespace=DEFAULT_NAMESPACE, compact_every=20000, sync_interval=1.0):
+    """
+    Maps the namespace's current snapshot generation and replays its
+    delta logs. When there is none, or it no longer matches the Memory
+    table, one is written from the table first (by one process; the
+    others wait and map it).
+    """
+
+    if fcntl is None:
+        raise ValueError("MEMORY_INDEX_BACKEND 'mmap' needs POSIX file locks (fcntl)")
+
+    directory = snapshot_dir(path, namespace)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    index = SnapshotIndex(directory, compact_every, sync_interval)
+    index.sync()
+    if index.fingerprint() == _table_fingerprint(namespace):
+        return index
+
+    with file_lock(directory / COMPACT_LOCK_FILENAME, exclusive=True):
+        # Another process may have rebuilt it while we waited
+        index.sync()
+        if index.fingerprint() != _table_fingerprint(namespace):
+            if index.generation is not None:
+                logger.info("Vector snapshot %s is stale, rebuilding", directory)
+            _build_from_table(directory, namespace, read_manifest(directory))
+
+    index.sync()
+    return index
+
+
+def log_changes(path, namespace=DEFAULT_NAMESPACE, ids=(), vectors=None, removed=()):
+    """
+    Appends changes to a namespace this process has not loaded to its
+    snapshot's delta log, so processes that have it loaded see them.
+    Does nothing when the namespace has no snapshot yet.
+    """
+
+    directory = snapshot_dir(path, namespace)
+    if fcntl is None or not directory.exists():
+        return
+
+    with file_lock(directory / LOCK_FILENAME):
+        manifest = read_manifest(directory)
+        if manifest is None:
+            return
+        _append_records(
+            directory, manifest["generation"],
+            make_records(manifest["dim"], ids, vectors, removed)
+        )
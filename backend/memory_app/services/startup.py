@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def record_timing(name, seconds):
+    """
+    Records how long a startup step took, in seconds.
+    """
+
+    with _timings_lock:
+        _timings[name] = seconds
+
+    logger.info("startup: %s took %.3fs", name, seconds)
+
+
+@contextmanager
+def timed(name):
+    """
+    Times the wrapped block and records it under `name`.
+    """
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - started)
+
+
+def startup_timings():
+    """
+    Startup steps recorded so far, in the order they finished.
+    """
+
+    with _timings_lock:
+        return dict(_timings)
+
+
+def warmup():
+    """
+    Loads the embedding model, LLM client and vector index, and runs a
+    dummy encode, so the first request does not pay for any of them.
+    """
+
+    from .embedding import get_cache, get_model
+    from .index import get_index
+    from .llm import get_client
+
+    with timed("warmup"):
+        get_model()
+        get_cache()
+        get_client()
+
+        with timed("index.load"):
+            get_index()
+
+        with timed("embedding.first_encode"):
+            # Bypass the cache so the model itself runs once
+            get_model().encode(["warmup"])
+
+    return startup_timings()
+
+
+def start_workers():
+    """
+    Starts this process's ingestion worker when INGESTION_WORKER is
+    "thread", so jobs left pending or stale by a crashed or restarted
+    process run without waiting for a new job to be enqueued.
+    """
+
+    from django.conf import settings
+
+    from .jobs import get_worker
+
+    if settings.INGESTION_WORKER == "thread":
+        get_worker()
@@ -0,0 +1,297 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from memory_app.models import Memory
+from memory_app.namespaces import DEFAULT_NAMESPACE
+from .index import VectorIndex, get_index, load_embeddings
+from .metrics import TIER_SEARCHES
+
+logger = logging.getLogger(__name__)
+
+# Ids per UPDATE when flushing access counts
+FLUSH_BATCH_SIZE = 500
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+# namespace -> (hot tier index, monotonic time it was built)
+_hot_tiers = {}
+_hot_lock = threading.Lock()
+# Namespaces being rebuilt, and the (stored, deleted) changes to apply
+# to their new tier once built
+_rebuilding = set()
+_pending_changes = {}
+
+
+class AccessTracker:
+    """
+    Counts how often retrieval returns each memory.
+
+    Hits are buffered in memory and written once MEMORY_ACCESS_FLUSH_SIZE
+    distinct memories are pending or MEMORY_ACCESS_FLUSH_INTERVAL
+    seconds have passed, as one F() increment UPDATE per distinct count
+    instead of a write per read.
+    """
+
+    def __init__(self, flush_size, flush_interval):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, ids):
+        with self._lock:
+            self._pending.update(ids)
+            due = (
+                len(self._pending) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes pending counts; returns how many memories were updated.
+        """
+
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        by_count = {}
+        for memory_id, count in pending.items():
+            by_count.setdefault(count, []).append(memory_id)
+
+        now = timezone.now()
+        try:
+            for count, ids in by_count.items():
+                for start in range(0, len(ids), FLUSH_BATCH_SIZE):
+                    Memory.objects.filter(id__in=ids[start:start + FLUSH_BATCH_SIZE]).update(
+                        access_count=F("access_count") + count,
+                        last_accessed_at=now
+                    )
+        except Exception:
+            # Keep the counts for the next flush rather than losing them
+            logger.exception("Could not flush memory access counts")
+            with self._lock:
+                self._pending.update(pending)
+            return 0
+
+        return len(pending)
+
+
+def get_access_tracker():
+    global _tracker
+
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = AccessTracker(
+                    settings.MEMORY_ACCESS_FLUSH_SIZE,
+                    settings.MEMORY_ACCESS_FLUSH_INTERVAL
+                )
+
+    return _tracker
+
+
+def record_access(ids):
+    if ids:
+        get_access_tracker().record(ids)
+
+
+@atexit.register
+def _flush_on_exit():
+    if _tracker is not None:
+        _tracker.flush()
+
+
+def build_hot_tier(namespace=DEFAULT_NAMESPACE):
+    """
+    Exact index over the namespace's MEMORY_HOT_TIER_SIZE most
+    recently retrieved memories, plus as many of the most recently
+    stored ones that have never been retrieved.
+    """
+
+    size = settings.MEMORY_HOT_TIER_SIZE
+    memories = Memory.objects.filter(namespace=namespace)
+    accessed = list(
+        memories
+        .filter(last_accessed_at__isnull=False)
+        .order_by("-last_accessed_at", "-access_count")
+        .values_list("id", flat=True)[:size]
+    )
+    # New memories have no access history yet, but are the likeliest
+    # to be asked about next
+    fresh = list(
+        memories
+        .filter(last_accessed_at__isnull=True)
+        .order_by("-id")
+        .values_list("id", flat=True)[:size]
+    )
+
+    index = VectorIndex()
+    ids = accessed + fresh
+    vectors = load_embeddings(ids)
+    present = [memory_id for memory_id in ids if memory_id in vectors]
+    if present:
+        index.add(present, np.stack([vectors[memory_id] for memory_id in present]))
+    return index
+
+
+def refresh_hot_tier(namespace=DEFAULT_NAMESPACE):
+    """
+    Rebuilds the namespace's hot tier and swaps it in. Memories stored
+    or deleted while it was being built are applied before the swap.
+    """
+
+    with _hot_lock:
+        _pending_changes.setdefault(namespace, ([], []))
+
+    try:
+        index = build_hot_tier(namespace)
+    finally:
+        with _hot_lock:
+            admitted, forgotten = _pending_changes.pop(namespace)
+
+    with _hot_lock:
+        if admitted:
+            _add_memories(index, admitted)
+        index.remove(forgotten)
+        _hot_tiers[namespace] = (index, time.monotonic())
+    return index
+
+
+def _rebuild_in_background(namespace):
+    try:
+        refresh_hot_tier(namespace)
+    except Exception:
+        logger.exception("Could not rebuild the hot tier of namespace %s", namespace)
+    finally:
+        with _hot_lock:
+            _rebuilding.discard(namespace)
+        connection.close()
+
+
+def get_hot_tier(namespace=DEFAULT_NAMESPACE):
+    """
+    The namespace's hot tier, or None until one has been built.
+
+    A tier older than MEMORY_HOT_TIER_REFRESH seconds keeps serving
+    while a background thread rebuilds it, so no request waits on the
+    rebuild.
+    """
+
+    with _hot_lock:
+        entry = _hot_tiers.get(namespace)
+        stale = entry is None or time.monotonic() - entry[1] >= settings.MEMORY_HOT_TIER_REFRESH
+        if stale and namespace not in _rebuilding:
+            _rebuilding.add(namespace)
+            threading.Thread(
+                target=_rebuild_in_background, args=(namespace,),
+                name="memory-hot-tier", daemon=True
+            ).start()
+
+    return entry[0] if entry is not None else None
+
+
+def _add_memories(index, memories):
+    index.add(
+        [memory.id for memory in memories],
+        np.asarray([memory.embedding for memory in memories], dtype=np.float32)
+    )
+
+
+def admit_memories(memories):
+    """
+    Adds newly stored memories to their namespaces' hot tiers, if
+    built, so a search never prefers older hot rows over them.
+    """
+
+    by_namespace = {}
+    for memory in memories:
+        by_namespace.setdefault(memory.namespace, []).append(memory)
+
+    with _hot_lock:
+        for namespace, group in by_namespace.items():
+            if namespace in _pending_changes:
+                _pending_changes[namespace][0].extend(group)
+            entry = _hot_tiers.get(namespace)
+            if entry is not None:
+                _add_memories(entry[0], group)
+
+
+def forget_memories(ids, namespace=DEFAULT_NAMESPACE):
+    """
+    Drops deleted memories from the namespace's hot tier, if built.
+    """
+
+    with _hot_lock:
+        if namespace in _pending_changes:
+            _pending_changes[namespace][1].extend(ids)
+        entry = _hot_tiers.get(namespace)
+        if entry is not None:
+            entry[0].remove(ids)
+
+
+def tiered_search(namespace, query, k):
+    """
+    Top-k (ids, scores) for the query, scoring the hot tier first.
+
+    The full index is only scanned when the hot tier is not built yet,
+    has fewer than k memories, or its k-th best score is below
+    MEMORY_HOT_TIER_CONFIDENCE. Namespaces no larger than
+    MEMORY_HOT_TIER_SIZE are always searched in full.
+    """
+
+    index = get_index(namespace)
+
+    if settings.MEMORY_TIERING_ENABLED and len(index) > settings.MEMORY_HOT_TIER_SIZE:
+        hot = get_hot_tier(namespace)
+        if hot is not None and len(hot) >= k:
+            ids, scores = hot.search(query, k)
+            if len(scores) and scores[-1] >= settings.MEMORY_HOT_TIER_CONFIDENCE:
+                TIER_SEARCHES.inc(tier="hot")
+                return ids, scores
+
+    TIER_SEARCHES.inc(tier="full")
+    return index.search(query, k)
+
+
+def tiered_search_many(namespace, queries, k):
+    """
+    tiered_search() for a stack of queries: the hot tier answers every
+    query it is confident about, and only the rest scan the full index.
+    Returns (ids, scores) shaped (len(queries), min(k, indexed rows)).
+    """
+
+    index = get_index(namespace)
+    queries = np.atleast_2d(queries)
+
+    if settings.MEMORY_TIERING_ENABLED and len(index) > settings.MEMORY_HOT_TIER_SIZE:
+        hot = get_hot_tier(namespace)
+        if hot is not None and len(hot) >= k:
+            ids, scores = hot.search_many(queries, k)
+            cold = np.flatnonzero(scores[:, -1] < settings.MEMORY_HOT_TIER_CONFIDENCE)
+            if len(cold):
+                ids[cold], scores[cold] = index.search_many(queries[cold], k)
+
+            TIER_SEARCHES.inc(len(queries) - len(cold), tier="hot")
+            TIER_SEARCHES.inc(len(cold), tier="full")
+            return ids, scores
+
+    TIER_SEARCHES.inc(len(queries), tier="full")
+    return index.search_many(queries, k)
@@ -0,0 +1,275 @@
+import base64
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from memory_app.models import Memory
+from memory_app.namespaces import DEFAULT_NAMESPACE, is_valid_namespace
+from .embedding import CACHE_MODEL, encode_bulk
+from .index import get_index
+from .ingestion import DUPLICATE_THRESHOLD, find_new_facts, store_facts
+from .listing import STREAM_CHUNK_SIZE, represent
+from .metrics import stage
+
+
+# Records embedded and written per chunk during import
+IMPORT_BATCH_SIZE = 512
+
+# Line-level problems reported back in the import summary
+MAX_REPORTED_ERRORS = 20
+
+
+# -------------------------------
+# Export
+# -------------------------------
+
+def pack_embedding(vector):
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def unpack_embedding(value):
+    return np.frombuffer(base64.b64decode(value), dtype="<f4")
+
+
+def export_memories(namespace=None, include_embeddings=False):
+    """
+    Yields every memory (of one namespace, or all) as NDJSON, in
+    chunks, oldest first.
+
+    With `include_embeddings`, each line also carries its float32
+    vector (base64) and the model and backend that produced it
+    ("model@backend"), so importing it with the same pair skips
+    encoding.
+    """
+
+    fields = ["id", "namespace", "content", "importance_score", "created_at"]
+    if include_embeddings:
+        fields.append("embedding")
+
+    rows = Memory.objects.order_by("id").values(*fields)
+    if namespace is not None:
+        rows = rows.filter(namespace=namespace)
+
+    batch = []
+    for row in rows.iterator(chunk_size=STREAM_CHUNK_SIZE):
+        if include_embeddings:
+            row["embedding"] = pack_embedding(row["embedding"])
+            row["embedding_model"] = CACHE_MODEL
+        batch.append(json.dumps(represent(row)))
+
+        if len(batch) == STREAM_CHUNK_SIZE:
+            yield "\n".join(batch) + "\n"
+            batch = []
+
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+
+# -------------------------------
+# Import
+# -------------------------------
+
+def parse_record(line, namespace=None):
+    """
+    Validates one NDJSON line. Returns a record dict with `content`,
+    `namespace`, `importance_score`, `created_at` and `embedding`
+    (a vector, or None when it has to be computed); raises ValueError.
+    """
+
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+
+    content = data.get("content")
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("'content' must be a non-empty string")
+
+    record_namespace = namespace or data.get("namespace") or DEFAULT_NAMESPACE
+    if not is_valid_namespace(record_namespace):
+        raise ValueError(f"invalid namespace {record_namespace!r}")
+
+    importance = data.get("importance_score")
+    if importance is not None:
+        importance = float(importance)
+
+    created_at = data.get("created_at")
+    if created_at is not None:
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError("'created_at' is not an ISO 8601 datetime")
+
+    # Vectors from another model live in a different space, and another
+    # backend's differ slightly; re-encode
+    vector = None
+    if data.get("embedding") and data.get("embedding_model") == CACHE_MODEL:
+        vector = unpack_embedding(data["embedding"])
+
+    return {
+        "content": content.strip(),
+        "namespace": record_namespace,
+        "importance_score": importance,
+        "created_at": created_at,
+        "embedding": vector,
+    }
+
+
+def _check_dimension(record, dims):
+    # A vector must match the namespace's index, or the first vector
+    # seen for it in this import while the index is still empty
+    vector = record["embedding"]
+    if vector is None:
+        return
+
+    record_namespace = record["namespace"]
+    if record_namespace not in dims:
+        dims[record_namespace] = get_index(record_namespace).dim
+    expected = dims[record_namespace]
+
+    if expected is None:
+        dims[record_namespace] = len(vector)
+    elif len(vector) != expected:
+        raise ValueError(f"'embedding' has {len(vector)} dimensions, expected {expected}")
+
+
+def _read_chunks(lines, namespace, batch_size, stats):
+    chunk = []
+    dims = {}
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        stats["read"] += 1
+        try:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            record = parse_record(line, namespace)
+            _check_dimension(record, dims)
+        except (ValueError, TypeError) as exc:
+            stats["invalid"] += 1
+            if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                stats["errors"].append(f"line {line_number}: {exc}")
+            continue
+
+        chunk.append(record)
+        if len(chunk) == batch_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def _embed_chunk(records):
+    # Runs on the worker pool: encode whatever has no usable vector
+    missing = [i for i, record in enumerate(records) if record["embedding"] is None]
+    if missing:
+        encoded = encode_bulk([records[i]["content"] for i in missing])
+        for i, vector in zip(missing, encoded):
+            records[i]["embedding"] = vector
+    return records, len(missing)
+
+
+def _write_chunk(records, threshold, stats):
+    by_namespace = {}
+    for record in records:
+        by_namespace.setdefault(record["namespace"], []).append(record)
+
+    with transaction.atomic():
+        for namespace, group in by_namespace.items():
+            embeddings = np.stack([record["embedding"] for record in group])
+
+            # Deduplicate here rather than in store_facts, so each
+            # created memory can be matched back to its record
+            if threshold is None:
+                kept = list(range(len(group)))
+            else:
+                with stage("dedup"):
+                    kept = find_new_facts(embeddings, threshold, namespace)
+            kept_records = [group[position] for position in kept]
+
+            created = store_facts(
+                [record["content"] for record in kept_records],
+                embeddings=embeddings[kept],
+                threshold=None,
+                namespace=namespace,
+                importances=[record["importance_score"] for record in kept_records],
+            )
+            stats["imported"] += len(created)
+            stats["duplicates"] += len(group) - len(created)
+
+            # auto_now_add overrides created_at on insert; restore it
+            _restore_created_at([
+                (record["created_at"], memory.id)
+                for record, memory in zip(kept_records, created) if record["created_at"]
+            ])
+
+
+def _restore_created_at(pairs):
+    # One prepared UPDATE for the chunk; bulk_update's CASE expressions
+    # cost more than the insert itself
+    if not pairs:
+        return
+
+    connection = connections[Memory.objects.db]
+    field = Memory._meta.get_field("created_at")
+    table = Memory._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET created_at = %s WHERE id = %s",
+            [
+                (field.get_db_prep_value(created_at, connection), memory_id)
+                for created_at, memory_id in pairs
+            ]
+        )
+
+
+def import_memories(lines, namespace=None, threshold=DUPLICATE_THRESHOLD,
+                    batch_size=IMPORT_BATCH_SIZE, workers=2):
+    """
+    Imports memories from an iterable of NDJSON lines (str or bytes).
+
+    Lines are read incrementally and grouped into chunks of
+    `batch_size`. Chunks are embedded on a pool of `workers` threads
+    while earlier chunks are deduplicated against each namespace's
+    index and written with bulk_create, one transaction per chunk, in
+    input order. Lines exported with embeddings from the current model
+    are not re-encoded, but their length must match the namespace's
+    index dimension or the line counts as invalid. `namespace` overrides the namespace of every
+    record; a threshold of None disables deduplication.
+
+    Returns a summary dict of counts and the first line errors.
+    """
+
+    stats = {
+        "read": 0,
+        "imported": 0,
+        "duplicates": 0,
+        "invalid": 0,
+        "encoded": 0,
+        "errors": [],
+    }
+
+    workers = max(1, workers)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memory-import") as pool:
+        for chunk in _read_chunks(lines, namespace, batch_size, stats):
+            pending.append(pool.submit(_embed_chunk, chunk))
+
+            # Keep the pool busy, but bound how many chunks sit in memory
+            while len(pending) > workers:
+                records, encoded = pending.popleft().result()
+                stats["encoded"] += encoded
+                _write_chunk(records, threshold, stats)
+
+        while pending:
+            records, encoded = pending.popleft().result()
+            stats["encoded"] += encoded
+            _write_chunk(records, threshold, stats)
+
+    return stats
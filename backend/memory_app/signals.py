@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Memory
+from .services.index import index_memories, unindex_memories
+from .services.keyword_index import ensure_keyword_index
+from .services.response_cache import get_response_cache
+from .services.tiering import admit_memories, forget_memories
+
+
+@receiver(post_save, sender=Memory)
+def add_memory_to_index(sender, instance, **kwargs):
+    # Wait for commit so a rolled-back insert never reaches the index
+    transaction.on_commit(lambda: index_memories([instance]))
+    transaction.on_commit(lambda: admit_memories([instance]))
+
+
+@receiver(post_save, sender=Memory)
+@receiver(post_delete, sender=Memory)
+def invalidate_cached_answers(sender, instance, **kwargs):
+    # Answers built from this memory's old content are no longer valid
+    cache = get_response_cache()
+    if cache is not None:
+        cache.invalidate(instance.namespace, [instance.id])
+
+
+@receiver(post_delete, sender=Memory)
+def remove_memory_from_index(sender, instance, **kwargs):
+    memory_id, namespace = instance.id, instance.namespace
+    transaction.on_commit(lambda: unindex_memories([memory_id], namespace))
+    transaction.on_commit(lambda: forget_memories([memory_id], namespace))
+
+
+def sync_keyword_index(sender, using, **kwargs):
+    # Connected in MemoryAppConfig.ready() for post_migrate
+    ensure_keyword_index(using)
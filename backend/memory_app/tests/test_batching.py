@@ -0,0 +1,126 @@
+import threading
+import time
+
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from memory_app.services.batching import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    """
+    Fake model: records each batch it encodes and can hold the first
+    call until released, so requests queue up behind it.
+    """
+
+    def __init__(self, hold_first=False):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not hold_first:
+            self.release.set()
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+class EmbeddingBatcherTests(SimpleTestCase):
+
+    def test_lone_request_skips_the_batching_window(self):
+        encoder = RecordingEncoder()
+        batcher = EmbeddingBatcher(encoder, max_batch_size=64, max_wait_ms=1000)
+
+        started = time.monotonic()
+        vectors = batcher.encode_many(["hello"])
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(vectors.tolist(), [[5.0, 1.0]])
+        self.assertEqual(encoder.batches, [["hello"]])
+
+    def test_queued_requests_are_coalesced(self):
+        encoder = RecordingEncoder(hold_first=True)
+        batcher = EmbeddingBatcher(encoder, max_batch_size=64, max_wait_ms=50)
+
+        first = batcher.submit(["a"])
+        self.assertTrue(encoder.started.wait(5))
+        second = batcher.submit(["bb", "a"])
+        third = batcher.submit(["ccc"])
+        encoder.release.set()
+
+        self.assertEqual(first.result(5).tolist(), [[1.0, 1.0]])
+        self.assertEqual(second.result(5).tolist(), [[2.0, 1.0], [1.0, 1.0]])
+        self.assertEqual(third.result(5).tolist(), [[3.0, 1.0]])
+        # Unique texts of both queued requests in one call
+        self.assertEqual(encoder.batches, [["a"], ["bb", "a", "ccc"]])
+        self.assertEqual(batcher.stats()["batches"], 2)
+
+    def test_batch_flushes_at_max_batch_size(self):
+        encoder = RecordingEncoder(hold_first=True)
+        batcher = EmbeddingBatcher(encoder, max_batch_size=2, max_wait_ms=200)
+
+        first = batcher.submit(["a"])
+        self.assertTrue(encoder.started.wait(5))
+        futures = [batcher.submit([text]) for text in ("b", "c", "d")]
+        encoder.release.set()
+
+        first.result(5)
+        for future in futures:
+            future.result(5)
+        self.assertEqual(encoder.batches, [["a"], ["b", "c"], ["d"]])
+
+    def test_waits_for_more_requests_after_concurrent_traffic(self):
+        encoder = RecordingEncoder(hold_first=True)
+        batcher = EmbeddingBatcher(encoder, max_batch_size=64, max_wait_ms=300)
+
+        batcher.submit(["a"])
+        self.assertTrue(encoder.started.wait(5))
+        queued = [batcher.submit(["b"]), batcher.submit(["c"])]
+        encoder.release.set()
+        for future in queued:
+            future.result(5)
+
+        # The last batch coalesced two requests, so the next one waits
+        # for company instead of encoding straight away
+        lone = batcher.submit(["d"])
+        time.sleep(0.05)
+        late = batcher.submit(["e"])
+        lone.result(5)
+        late.result(5)
+        self.assertEqual(encoder.batches[-1], ["d", "e"])
+
+    def test_encode_errors_reach_every_caller(self):
+        def failing(texts):
+            raise RuntimeError("model unavailable")
+
+        batcher = EmbeddingBatcher(failing, max_wait_ms=1)
+        with self.assertRaisesMessage(RuntimeError, "model unavailable"):
+            batcher.encode_many(["x"])
+
+
+class BatcherMetricsTests(TestCase):
+
+    def test_metrics_expose_queue_depth_and_batch_sizes(self):
+        batcher = EmbeddingBatcher(RecordingEncoder(), max_wait_ms=1)
+        batcher.encode_many(["a", "b"])
+        batcher.encode_many(["c"])
+
+        with mock.patch("memory_app.views.get_batcher", return_value=batcher):
+            body = self.client.get("/metrics").content.decode()
+
+        self.assertIn("hebbrix_embedding_queue_depth 0", body)
+        self.assertIn('hebbrix_embedding_batches_total{size="1"} 1', body)
+        self.assertIn('hebbrix_embedding_batches_total{size="2"} 1', body)
+        self.assertIn("hebbrix_embedding_batched_texts_total 3", body)
+        self.assertIn("hebbrix_embedding_batch_size_mean 1.5", body)
+
+    def test_metrics_without_batching(self):
+        with mock.patch("memory_app.views.get_batcher", return_value=None):
+            response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("hebbrix_embedding_queue_depth", response.content.decode())
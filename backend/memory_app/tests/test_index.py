@@ -0,0 +1,404 @@
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from memory_app.models import Memory
+from memory_app.services.index import (
+    INDEX_FILENAME,
+    IVFIndex,
+    QuantizedIndex,
+    VectorIndex,
+    get_index,
+    index_path,
+    load_embeddings,
+    load_index,
+    measure_recall,
+    normalize,
+    reset_index,
+    save_index,
+    sync_index,
+)
+
+DIM = 16
+
+
+def corpus(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(1, n + 1), rng.standard_normal((n, DIM)).astype(np.float32)
+
+
+def clustered_corpus(n, clusters=20, seed=0, dim=DIM):
+    # Points around a few centres, the shape k-means cells are built for
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim))
+    points = centres[rng.integers(clusters, size=n)] + 0.3 * rng.standard_normal((n, dim))
+    return np.arange(1, n + 1), points.astype(np.float32)
+
+
+def recall(index, reference, queries, k=10):
+    hits = 0
+    for query in queries:
+        found, _ = index.search(query, k)
+        expected, _ = reference.search(query, k)
+        hits += len(np.intersect1d(found, expected))
+    return hits / (k * len(queries))
+
+
+def brute_force(ids, vectors, query, k):
+    scores = normalize(vectors) @ normalize(query)
+    top = np.argsort(-scores, kind="stable")[:k]
+    return ids[top], scores[top]
+
+
+class VectorIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.ids, self.vectors = corpus(500)
+        self.index = VectorIndex()
+        self.index.add(self.ids, self.vectors)
+
+    def test_search_matches_brute_force(self):
+        queries = np.random.default_rng(1).standard_normal((20, DIM))
+        for query in queries:
+            ids, scores = self.index.search(query, 10)
+            expected_ids, expected_scores = brute_force(self.ids, self.vectors, query, 10)
+            np.testing.assert_array_equal(ids, expected_ids)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+        ids, scores = self.index.search_many(queries, 10)
+        for row, query in enumerate(queries):
+            np.testing.assert_array_equal(ids[row], brute_force(self.ids, self.vectors, query, 10)[0])
+
+    def test_add_grows_past_initial_capacity(self):
+        ids, vectors = corpus(3000, seed=2)
+        ids = ids + 1000
+
+        # One row at a time, so the matrix is reallocated several times
+        for memory_id, vector in zip(ids[:1500], vectors[:1500]):
+            self.index.add([memory_id], vector)
+        self.index.add(ids[1500:], vectors[1500:])
+
+        self.assertEqual(len(self.index), 3500)
+        found, _ = self.index.search(vectors[2999], 1)
+        self.assertEqual(found[0], ids[2999])
+
+    def test_replace_keeps_one_row_per_id(self):
+        self.index.add([7], -self.vectors[6])
+
+        self.assertEqual(len(self.index), 500)
+        np.testing.assert_allclose(
+            self.index.score_ids(self.vectors[6], [7]), [-1.0], rtol=1e-5
+        )
+
+    def test_remove(self):
+        self.index.remove([1, 2, 3, 999])
+
+        self.assertEqual(len(self.index), 497)
+        self.assertNotIn(2, self.index)
+        ids, _ = self.index.search(self.vectors[1], 500)
+        self.assertNotIn(2, ids.tolist())
+
+        # Positions are renumbered: later rows still score correctly
+        np.testing.assert_allclose(self.index.score_ids(self.vectors[9], [10]), [1.0], rtol=1e-5)
+
+    def test_score_ids_marks_unknown_ids(self):
+        scores = self.index.score_ids(self.vectors[0], [1, 10_000])
+        self.assertAlmostEqual(float(scores[0]), 1.0, places=5)
+        self.assertTrue(np.isnan(scores[1]))
+
+        scores = self.index.score_ids_many(self.vectors[:2], [10_000, 2])
+        self.assertTrue(np.isnan(scores[:, 0]).all())
+        self.assertAlmostEqual(float(scores[1, 1]), 1.0, places=5)
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/{INDEX_FILENAME}"
+            self.index.save(path)
+
+            with np.load(path) as archive:
+                state = {name: archive[name] for name in archive.files}
+            restored = VectorIndex()
+            restored.load_state(state)
+
+        self.assertEqual(len(restored), len(self.index))
+        query = self.vectors[42]
+        np.testing.assert_array_equal(restored.search(query, 10)[0], self.index.search(query, 10)[0])
+
+
+class IVFIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.ids, self.vectors = clustered_corpus(4000)
+        self.exact = VectorIndex()
+        self.exact.add(self.ids, self.vectors)
+        self.queries = clustered_corpus(50, seed=1)[1]
+
+    def make_index(self, **options):
+        index = IVFIndex(nlist=40, nprobe=8, min_train=1000, **options)
+        index.add(self.ids, self.vectors)
+        return index
+
+    def test_recall_against_exact_index(self):
+        index = self.make_index()
+        index.train()
+
+        self.assertTrue(index.approximate)
+        self.assertGreaterEqual(recall(index, self.exact, self.queries), 0.9)
+
+        ids, _ = index.search_many(self.queries, 10)
+        for row, query in enumerate(self.queries):
+            np.testing.assert_array_equal(ids[row], index.search(query, 10)[0])
+
+    def test_probing_every_cell_is_exact(self):
+        index = self.make_index()
+        index.train()
+        index.nprobe = 40
+
+        self.assertFalse(index.approximate)
+        self.assertEqual(recall(index, self.exact, self.queries), 1.0)
+
+    def test_rows_added_after_training_are_found(self):
+        index = self.make_index()
+        index.train()
+
+        extra_ids, extra = clustered_corpus(200, seed=3)
+        extra_ids = extra_ids + 10_000
+        index.add(extra_ids, extra)
+        index.remove(self.ids[:100])
+
+        for memory_id, vector in zip(extra_ids[:20], extra[:20]):
+            self.assertEqual(index.search(vector, 1)[0][0], memory_id)
+        self.assertNotIn(self.ids[0], index.search(self.vectors[0], 10)[0])
+
+    def test_first_searches_train_once(self):
+        index = self.make_index()
+        self.assertFalse(index.trained)
+
+        barrier = threading.Barrier(8)
+        train = index._train
+
+        def slow_train():
+            # Hold training open until every searcher has arrived
+            barrier.wait(5)
+            train()
+
+        results = []
+
+        def search(query):
+            try:
+                barrier.wait(5)
+            except threading.BrokenBarrierError:
+                pass
+            results.append(index.search(query, 10)[0])
+
+        with mock.patch.object(index, "_train", side_effect=slow_train) as trained:
+            threads = [threading.Thread(target=search, args=(query,)) for query in self.queries[:7]]
+            for thread in threads:
+                thread.start()
+            index.search(self.queries[7], 10)
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(trained.call_count, 1)
+        self.assertTrue(index.trained)
+        self.assertEqual(len(results), 7)
+
+    def test_state_round_trip_keeps_the_trained_lists(self):
+        index = self.make_index()
+        index.train()
+
+        restored = IVFIndex(nlist=40, nprobe=8)
+        restored.load_state(index.state())
+
+        self.assertTrue(restored.trained)
+        for query in self.queries[:10]:
+            np.testing.assert_array_equal(restored.search(query, 10)[0], index.search(query, 10)[0])
+
+
+class QuantizedIndexTests(SimpleTestCase):
+
+    # Codes need realistic widths: int8 clips large components and
+    # sign bits carry little signal in a handful of dimensions
+    dim = 128
+
+    def setUp(self):
+        self.ids, self.vectors = clustered_corpus(3000, dim=self.dim)
+        self.stored = dict(zip(self.ids.tolist(), self.vectors))
+        self.loaded = []
+        self.exact = VectorIndex()
+        self.exact.add(self.ids, self.vectors)
+        # Queries near stored memories, as retrieval queries usually are
+        rng = np.random.default_rng(1)
+        self.queries = (
+            self.vectors[rng.choice(len(self.vectors), 50)]
+            + 0.3 * rng.standard_normal((50, self.dim))
+        ).astype(np.float32)
+
+    def loader(self, ids):
+        # Stands in for the Memory table; records what each search reads
+        ids = list(ids)
+        self.loaded.append(ids)
+        return {memory_id: self.stored[memory_id] for memory_id in ids if memory_id in self.stored}
+
+    def make_index(self, codec, **options):
+        index = QuantizedIndex(codec=codec, vector_loader=self.loader, **options)
+        index.add(self.ids, self.vectors)
+        return index
+
+    def test_int8_codes_approximate_cosine(self):
+        index = self.make_index("int8")
+        query = normalize(self.queries[0])
+
+        _, code_scores = index.similarities(query)
+        _, exact_scores = self.exact.similarities(query)
+        self.assertLess(np.abs(code_scores - exact_scores).max(), 0.05)
+
+    def test_binary_codes_follow_hamming_distance(self):
+        index = self.make_index("binary")
+        query = normalize(self.queries[0])
+
+        _, code_scores = index.similarities(query)
+        bits = (normalize(self.vectors) > 0) != (query > 0)
+        np.testing.assert_allclose(code_scores, 1 - 2 * bits.sum(axis=1) / self.dim, rtol=1e-6)
+
+    def test_recall_parity_with_the_exact_index(self):
+        for codec, minimum in (("int8", 0.95), ("binary", 0.75)):
+            with self.subTest(codec=codec):
+                index = self.make_index(codec)
+                self.assertGreaterEqual(recall(index, self.exact, self.queries), minimum)
+                self.assertGreaterEqual(measure_recall(index, self.queries[:10]), minimum)
+
+    def test_rerank_scores_are_exact(self):
+        index = self.make_index("int8", rerank_factor=5)
+
+        ids, scores = index.search(self.queries[0], 10)
+
+        # The shortlist of rerank_factor * k rows is read from the loader
+        self.assertEqual(len(self.loaded), 1)
+        self.assertEqual(len(self.loaded[0]), 50)
+        self.assertTrue(set(ids.tolist()) <= set(self.loaded[0]))
+        np.testing.assert_allclose(scores, self.exact.score_ids(self.queries[0], ids), rtol=1e-5)
+        self.assertTrue((np.diff(scores) <= 0).all())
+
+    def test_exact_search_reads_every_row(self):
+        index = self.make_index("binary")
+
+        ids, scores = index.search(self.queries[0], 10, exact=True)
+
+        expected_ids, expected_scores = self.exact.search(self.queries[0], 10)
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+        self.assertEqual(sum(len(chunk) for chunk in self.loaded), len(self.ids))
+
+    def test_rows_missing_from_the_loader_are_dropped(self):
+        index = self.make_index("int8")
+        nearest = self.exact.search(self.queries[0], 1)[0][0]
+        del self.stored[nearest]
+
+        ids, _ = index.search(self.queries[0], 10)
+        self.assertNotIn(nearest, ids.tolist())
+        self.assertEqual(len(ids), 10)
+
+    def test_state_round_trip(self):
+        index = self.make_index("int8", int8_clip=0.4)
+
+        restored = QuantizedIndex(codec="int8", vector_loader=self.loader)
+        restored.load_state(index.state())
+
+        self.assertEqual(restored.int8_clip, 0.4)
+        np.testing.assert_array_equal(
+            restored.similarities(self.queries[0])[1], index.similarities(self.queries[0])[1]
+        )
+
+
+@override_settings(
+    MEMORY_INDEX_BACKEND="exact",
+    MEMORY_INDEX_CHECK_INTERVAL=None,
+)
+class IndexRegistryTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        overrides = self.settings(MEMORY_INDEX_PATH=self.directory.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        reset_index()
+        self.addCleanup(reset_index)
+
+        _, vectors = corpus(50)
+        self.memories = Memory.objects.bulk_create([
+            Memory(content=f"memory {i}", embedding=vector)
+            for i, vector in enumerate(vectors)
+        ])
+
+    def _write_behind_its_back(self, vector):
+        # bulk_create fires no signals, like a write from another process
+        (memory,) = Memory.objects.bulk_create([Memory(content="elsewhere", embedding=vector)])
+        return memory
+
+    def test_saved_index_is_loaded_when_current(self):
+        built = get_index()
+        save_index("default")
+        self.assertTrue(index_path(self.directory.name).exists())
+
+        loaded = load_index(self.directory.name)
+        self.assertIsNotNone(loaded)
+        self.assertIsNot(loaded, built)
+        np.testing.assert_array_equal(np.sort(loaded.live_ids()), np.sort(built.live_ids()))
+
+    def test_stale_saved_index_is_rejected(self):
+        get_index()
+        save_index("default")
+        self._write_behind_its_back(np.ones(DIM, dtype=np.float32))
+
+        self.assertIsNone(load_index(self.directory.name))
+
+    def test_saved_index_of_another_backend_is_ignored(self):
+        get_index()
+        save_index("default")
+
+        with override_settings(MEMORY_INDEX_BACKEND="ivf"):
+            self.assertIsNone(load_index(self.directory.name))
+
+    def test_sync_catches_up_with_other_writers(self):
+        index = get_index()
+        vector = np.ones(DIM, dtype=np.float32)
+        added = self._write_behind_its_back(vector)
+        Memory.objects.filter(id=self.memories[0].id).delete()
+
+        self.assertEqual(sync_index("default"), (1, 1))
+        self.assertIn(added.id, index)
+        self.assertNotIn(self.memories[0].id, index)
+        self.assertEqual(index.search(vector, 1)[0][0], added.id)
+
+        # Nothing changed since: a single fingerprint comparison
+        with self.assertNumQueries(1):
+            self.assertEqual(sync_index("default"), (0, 0))
+
+    def test_get_index_checks_the_table_when_due(self):
+        index = get_index()
+        added = self._write_behind_its_back(np.ones(DIM, dtype=np.float32))
+
+        self.assertNotIn(added.id, get_index())
+
+        with override_settings(MEMORY_INDEX_CHECK_INTERVAL=0):
+            self.assertIs(get_index(), index)
+        self.assertIn(added.id, index)
+
+    def test_quantized_rerank_reads_the_table(self):
+        ids, vectors = corpus(50)
+        index = QuantizedIndex(codec="int8")
+        index.add([memory.id for memory in self.memories], vectors)
+
+        target = self.memories[7]
+        with self.assertNumQueries(1):
+            found, scores = index.search(vectors[7], 3)
+
+        self.assertEqual(found[0], target.id)
+        self.assertAlmostEqual(float(scores[0]), 1.0, places=5)
+        self.assertEqual(set(load_embeddings([target.id, 10_000])), {target.id})
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from memory_app.models import IngestionJob
+from memory_app.services import jobs, startup
+from memory_app.services.jobs import claim_next_job, run_job
+
+
+@override_settings(
+    INGESTION_WORKER="command",
+    INGESTION_STALE_AFTER=600,
+    INGESTION_MAX_ATTEMPTS=3,
+    INGESTION_RETRY_DELAY=10.0,
+)
+class IngestionJobTests(TestCase):
+
+    def create(self, **fields):
+        return IngestionJob.objects.create(text="I like tea", **fields)
+
+    def test_claims_due_and_stale_jobs_only(self):
+        now = timezone.now()
+        later = self.create(available_at=now + timedelta(minutes=5))
+        busy = self.create(status=IngestionJob.RUNNING, started_at=now)
+        stale = self.create(status=IngestionJob.RUNNING, started_at=now - timedelta(hours=1))
+        due = self.create()
+
+        self.assertEqual(claim_next_job().id, due.id)
+        # A running job whose worker died is taken over
+        self.assertEqual(claim_next_job().id, stale.id)
+        self.assertIsNone(claim_next_job())
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, IngestionJob.RUNNING)
+        self.assertGreater(stale.started_at, now)
+        for job in (later, busy):
+            self.assertEqual(IngestionJob.objects.get(id=job.id).started_at, job.started_at)
+
+    def test_job_claimed_by_another_worker_is_skipped(self):
+        first, second = self.create(), self.create()
+        select = QuerySet.first
+        raced = []
+
+        def rival_claims_first(queryset):
+            candidate = select(queryset)
+            if not raced:
+                # Another worker claims the row between SELECT and UPDATE
+                raced.append(candidate)
+                IngestionJob.objects.filter(id=first.id).update(
+                    status=IngestionJob.RUNNING, started_at=timezone.now()
+                )
+            return candidate
+
+        with mock.patch.object(QuerySet, "first", rival_claims_first):
+            claimed = claim_next_job()
+
+        self.assertEqual(raced[0][0], first.id)
+        self.assertEqual(claimed.id, second.id)
+
+    def test_failures_back_off_then_fail(self):
+        job = self.create()
+
+        failing = mock.patch.object(jobs, "extract_memories", side_effect=RuntimeError("boom"))
+        with failing, self.assertLogs(jobs.logger, "ERROR"):
+            delays = []
+            for _ in range(2):
+                before = timezone.now()
+                run_job(job)
+                job.refresh_from_db()
+                self.assertEqual(job.status, IngestionJob.PENDING)
+                delays.append((job.available_at - before).total_seconds())
+
+            run_job(job)
+
+        # RETRY_DELAY after the first failure, doubled after the second
+        self.assertAlmostEqual(delays[0], 10, delta=1)
+        self.assertAlmostEqual(delays[1], 20, delta=1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (IngestionJob.FAILED, 3, "boom"))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_a_retried_job_can_succeed(self):
+        job = self.create()
+
+        failing = mock.patch.object(jobs, "extract_memories", side_effect=RuntimeError("boom"))
+        with failing, self.assertLogs(jobs.logger, "ERROR"):
+            run_job(job)
+        with mock.patch.object(jobs, "extract_memories", return_value=[]):
+            run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (IngestionJob.SUCCEEDED, 2, ""))
+
+
+class StartWorkersTests(TestCase):
+
+    @override_settings(INGESTION_WORKER="thread")
+    def test_thread_mode_starts_the_worker(self):
+        with mock.patch.object(jobs, "get_worker") as get_worker:
+            startup.start_workers()
+        get_worker.assert_called_once_with()
+
+    @override_settings(INGESTION_WORKER="command")
+    def test_command_mode_leaves_jobs_to_the_command(self):
+        with mock.patch.object(jobs, "get_worker") as get_worker:
+            startup.start_workers()
+        get_worker.assert_not_called()
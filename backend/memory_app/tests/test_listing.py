@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from memory_app.models import Memory
+from memory_app.services.listing import InvalidCursor, decode_cursor, encode_cursor
+
+DIM = 8
+
+
+@override_settings(MEMORY_INDEX_PATH=None, MEMORY_INDEX_CHECK_INTERVAL=None)
+class MemoryListingTests(TestCase):
+
+    def setUp(self):
+        # Three memories per timestamp, interleaved with id order, so
+        # pages split ties on created_at
+        self.memories = Memory.objects.bulk_create([
+            Memory(content=f"memory {i}", embedding=np.ones(DIM, dtype=np.float32))
+            for i in range(9)
+        ])
+        for i, memory in enumerate(self.memories):
+            Memory.objects.filter(id=memory.id).update(
+                created_at=datetime(2024, 1, 1 + i % 3, tzinfo=timezone.utc)
+            )
+
+    def fetch(self, **params):
+        return self.client.get("/api/memories/all", params)
+
+    def test_pages_cover_equal_timestamps_exactly_once(self):
+        seen, cursor = [], None
+        while True:
+            response = self.fetch(limit=2, **({"cursor": cursor} if cursor else {}))
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row["id"] for row in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            self.assertIn(f"cursor={cursor}", response.headers["Link"])
+
+        expected = sorted(
+            ((i % 3, memory.id) for i, memory in enumerate(self.memories)), reverse=True
+        )
+        self.assertEqual(seen, [memory_id for _, memory_id in expected])
+
+    def test_stream_resumes_from_a_cursor(self):
+        first = self.fetch(limit=4)
+        rest = self.fetch(stream="ndjson", cursor=first.headers["X-Next-Cursor"])
+
+        rows = [json.loads(line) for line in b"".join(rest.streaming_content).splitlines()]
+        ids = [row["id"] for row in first.json()] + [row["id"] for row in rows]
+        self.assertEqual(sorted(ids), sorted(memory.id for memory in self.memories))
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_malformed_cursor_is_a_400(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+        for cursor in [
+            "not base64!",
+            base64.urlsafe_b64encode(b"not json").decode(),
+            encode(["2024-01-01T00:00:00+00:00"]),
+            encode(["yesterday", 5]),
+            encode(["2024-01-01T00:00:00+00:00", "5"]),
+        ]:
+            with self.subTest(cursor=cursor):
+                response = self.fetch(cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": "Invalid cursor"})
+
+    def test_cursor_round_trip(self):
+        created_at = datetime(2024, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc)
+
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("")
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+import openai
+from django.test import SimpleTestCase, override_settings
+
+from memory_app.services import llm
+from memory_app.services.llm import CircuitBreaker, LLMUnavailable
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(llm.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(threshold=3, cooldown=30)
+
+    def open_circuit(self):
+        with self.assertLogs(llm.logger, "WARNING"):
+            for _ in range(3):
+                self.breaker.record_failure()
+
+    def test_opens_after_threshold_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+        with self.assertLogs(llm.logger, "WARNING"):
+            self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 10
+        self.assertEqual(self.breaker.retry_after(), 20)
+
+    def test_half_open_lets_one_probe_through(self):
+        self.open_circuit()
+        self.clock.now += 30
+
+        self.assertEqual(self.breaker.state, "half_open")
+        self.assertTrue(self.breaker.allow())
+        # Other callers keep failing fast while the probe runs
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_probe_closes_the_circuit(self):
+        self.open_circuit()
+        self.clock.now += 30
+        self.breaker.allow()
+
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens_for_a_full_cooldown(self):
+        self.open_circuit()
+        self.clock.now += 30
+        self.breaker.allow()
+
+        with self.assertLogs(llm.logger, "WARNING"):
+            self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(self.breaker.retry_after(), 30)
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+
+
+def connection_error():
+    return openai.APIConnectionError(request=mock.Mock())
+
+
+@override_settings(LLM_MAX_RETRIES=0, LLM_QUEUE_TIMEOUT=0.05)
+class GatewayTests(SimpleTestCase):
+
+    def setUp(self):
+        for name, value in [
+            ("breaker", CircuitBreaker(threshold=2, cooldown=30)),
+            ("_slots", threading.BoundedSemaphore(1)),
+        ]:
+            patcher = mock.patch.object(llm, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_failing_upstream_opens_the_circuit(self):
+        client = mock.Mock()
+        client.chat.completions.create.side_effect = connection_error()
+
+        with mock.patch.object(llm, "get_client", return_value=client), \
+                self.assertLogs(llm.logger, "WARNING"):
+            for _ in range(2):
+                with self.assertRaises(LLMUnavailable):
+                    llm.complete("model", [], "chat")
+            with self.assertRaises(LLMUnavailable) as raised:
+                llm.complete("model", [], "chat")
+
+        # The third call failed fast without reaching the upstream
+        self.assertEqual(client.chat.completions.create.call_count, 2)
+        self.assertEqual(llm.breaker.state, "open")
+        self.assertGreater(raised.exception.retry_after, 0)
+
+    def stream_text(self, client):
+        async def collect():
+            return [token async for token in llm.stream("model", [], "chat")]
+
+        with mock.patch.object(llm, "_async_client", return_value=client):
+            return asyncio.run(collect())
+
+    def test_stream_waits_for_the_process_wide_slot(self):
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+            for text in ["Hello", " there"]
+        ]
+
+        async def replay():
+            for chunk in chunks:
+                yield chunk
+
+        client = mock.Mock()
+        client.chat.completions.create = mock.AsyncMock(side_effect=lambda **kwargs: replay())
+
+        # Taken by a blocking call on another thread: every event loop waits
+        llm._slots.acquire()
+        with self.assertRaises(LLMUnavailable):
+            self.stream_text(client)
+        client.chat.completions.create.assert_not_called()
+
+        llm._slots.release()
+        self.assertEqual(self.stream_text(client), ["Hello", " there"])
+        # The slot was given back when the stream ended
+        self.assertTrue(llm._slots.acquire(blocking=False))
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from memory_app import views
+from memory_app.models import ChatSession, ChatTurn, IngestionJob
+from memory_app.services import sessions
+from memory_app.services.jobs import run_pending_jobs
+from memory_app.services.sessions import get_session, record_exchange, start_session
+
+
+def answer(query, history, namespace):
+    return f"answer to {query} after {len(history)} messages", [], False
+
+
+@override_settings(INGESTION_WORKER="command", CHAT_SESSION_TTL=3600)
+class ChatSessionTests(TestCase):
+
+    def chat(self, **data):
+        with mock.patch.object(views, "generate_response", side_effect=answer):
+            return self.client.post("/api/chat", data, content_type="application/json")
+
+    def test_chat_without_a_session_stores_nothing(self):
+        response = self.chat(query="hello")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("session_id", response.json())
+        self.assertFalse(ChatSession.objects.exists())
+        self.assertFalse(ChatTurn.objects.exists())
+
+    def test_new_session_is_started_on_request_and_reused(self):
+        first = self.chat(query="hello", new_session=True).json()
+        second = self.chat(query="again", session_id=first["session_id"]).json()
+
+        self.assertEqual(second["session_id"], first["session_id"])
+        self.assertEqual(second["answer"], "answer to again after 2 messages")
+        self.assertEqual(ChatSession.objects.count(), 1)
+        self.assertEqual(ChatTurn.objects.count(), 4)
+
+    def test_expired_sessions_are_gone_and_pruned(self):
+        idle, active = start_session(), start_session()
+        ChatTurn.objects.create(session=idle, role=ChatTurn.USER, content="old")
+        ChatSession.objects.filter(id=idle.id).update(
+            updated_at=timezone.now() - timedelta(hours=2)
+        )
+
+        self.assertIsNone(get_session(idle.id))
+        self.assertEqual(self.chat(query="hi", session_id=str(idle.id)).status_code, 404)
+
+        call_command("prune_chat_sessions", stdout=mock.MagicMock())
+        self.assertEqual(list(ChatSession.objects.values_list("id", flat=True)), [active.id])
+        self.assertFalse(ChatTurn.objects.exists())
+
+    @override_settings(CHAT_HISTORY_TOKEN_BUDGET=40)
+    def test_compaction_runs_on_the_job_queue(self):
+        session = start_session()
+
+        with mock.patch.object(sessions, "summarize_turns", return_value="summary") as summarize:
+            self.assertIsNone(record_exchange(session, "short", "reply"))
+            job = record_exchange(session, "q" * 80, "a" * 80)
+            # Already queued: a second job is not added
+            self.assertIsNone(record_exchange(session, "q" * 80, "a" * 80))
+
+            summarize.assert_not_called()
+            self.assertEqual((job.kind, job.status), (IngestionJob.COMPACT, IngestionJob.PENDING))
+
+            self.assertEqual(run_pending_jobs(), 1)
+
+        summarize.assert_called_once()
+        job.refresh_from_db()
+        session.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.SUCCEEDED)
+        self.assertEqual(session.summary, "summary")
+        self.assertEqual(len(sessions.session_history(session)), 1 + sessions.MIN_RECENT_TURNS)
+
+    @override_settings(CHAT_HISTORY_TOKEN_BUDGET=40)
+    def test_compaction_of_a_deleted_session_is_a_no_op(self):
+        session = start_session()
+        job = record_exchange(session, "q" * 80, "a" * 80)
+        session.delete()
+
+        with mock.patch.object(sessions, "summarize_turns") as summarize:
+            run_pending_jobs()
+
+        summarize.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.SUCCEEDED)
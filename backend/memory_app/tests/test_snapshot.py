@@ -0,0 +1,244 @@
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock, skipIf
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from memory_app.models import Memory
+from memory_app.services import snapshot
+from memory_app.services.index import VectorIndex, normalize
+from memory_app.services.snapshot import (
+    SnapshotIndex,
+    generation_dir,
+    open_snapshot_index,
+    read_manifest,
+    record_dtype,
+    snapshot_dir,
+)
+
+DIM = 8
+
+
+def vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def _append_from_child(directory, start, count):
+    # Runs in a forked process, so it writes its own delta-<pid>.log
+    index = SnapshotIndex(directory, compact_every=10**9, sync_interval=0)
+    index.sync()
+    rows = vectors(count, seed=start)
+    for offset in range(count):
+        index.add([start + offset], rows[offset:offset + 1])
+
+
+@skipIf(snapshot.fcntl is None, "snapshots need POSIX file locks")
+class SnapshotIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def open(self, **options):
+        options.setdefault("compact_every", 10**9)
+        options.setdefault("sync_interval", 0)
+        index = SnapshotIndex(self.directory, **options)
+        index.sync()
+        return index
+
+    def assert_same_rows(self, index, expected):
+        ids, _ = index.snapshot()
+        self.assertEqual(sorted(ids.tolist()), sorted(expected.live_ids().tolist()))
+        for query in vectors(5, seed=99):
+            np.testing.assert_array_equal(index.search(query, 5)[0], expected.search(query, 5)[0])
+
+    def test_search_matches_an_exact_index(self):
+        index = self.open()
+        expected = VectorIndex()
+        rows = vectors(300)
+
+        index.add(range(1, 201), rows[:200])
+        index.compact()
+        # Base rows replaced and removed, plus rows only in the delta
+        index.add(range(150, 301), rows[149:300])
+        index.remove(range(1, 21))
+        expected.add(range(1, 201), rows[:200])
+        expected.add(range(150, 301), rows[149:300])
+        expected.remove(range(1, 21))
+
+        self.assertEqual(len(index), len(expected))
+        self.assert_same_rows(index, expected)
+        np.testing.assert_allclose(
+            index.score_ids_many(rows[:3], [1, 25, 250]),
+            expected.score_ids_many(rows[:3], [1, 25, 250]),
+            rtol=1e-5, equal_nan=True
+        )
+
+    def test_reopen_replays_the_delta_logs(self):
+        index = self.open()
+        rows = vectors(50)
+        index.add(range(1, 51), rows)
+        index.remove([3, 4])
+        index.add([5], -rows[4:5])
+
+        reopened = self.open()
+
+        self.assertEqual(reopened.generation, 1)
+        self.assertEqual(reopened.delta_records, index.delta_records)
+        self.assertEqual(len(reopened), 48)
+        self.assertNotIn(3, reopened)
+        # The last record for an id wins
+        np.testing.assert_allclose(reopened.score_ids(rows[4], [5]), [-1.0], rtol=1e-5)
+
+    def test_torn_record_is_left_for_the_next_sync(self):
+        index = self.open()
+        index.add([1], vectors(1))
+        reader = self.open()
+
+        # A writer that died (or is still writing) mid-record
+        record = snapshot.make_records(DIM, [2], vectors(1, seed=1))
+        log = generation_dir(self.directory, 1) / "delta-12345.log"
+        log.write_bytes(record.tobytes()[:record_dtype(DIM).itemsize // 2])
+        reader.sync()
+        self.assertNotIn(2, reader)
+
+        with open(log, "ab") as f:
+            f.write(record.tobytes()[record_dtype(DIM).itemsize // 2:])
+        reader.sync()
+        self.assertIn(2, reader)
+
+    def test_compaction_switches_generation(self):
+        index = self.open()
+        rows = vectors(100)
+        index.add(range(1, 101), rows)
+        index.remove(range(1, 11))
+        other = self.open()
+
+        stats = index.compact()
+
+        self.assertEqual(stats, {"generation": 2, "rows": 90, "folded": 110})
+        self.assertEqual(read_manifest(self.directory)["generation"], 2)
+        self.assertFalse(generation_dir(self.directory, 1).exists())
+        self.assertEqual(index.delta_records, 0)
+
+        other.sync()
+        self.assertEqual(other.generation, 2)
+        self.assertEqual(len(other), 90)
+        self.assertNotIn(5, other)
+
+    def test_records_written_during_compaction_are_carried_over(self):
+        index = self.open()
+        rows = vectors(60)
+        index.add(range(1, 51), rows[:50])
+        writer = self.open()
+        write_generation = snapshot._write_generation
+
+        def write_while_compacting(*args, **kwargs):
+            write_generation(*args, **kwargs)
+            # Lands in the old generation's log after compact() read it
+            writer.add(range(51, 61), rows[50:])
+            writer.remove([1])
+
+        with mock.patch.object(snapshot, "_write_generation", side_effect=write_while_compacting):
+            stats = index.compact()
+
+        self.assertEqual(stats["rows"], 50)
+        carried = generation_dir(self.directory, 2) / "delta-0.log"
+        self.assertEqual(carried.stat().st_size, 11 * record_dtype(DIM).itemsize)
+
+        for reader in (index, self.open()):
+            self.assertEqual(reader.generation, 2)
+            self.assertEqual(len(reader), 59)
+            self.assertIn(60, reader)
+            self.assertNotIn(1, reader)
+
+    def test_one_compaction_at_a_time(self):
+        index = self.open()
+        index.add([1], vectors(1))
+
+        with snapshot.file_lock(self.directory / snapshot.COMPACT_LOCK_FILENAME, exclusive=True):
+            self.assertIsNone(index.compact())
+        self.assertEqual(index.generation, 1)
+
+    def test_two_writer_processes_append_concurrently(self):
+        index = self.open()
+        index.add([1], vectors(1))
+
+        context = multiprocessing.get_context("fork")
+        children = [
+            context.Process(target=_append_from_child, args=(self.directory, start, 100))
+            for start in (1000, 2000)
+        ]
+        for child in children:
+            child.start()
+        for child in children:
+            child.join(30)
+            self.assertEqual(child.exitcode, 0)
+
+        logs = sorted(path.name for path in generation_dir(self.directory, 1).glob("delta-*.log"))
+        self.assertEqual(len(logs), 3)
+        self.assertIn(f"delta-{os.getpid()}.log", logs)
+
+        index.sync()
+        self.assertEqual(len(index), 201)
+        expected = np.concatenate([vectors(100, seed=1000), vectors(100, seed=2000)])
+        np.testing.assert_allclose(
+            index.score_ids_many(expected[[0, 199]], [1000, 2099]).diagonal(), [1.0, 1.0], rtol=1e-5
+        )
+        found, _ = index.search(expected[150], 1)
+        self.assertEqual(found[0], 2050)
+
+    def test_dimension_mismatch_is_rejected(self):
+        index = self.open()
+        index.add([1], vectors(1))
+
+        other = SnapshotIndex(self.directory)
+        other.sync()
+        other.dim = DIM * 2
+        with self.assertRaises(ValueError):
+            other.add([2], np.ones((1, DIM * 2), dtype=np.float32))
+
+
+@skipIf(snapshot.fcntl is None, "snapshots need POSIX file locks")
+class OpenSnapshotIndexTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+
+        self.rows = vectors(30)
+        self.memories = Memory.objects.bulk_create([
+            Memory(content=f"memory {i}", embedding=row) for i, row in enumerate(self.rows)
+        ])
+
+    def test_first_open_writes_a_generation_from_the_table(self):
+        index = open_snapshot_index(self.path, sync_interval=0)
+
+        self.assertEqual(index.generation, 1)
+        self.assertEqual(len(index), 30)
+        target = generation_dir(snapshot_dir(self.path), 1)
+        self.assertEqual(
+            np.load(target / "ids.npy").tolist(), sorted(memory.id for memory in self.memories)
+        )
+        np.testing.assert_allclose(
+            np.load(target / "vectors.npy", mmap_mode="r")[0], normalize(self.rows[0]), rtol=1e-5
+        )
+
+        # A second process maps the same generation instead of writing one
+        again = open_snapshot_index(self.path, sync_interval=0)
+        self.assertEqual(again.generation, 1)
+
+    def test_stale_snapshot_is_rebuilt_from_the_table(self):
+        open_snapshot_index(self.path, sync_interval=0)
+        Memory.objects.filter(id=self.memories[0].id).delete()
+
+        index = open_snapshot_index(self.path, sync_interval=0)
+
+        self.assertEqual(index.generation, 2)
+        self.assertEqual(len(index), 29)
+        self.assertNotIn(self.memories[0].id, index)
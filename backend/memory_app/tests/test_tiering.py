@@ -0,0 +1,130 @@
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from memory_app.models import Memory
+from memory_app.services import tiering
+from memory_app.services.index import reset_index
+from memory_app.services.ingestion import store_facts
+from memory_app.services.retrieval import hybrid_rank_batch, hybrid_rank_memories
+
+DIM = 8
+
+
+def unit(axis):
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[axis] = 1.0
+    return vector
+
+
+@override_settings(
+    MEMORY_TIERING_ENABLED=True,
+    MEMORY_HOT_TIER_SIZE=5,
+    # Always trust the hot tier, the worst case for missed memories
+    MEMORY_HOT_TIER_CONFIDENCE=-1.0,
+    MEMORY_HOT_TIER_REFRESH=3600,
+    MEMORY_INDEX_PATH=None,
+    MEMORY_INDEX_CHECK_INTERVAL=None,
+)
+class TieredSearchTests(TestCase):
+
+    def setUp(self):
+        reset_index()
+        tiering._hot_tiers.clear()
+        self.addCleanup(reset_index)
+        self.addCleanup(tiering._hot_tiers.clear)
+
+        # Twenty memories pointing away from the query axis, the first
+        # five recently retrieved
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((20, DIM)).astype(np.float32)
+        vectors[:, 0] = -np.abs(vectors[:, 0])
+        self.old = Memory.objects.bulk_create([
+            Memory(content=f"old {i}", embedding=vector)
+            for i, vector in enumerate(vectors)
+        ])
+        Memory.objects.filter(id__in=[memory.id for memory in self.old[:5]]).update(
+            access_count=1, last_accessed_at=timezone.now()
+        )
+
+    def test_memory_stored_after_the_build_wins(self):
+        tiering.refresh_hot_tier()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            (fresh,) = store_facts(["fresh"], embeddings=unit(0)[None], threshold=None)
+
+        ids, scores = tiering.tiered_search("default", unit(0), 3)
+        self.assertEqual(ids[0], fresh.id)
+        self.assertAlmostEqual(float(scores[0]), 1.0, places=5)
+
+    def test_rebuild_includes_never_retrieved_memories(self):
+        # Written by another process: no commit hook reaches this one
+        (fresh,) = Memory.objects.bulk_create([Memory(content="fresh", embedding=unit(0))])
+
+        tiering.refresh_hot_tier()
+
+        ids, _ = tiering.tiered_search("default", unit(0), 3)
+        self.assertEqual(ids[0], fresh.id)
+
+    def test_changes_during_a_rebuild_reach_the_new_tier(self):
+        (fresh,) = Memory.objects.bulk_create([Memory(content="fresh", embedding=unit(0))])
+        doomed = self.old[0]
+        build = tiering.build_hot_tier
+
+        def build_with_concurrent_writes(namespace):
+            index = build(namespace)
+            tiering.admit_memories([fresh])
+            tiering.forget_memories([doomed.id])
+            return index
+
+        with mock.patch.object(tiering, "build_hot_tier", build_with_concurrent_writes):
+            hot = tiering.refresh_hot_tier()
+
+        self.assertIn(fresh.id, hot)
+        self.assertNotIn(doomed.id, hot)
+
+    def test_full_index_answers_until_the_tier_is_built(self):
+        (fresh,) = Memory.objects.bulk_create([Memory(content="fresh", embedding=unit(0))])
+
+        with mock.patch.object(tiering.threading, "Thread") as thread:
+            ids, _ = tiering.tiered_search("default", unit(0), 3)
+
+        # The rebuild is handed to a background thread, not run inline
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(ids[0], fresh.id)
+        self.assertNotIn("default", tiering._hot_tiers)
+        tiering._rebuilding.clear()
+
+    def test_batch_search_keeps_fresh_memories(self):
+        tiering.refresh_hot_tier()
+        with self.captureOnCommitCallbacks(execute=True):
+            (fresh,) = store_facts(["fresh"], embeddings=unit(0)[None], threshold=None)
+
+        ids, _ = tiering.tiered_search_many("default", np.stack([unit(0), unit(1)]), 3)
+        self.assertEqual(ids[0, 0], fresh.id)
+
+
+@override_settings(MEMORY_INDEX_PATH=None, MEMORY_INDEX_CHECK_INTERVAL=None)
+class AccessRecordingTests(TestCase):
+
+    def setUp(self):
+        reset_index()
+        self.addCleanup(reset_index)
+        Memory.objects.bulk_create([
+            Memory(content=f"memory {axis}", embedding=unit(axis)) for axis in range(DIM)
+        ])
+
+    def test_search_records_hits_but_batch_lookups_do_not(self):
+        with mock.patch.object(tiering.AccessTracker, "record") as record:
+            hybrid_rank_batch(
+                ["memory", "other"], Memory.objects.all(), top_k=3,
+                query_embeddings=np.stack([unit(0), unit(1)])
+            )
+            record.assert_not_called()
+
+            results = hybrid_rank_memories(
+                "memory", Memory.objects.all(), top_k=3, query_embedding=unit(0)
+            )
+            record.assert_called_once_with([result["id"] for result in results])
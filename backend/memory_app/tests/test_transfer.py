@@ -0,0 +1,141 @@
+import json
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from memory_app.models import Memory
+from memory_app.services import transfer
+from memory_app.services.embedding import CACHE_MODEL
+from memory_app.services.index import reset_index
+from memory_app.services.transfer import export_memories, import_memories, pack_embedding
+
+DIM = 8
+
+
+def fake_encode(texts):
+    # Deterministic stand-in for the model
+    return np.stack([
+        np.random.default_rng(sum(text.encode("utf-8"))).standard_normal(DIM).astype(np.float32)
+        for text in texts
+    ])
+
+
+def exported_lines(namespace, include_embeddings=True):
+    return "".join(export_memories(namespace, include_embeddings)).splitlines()
+
+
+@override_settings(MEMORY_INDEX_PATH=None, MEMORY_INDEX_CHECK_INTERVAL=None)
+class TransferTests(TestCase):
+
+    def setUp(self):
+        reset_index()
+        self.addCleanup(reset_index)
+
+        rng = np.random.default_rng(0)
+        self.dates = [datetime(2024, 1, day, 12, tzinfo=timezone.utc) for day in (1, 2, 3)]
+        self.originals = []
+        for content, importance, created_at in zip(
+            ["likes tea", "likes tea", "lives in Berlin"], [0.2, 0.9, 0.5], self.dates
+        ):
+            memory = Memory.objects.create(
+                namespace="source", content=content, importance_score=importance,
+                embedding=rng.standard_normal(DIM).astype(np.float32)
+            )
+            Memory.objects.filter(id=memory.id).update(created_at=created_at)
+            self.originals.append(memory)
+
+    def rows(self, namespace):
+        return list(
+            Memory.objects.filter(namespace=namespace).order_by("created_at")
+            .values_list("content", "importance_score", "created_at")
+        )
+
+    def test_round_trip_keeps_rows_and_vectors(self):
+        lines = exported_lines("source")
+        self.assertEqual(json.loads(lines[0])["embedding_model"], CACHE_MODEL)
+
+        with mock.patch.object(transfer, "encode_bulk", side_effect=AssertionError("re-encoded")):
+            summary = import_memories(lines, namespace="copy", threshold=None)
+
+        self.assertEqual(summary["imported"], 3)
+        self.assertEqual(summary["encoded"], 0)
+        self.assertEqual(self.rows("copy"), self.rows("source"))
+
+        copied = Memory.objects.get(namespace="copy", content="lives in Berlin")
+        np.testing.assert_array_equal(copied.embedding, self.originals[2].embedding)
+
+    def test_duplicate_contents_keep_their_own_dates(self):
+        summary = import_memories(exported_lines("source"), namespace="copy", threshold=None)
+
+        self.assertEqual(summary["imported"], 3)
+        tea = list(
+            Memory.objects.filter(namespace="copy", content="likes tea")
+            .order_by("importance_score").values_list("importance_score", "created_at")
+        )
+        self.assertEqual(tea, [(0.2, self.dates[0]), (0.9, self.dates[1])])
+
+    def test_reimport_with_dedup_skips_every_row(self):
+        summary = import_memories(exported_lines("source"), threshold=0.99)
+
+        self.assertEqual(summary["imported"], 0)
+        self.assertEqual(summary["duplicates"], 3)
+        self.assertEqual(Memory.objects.filter(namespace="source").count(), 3)
+
+    def test_dedup_keeps_dates_of_the_rows_it_writes(self):
+        lines = exported_lines("source")
+        Memory.objects.filter(id=self.originals[0].id).delete()
+
+        summary = import_memories(lines, threshold=0.99)
+
+        self.assertEqual((summary["imported"], summary["duplicates"]), (1, 2))
+        restored = Memory.objects.get(namespace="source", importance_score=0.2)
+        self.assertEqual(restored.created_at, self.dates[0])
+
+    def test_vectors_from_another_backend_are_re_encoded(self):
+        lines = [
+            json.dumps(dict(json.loads(line), embedding_model="all-MiniLM-L6-v2@elsewhere"))
+            for line in exported_lines("source")
+        ]
+
+        with mock.patch.object(transfer, "encode_bulk", side_effect=fake_encode) as encode:
+            summary = import_memories(lines, namespace="copy", threshold=None)
+
+        self.assertEqual(summary["encoded"], 3)
+        encode.assert_called_once()
+
+    def test_invalid_lines_are_counted_not_raised(self):
+        good = exported_lines("source")[0].encode("utf-8")
+        wrong_size = json.dumps({
+            "content": "short vector", "embedding": pack_embedding(np.ones(3)),
+            "embedding_model": CACHE_MODEL,
+        }).encode("utf-8")
+        lines = [good, b"\n", b'{"content": "caf\xe9"}', b"not json", b'{"content": ""}', wrong_size]
+
+        summary = import_memories(lines, namespace="copy", threshold=None)
+
+        self.assertEqual(summary["read"], 5)
+        self.assertEqual(summary["imported"], 1)
+        self.assertEqual(summary["invalid"], 4)
+        self.assertEqual(
+            [error.split(":")[0] for error in summary["errors"]],
+            ["line 3", "line 4", "line 5", "line 6"]
+        )
+        self.assertIn("expected 8", summary["errors"][-1])
+
+    def test_import_endpoint_rejects_bad_utf8_per_line(self):
+        body = b"\n".join([
+            exported_lines("source")[2].encode("utf-8"),
+            b'{"content": "\xff\xfe"}',
+        ])
+
+        response = self.client.post(
+            "/api/memories/import?namespace=copy&dedup=0", body,
+            content_type="application/x-ndjson"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual((summary["imported"], summary["invalid"]), (1, 1))
+        self.assertEqual(self.rows("copy"), [("lives in Berlin", 0.5, self.dates[2])])
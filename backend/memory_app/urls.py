@@ -3,14 +3,28 @@ from .views import (
     MemoryCreateAPIView,
     MemoryListAPIView,
     MemorySearchAPIView,
+    MemorySearchBatchAPIView,
     MemoryDeleteAPIView,
-    ChatAPIView
+    MemoryExportAPIView,
+    MemoryImportAPIView,
+    IngestionJobAPIView,
+    ChatSessionCreateAPIView,
+    ChatSessionAPIView,
+    ChatAPIView,
+    ChatStreamAPIView
 )
 
 urlpatterns = [
     path('memories', MemoryCreateAPIView.as_view()),
     path('memories/all', MemoryListAPIView.as_view()),
     path('memories/search', MemorySearchAPIView.as_view()),
+    path('memories/search/batch', MemorySearchBatchAPIView.as_view()),
+    path('memories/export', MemoryExportAPIView.as_view()),
+    path('memories/import', MemoryImportAPIView.as_view()),
     path('memories/<int:id>', MemoryDeleteAPIView.as_view()),
+    path('memories/jobs/<int:id>', IngestionJobAPIView.as_view()),
     path('chat', ChatAPIView.as_view()),
+    path('chat/sessions', ChatSessionCreateAPIView.as_view()),
+    path('chat/sessions/<uuid:id>', ChatSessionAPIView.as_view()),
+    path('chat/stream', ChatStreamAPIView.as_view()),
 ]
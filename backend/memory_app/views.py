@@ -1,29 +1,121 @@
-from django.db import transaction
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import Memory
-from .serializers import MemorySerializer
-from .services.embedding import get_embedding, cosine_similarity
-from .services.extractor import extract_memories
-from .services.retrieval import hybrid_rank_memories, keyword_overlap_score
-from .services.chat import generate_response
+from .models import ChatSession, IngestionJob, Memory
+from .namespaces import DEFAULT_NAMESPACE, is_valid_namespace
+from .serializers import ChatSessionSerializer, IngestionJobSerializer
+from .services.embedding import get_batcher, get_cache
+from .services.index import index_sizes
+from .services.llm import LLMUnavailable, gateway_stats
+from .services.ingestion import DUPLICATE_THRESHOLD
+from .services.jobs import enqueue_ingestion
+from .services.metrics import REGISTRY
+from .services.response_cache import get_response_cache
+from .services.listing import (
+    InvalidCursor, decode_cursor, memory_page, stream_json_array, stream_ndjson
+)
+from .services.retrieval import hybrid_rank_batch, hybrid_rank_memories, keyword_overlap_score
+from .services.transfer import export_memories, import_memories
+from .services.sessions import (
+    get_session, record_exchange, session_history, start_session
+)
+from .services.chat import (
+    build_messages, cached_answer, generate_response, remember_answer, stream_response
+)
+
+
+def request_namespace(request, data=None):
+    """
+    Namespace a request is scoped to: the X-Namespace header, else a
+    `namespace` query parameter or body field, else the default.
+    Returns None when the given namespace is invalid.
+    """
+
+    namespace = (
+        request.headers.get("X-Namespace")
+        or request.GET.get("namespace")
+        or (data or {}).get("namespace")
+        or DEFAULT_NAMESPACE
+    )
+    return namespace if is_valid_namespace(namespace) else None
+
+
+INVALID_NAMESPACE = {
+    "error": "Invalid namespace: use 1-64 letters, digits, '_', '-' or '.'"
+}
+
+
+def chat_context(data, namespace):
+    """
+    Resolves a chat request's session and prior messages.
+
+    With `session_id`, history comes from that server-side session;
+    `new_session: true` starts one. Otherwise the request is stateless,
+    with the client-sent `history` list if any. Returns
+    (session, history), or (None, None) when the session does not exist
+    or has expired.
+    """
+
+    session_id = data.get("session_id")
+    if session_id:
+        session = get_session(session_id, namespace)
+        if session is None:
+            return None, None
+        return session, session_history(session)
 
+    if data.get("new_session"):
+        return start_session(namespace), []
 
-DUPLICATE_THRESHOLD = 0.90
+    return None, data.get("history") or []
+
+
+SESSION_NOT_FOUND = {"error": "Session not found"}
+
+
+def llm_unavailable_response(exc):
+    """
+    503 telling the client when the LLM is worth trying again.
+    """
+
+    response = Response({"error": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if exc.retry_after:
+        response["Retry-After"] = str(max(1, round(exc.retry_after)))
+    return response
+
+
+def sse_event(event, data):
+    """
+    Formats one Server-Sent Events frame with a JSON payload.
+    """
+
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 class MemoryCreateAPIView(APIView):
     """
-    Extracts durable facts from text,
-    deduplicates via cosine similarity,
-    and stores new memories.
+    Queues text for extraction and returns 202 with a job id.
+
+    A background worker extracts durable facts, deduplicates them via
+    cosine similarity and stores new memories in one batch; poll
+    memories/jobs/<id> for the result.
     """
 
-    @transaction.atomic
     def post(self, request):
         text = request.data.get("text")
+        namespace = request_namespace(request, request.data)
+
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
 
         if not text:
             return Response(
@@ -31,62 +123,167 @@ class MemoryCreateAPIView(APIView):
                 status=400
             )
 
-        facts = extract_memories(text)
-        if not facts:
+        job = enqueue_ingestion(text, namespace)
+
+        return Response(
+            {
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": request.build_absolute_uri(f"/api/memories/jobs/{job.id}")
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class IngestionJobAPIView(APIView):
+    """
+    Reports an ingestion job's status and, once it has succeeded,
+    the memories it stored.
+    """
+
+    def get(self, request, id):
+        namespace = request_namespace(request)
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
+
+        try:
+            job = IngestionJob.objects.get(id=id, namespace=namespace)
+        except IngestionJob.DoesNotExist:
             return Response(
-                {"message": "No durable facts extracted."},
-                status=status.HTTP_200_OK
+                {"error": "Job not found"},
+                status=404
             )
 
-        created_memories = []
+        return Response(IngestionJobSerializer(job).data)
 
-        for fact in facts:
-            new_embedding = get_embedding(fact)
 
-            # Check against current DB state (including newly created ones)
-            is_duplicate = False
-            for memory in Memory.objects.all():
-                similarity = cosine_similarity(
-                    new_embedding,
-                    memory.embedding
-                )
+class MemoryListAPIView(APIView):
+    """
+    Lists memories in the namespace, newest first (without embeddings).
 
-                if similarity >= DUPLICATE_THRESHOLD:
-                    is_duplicate = True
-                    break
+    - Default: a JSON array of at most `limit` memories. When more
+      remain, the next page's `cursor` is returned in the X-Next-Cursor
+      header and a `Link: rel="next"` header.
+    - `?stream=ndjson` (or `Accept: application/x-ndjson`) and
+      `?stream=json` stream every memory from `cursor` on instead.
 
-            if not is_duplicate:
-                memory = Memory.objects.create(
-                    content=fact,
-                    embedding=new_embedding
+    Rows are built from `.values()`, never loading the embedding column.
+    """
+
+    STREAM_TYPES = {
+        "ndjson": ("application/x-ndjson", stream_ndjson),
+        "json": ("application/json", stream_json_array),
+    }
+
+    def perform_content_negotiation(self, request, force=False):
+        # NDJSON is served outside DRF's renderers, so don't 406 on it
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        namespace = request_namespace(request)
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
+
+        cursor = request.GET.get("cursor")
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except InvalidCursor:
+                return Response({"error": "Invalid cursor"}, status=400)
+
+        mode = request.GET.get("stream")
+        if mode is None and "application/x-ndjson" in request.headers.get("Accept", ""):
+            mode = "ndjson"
+
+        if mode is not None:
+            if mode not in self.STREAM_TYPES:
+                return Response(
+                    {"error": "Parameter 'stream' must be 'ndjson' or 'json'"},
+                    status=400
                 )
-                created_memories.append(memory)
+            content_type, stream = self.STREAM_TYPES[mode]
+            return StreamingHttpResponse(stream(namespace, cursor), content_type=content_type)
 
-        serializer = MemorySerializer(created_memories, many=True)
+        try:
+            limit = int(request.GET.get("limit", settings.MEMORY_LIST_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= settings.MEMORY_LIST_MAX_PAGE_SIZE:
+            return Response(
+                {"error": f"Parameter 'limit' must be between 1 and {settings.MEMORY_LIST_MAX_PAGE_SIZE}"},
+                status=400
+            )
 
-        return Response(
-            {
-                "stored_count": len(created_memories),
-                "memories": serializer.data
-            },
-            status=status.HTTP_201_CREATED
-        )
+        memories, next_cursor = memory_page(namespace, limit, cursor)
 
+        response = Response(memories, status=status.HTTP_200_OK)
+        if next_cursor:
+            query = request.GET.copy()
+            query["cursor"] = next_cursor
+            query["limit"] = limit
+            next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+            response["X-Next-Cursor"] = next_cursor
+            response["Link"] = f'<{next_url}>; rel="next"'
+        return response
 
-class MemoryListAPIView(APIView):
+class MemoryExportAPIView(APIView):
     """
-    Returns all stored memories (without embeddings).
+    Streams the namespace's memories as NDJSON, oldest first.
+    `?embeddings=1` includes each stored vector so a re-import
+    with the same model skips encoding.
     """
 
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
     def get(self, request):
-        memories = Memory.objects.all().order_by("-created_at")
-        serializer = MemorySerializer(memories, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        namespace = request_namespace(request)
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
+
+        include_embeddings = request.GET.get("embeddings") in ("1", "true")
+
+        response = StreamingHttpResponse(
+            export_memories(namespace, include_embeddings),
+            content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = f'attachment; filename="memories-{namespace}.ndjson"'
+        return response
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class MemoryImportAPIView(View):
+    """
+    Bulk-imports an NDJSON request body (one memory per line) into the
+    namespace. The body is read line by line rather than buffered, and
+    lines are embedded, deduplicated and written in chunks.
+    `?dedup=0` skips deduplication, e.g. when restoring an export.
+    """
+
+    def post(self, request):
+        namespace = request_namespace(request)
+        if namespace is None:
+            return JsonResponse(INVALID_NAMESPACE, status=400)
+
+        dedup = request.GET.get("dedup", "1") not in ("0", "false")
+
+        summary = import_memories(
+            request,
+            namespace=namespace,
+            threshold=DUPLICATE_THRESHOLD if dedup else None
+        )
+
+        return JsonResponse(summary, status=status.HTTP_200_OK)
+
 
 class MemorySearchAPIView(APIView):
 
     def get(self, request):
         query = request.GET.get("q")
+        namespace = request_namespace(request)
+
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
 
         if not query:
             return Response(
@@ -94,7 +291,7 @@ class MemorySearchAPIView(APIView):
                 status=400
             )
 
-        memories = Memory.objects.all()
+        memories = Memory.objects.filter(namespace=namespace)
 
         if not memories.exists():
             return Response({
@@ -102,24 +299,105 @@ class MemorySearchAPIView(APIView):
                 "results": []
             })
 
-        # 🔥 Use hybrid ranking properly
-        ranked_results = hybrid_rank_memories(query, memories)
+        # 🔥 Use hybrid ranking properly, top 5 (or all if fewer)
+        ranked_results = hybrid_rank_memories(
+            query, memories, top_k=5, namespace=namespace
+        )
 
-        # Return top 5 (or all if fewer)
         return Response({
             "query": query,
-            "results": ranked_results[:5]
+            "results": ranked_results
+        })
+
+
+SEARCH_WEIGHTS = {"alpha": 0.7, "beta": 0.2, "gamma": 0.1}
+
+
+class MemorySearchBatchAPIView(APIView):
+    """
+    Ranks many queries in one request:
+    {"queries": [...], "top_k": 5, "weights": {"alpha", "beta", "gamma"}}.
+
+    Returns one {"query", "results"} entry per query, in order, ranked
+    exactly as memories/search would with the same weights.
+    """
+
+    def post(self, request):
+        namespace = request_namespace(request, request.data)
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
+
+        queries = request.data.get("queries")
+        max_queries = settings.SEARCH_BATCH_MAX_QUERIES
+        if (
+            not isinstance(queries, list)
+            or not queries
+            or not all(isinstance(query, str) and query for query in queries)
+        ):
+            return Response(
+                {"error": "Field 'queries' must be a non-empty list of non-empty strings"},
+                status=400
+            )
+        if len(queries) > max_queries:
+            return Response(
+                {"error": f"At most {max_queries} queries per batch"},
+                status=400
+            )
+
+        top_k = request.data.get("top_k", 5)
+        if (
+            not isinstance(top_k, int) or isinstance(top_k, bool)
+            or not 1 <= top_k <= settings.SEARCH_MAX_TOP_K
+        ):
+            return Response(
+                {"error": f"Field 'top_k' must be an integer between 1 and {settings.SEARCH_MAX_TOP_K}"},
+                status=400
+            )
+
+        weights = request.data.get("weights") or {}
+        if (
+            not isinstance(weights, dict)
+            or set(weights) - set(SEARCH_WEIGHTS)
+            or not all(
+                isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+                for value in weights.values()
+            )
+        ):
+            return Response(
+                {"error": "Field 'weights' may only set non-negative 'alpha', 'beta' and 'gamma'"},
+                status=400
+            )
+
+        memories = Memory.objects.filter(namespace=namespace)
+
+        if not memories.exists():
+            ranked = [[] for _ in queries]
+        else:
+            ranked = hybrid_rank_batch(
+                queries, memories, top_k=top_k, namespace=namespace,
+                **{**SEARCH_WEIGHTS, **weights}
+            )
+
+        return Response({
+            "results": [
+                {"query": query, "results": results}
+                for query, results in zip(queries, ranked)
+            ]
         })
 
 
 class MemoryDeleteAPIView(APIView):
     """
-    Deletes a memory by ID.
+    Deletes a memory by ID, within the request's namespace.
     """
 
     def delete(self, request, id):
+        namespace = request_namespace(request)
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
+
         try:
-            memory = Memory.objects.get(id=id)
+            memory = Memory.objects.get(id=id, namespace=namespace)
         except Memory.DoesNotExist:
             return Response(
                 {"error": "Memory not found"},
@@ -133,16 +411,65 @@ class MemoryDeleteAPIView(APIView):
         )
 
 
+class ChatSessionCreateAPIView(APIView):
+    """
+    Starts an empty server-side chat session.
+    """
+
+    def post(self, request):
+        namespace = request_namespace(request, request.data)
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
+
+        session = start_session(namespace)
+        return Response(ChatSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class ChatSessionAPIView(APIView):
+    """
+    Shows a chat session (summary and recent turns) or deletes it.
+    """
+
+    def get(self, request, id):
+        namespace = request_namespace(request)
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
+
+        session = get_session(id, namespace)
+        if session is None:
+            return Response(SESSION_NOT_FOUND, status=404)
+
+        return Response(ChatSessionSerializer(session).data)
+
+    def delete(self, request, id):
+        namespace = request_namespace(request)
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
+
+        session = get_session(id, namespace)
+        if session is None:
+            return Response(SESSION_NOT_FOUND, status=404)
+
+        session.delete()
+
+        return Response(
+            {"message": f"Session {id} deleted successfully."}
+        )
+
+
 class ChatAPIView(APIView):
     """
     Handles conversational queries using:
-    - Short-term history
+    - Short-term history (a server-side session, or sent by the client)
     - Long-term memory retrieval
     """
 
     def post(self, request):
         query = request.data.get("query")
-        history = request.data.get("history", [])
+        namespace = request_namespace(request, request.data)
+
+        if namespace is None:
+            return Response(INVALID_NAMESPACE, status=400)
 
         if not query:
             return Response(
@@ -150,12 +477,178 @@ class ChatAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        answer, memories_used = generate_response(query, history)
+        session, history = chat_context(request.data, namespace)
+        if history is None:
+            return Response(SESSION_NOT_FOUND, status=404)
 
-        return Response(
-            {
-                "answer": answer,
-                "memories_used": memories_used
-            },
-            status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        try:
+            answer, memories_used, cache_hit = generate_response(query, history, namespace)
+        except LLMUnavailable as exc:
+            return llm_unavailable_response(exc)
+
+        data = {
+            "answer": answer,
+            "memories_used": memories_used,
+            "cache": "hit" if cache_hit else "miss"
+        }
+
+        if session is not None:
+            record_exchange(session, query, answer)
+            data["session_id"] = str(session.id)
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class ChatStreamAPIView(View):
+    """
+    Streams a chat answer over Server-Sent Events:
+    - `memories` event with the memories injected into the prompt
+    - `token` events as the model produces text
+    - `done` (or `error`) event at the end, with the session id when
+      the conversation is kept server-side
+
+    Runs as an async view, so under ASGI a slow completion does not
+    hold a worker thread.
+    """
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+        query = data.get("query")
+        namespace = request_namespace(request, data)
+
+        if namespace is None:
+            return JsonResponse(INVALID_NAMESPACE, status=400)
+
+        if not query:
+            return JsonResponse(
+                {"error": "Query is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        session, history = await sync_to_async(chat_context)(data, namespace)
+        if history is None:
+            return JsonResponse(SESSION_NOT_FOUND, status=404)
+
+        done = {}
+        if session is not None:
+            done["session_id"] = str(session.id)
+
+        messages, memories_used = await sync_to_async(build_messages)(
+            query, history, namespace
+        )
+        answer = await sync_to_async(cached_answer)(query, history, namespace, memories_used)
+
+        async def events():
+            yield sse_event("memories", {"memories_used": memories_used})
+
+            if answer is not None:
+                yield sse_event("token", {"content": answer})
+                if session is not None:
+                    await sync_to_async(record_exchange)(session, query, answer)
+                yield sse_event("done", {**done, "cache": "hit"})
+                return
+
+            tokens = []
+            try:
+                async for token in stream_response(messages):
+                    tokens.append(token)
+                    yield sse_event("token", {"content": token})
+            except Exception as exc:
+                yield sse_event("error", {"error": str(exc)})
+                return
+
+            full_answer = "".join(tokens)
+            await sync_to_async(remember_answer)(
+                query, history, namespace, memories_used, full_answer
+            )
+            if session is not None:
+                await sync_to_async(record_exchange)(session, query, full_answer)
+            yield sse_event("done", {**done, "cache": "miss"})
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+def service_metrics():
+    """
+    Metric families read from the database and caches at scrape time.
+    """
+
+    memories = Memory.objects.values("namespace").annotate(count=Count("id"))
+    jobs = IngestionJob.objects.values("status").annotate(count=Count("id"))
+
+    families = [
+        ("hebbrix_memories", "gauge", "Stored memories per namespace.",
+         [({"namespace": row["namespace"]}, row["count"]) for row in memories]),
+        ("hebbrix_index_vectors", "gauge", "Vectors in each loaded namespace index.",
+         [({"namespace": namespace}, size) for namespace, size in index_sizes().items()]),
+        ("hebbrix_ingestion_jobs", "gauge", "Ingestion jobs by status.",
+         [({"status": row["status"]}, row["count"]) for row in jobs]),
+        ("hebbrix_chat_sessions", "gauge", "Server-side chat sessions.",
+         [({}, ChatSession.objects.count())]),
+    ]
+
+    gateway = gateway_stats()
+    families += [
+        ("hebbrix_llm_in_flight", "gauge", "LLM calls currently in flight.",
+         [({}, gateway["in_flight"])]),
+        ("hebbrix_llm_circuit_state", "gauge", "1 for the LLM circuit breaker's current state.",
+         [({"state": state}, int(gateway["circuit"] == state))
+          for state in ("closed", "open", "half_open")]),
+    ]
+
+    caches = {"embedding": get_cache().stats()}
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        caches["response"] = response_cache.stats()
+
+    hits, misses, ratios, entries = [], [], [], []
+    for name, stats in caches.items():
+        # The embedding cache's hits include those served from disk
+        hits.append(({"cache": name, "tier": "memory"}, stats["hits"] - stats.get("disk_hits", 0)))
+        misses.append(({"cache": name}, stats["misses"]))
+        ratios.append(({"cache": name}, stats["hit_rate"]))
+        entries.append(({"cache": name}, stats.get("entries", stats.get("memory_entries"))))
+    hits.append(({"cache": "embedding", "tier": "disk"}, caches["embedding"]["disk_hits"]))
+
+    families += [
+        ("hebbrix_cache_hits_total", "counter", "Cache lookups answered, by cache and tier.", hits),
+        ("hebbrix_cache_misses_total", "counter", "Cache lookups that missed.", misses),
+        ("hebbrix_cache_hit_ratio", "gauge", "Share of cache lookups answered.", ratios),
+        ("hebbrix_cache_entries", "gauge", "Entries held in memory by each cache.", entries),
+    ]
+
+    batcher = get_batcher()
+    if batcher is not None:
+        batching = batcher.stats()
+        families += [
+            ("hebbrix_embedding_queue_depth", "gauge", "Encode requests waiting for a batch.",
+             [({}, batching["queue_depth"])]),
+            ("hebbrix_embedding_batches_total", "counter", "Batched model calls, by batch size in texts.",
+             [({"size": size}, count) for size, count in batching["batch_sizes"].items()]),
+            ("hebbrix_embedding_batched_texts_total", "counter", "Texts encoded through the batcher.",
+             [({}, batching["texts"])]),
+            ("hebbrix_embedding_batch_size_mean", "gauge", "Mean texts per batched model call.",
+             [({}, batching["mean_batch_size"])]),
+        ]
+
+    return families
+
+
+class MetricsView(View):
+    """
+    Request, stage, LLM and cache metrics in Prometheus text format.
+    """
+
+    def get(self, request):
+        return HttpResponse(
+            REGISTRY.render(service_metrics()),
+            content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
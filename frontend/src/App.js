@@ -10,18 +10,31 @@ function App() {
   const [memories, setMemories] = useState([]);
   const [loading, setLoading] = useState(false);
   const [darkMode, setDarkMode] = useState(false);
+  const [sessionId, setSessionId] = useState(null);
 
   const API_BASE = "http://127.0.0.1:8000/api";
 
   const storeMemory = async () => {
     if (!input.trim()) return;
   
-    await axios.post(`${API_BASE}/memories`, {
+    const res = await axios.post(`${API_BASE}/memories`, {
       text: input,
     });
-  
-    fetchMemories();
     setInput("");
+
+    // Extraction runs in the background; refresh once the job finishes
+    await waitForJob(res.data.job_id);
+    fetchMemories();
+  };
+
+  const waitForJob = async (jobId) => {
+    for (let attempt = 0; attempt < 60; attempt++) {
+      const res = await axios.get(`${API_BASE}/memories/jobs/${jobId}`);
+      if (res.data.status === "succeeded" || res.data.status === "failed") {
+        return res.data;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 500));
+    }
   };
   
   const fetchMemories = async () => {
@@ -54,15 +67,12 @@ function App() {
     setMessages((prev) => [...prev, userMessage]);
     setLoading(true);
 
-    const history = [...messages, userMessage].map((msg) => ({
-      role: msg.sender === "user" ? "user" : "assistant",
-      content: msg.text,
-    }));
-
+    // The server keeps the conversation; only the new query is sent
     const res = await axios.post(`${API_BASE}/chat`, {
       query: input,
-      history: history,
+      ...(sessionId ? { session_id: sessionId } : { new_session: true }),
     });
+    setSessionId(res.data.session_id);
 
     const aiMessage = {
       sender: "ai",